@@ -1,19 +1,21 @@
 import streamlit as st
-import asyncio
+import os
+import json
+import time
 import datetime
-import io
-import re
-import textwrap
+import hashlib
 import uuid
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 from pydantic import BaseModel
 from langchain_core.messages import HumanMessage
+from src.prompt_library.prompt import LISTINGS_PLACEHOLDER, build_trip_prompt
 
 # --- IMPORT YOUR AGENT ---
 # We assume 'agent/agentic_workflow.py' exists in your repo.
 try:
-    from src.agent.agentic_workflow import GraphBuilder
+    from src.agent.agentic_workflow import GraphBuilder, RENDER_LISTINGS
 except ImportError:
     st.error("❌ Critical Error: Could not import 'GraphBuilder'. Ensure 'agent/agentic_workflow.py' exists.")
     st.stop()
@@ -44,13 +46,86 @@ class TripRequest(BaseModel):
 # =========================
 # 2. CORE LOGIC (Moved from main.py)
 # =========================
-async def plan_trip_logic(req: TripRequest) -> dict:
+# Max plans running at once in this Streamlit process (shared by all sessions)
+PLANNER_THREADS = int(os.getenv("PLANNER_THREADS", "4"))
+
+@st.cache_resource
+def get_graph():
+    """Compiled graph, built once per process and shared by every session"""
+    return GraphBuilder(model_provider="pool")(durable=False)  # no resume UI here, so skip checkpoints
+
+@st.cache_resource
+def get_planner_executor() -> ThreadPoolExecutor:
+    """Background planners, so reruns never block on (or re-trigger) a plan"""
+    return ThreadPoolExecutor(max_workers=PLANNER_THREADS, thread_name_prefix="planner")
+
+def request_key(req: TripRequest) -> str:
+    """Same trip, same key: strings are trimmed and casefolded"""
+    normalized = {
+        k: (" ".join(v.split()).casefold() if isinstance(v, str) else v)
+        for k, v in req.model_dump().items()
+    }
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+
+class PlanRun:
+    """A plan on the planner executor plus the progress events it has emitted so far"""
+
+    def __init__(self):
+        # Appended by the planner thread, read by the script thread (list.append is atomic)
+        self.events = []
+        self.future = None
+
+    def emit(self, kind: str, **data):
+        self.events.append({"kind": kind, "t": time.time(), **data})
+
+def _text(content) -> str:
+    if isinstance(content, list):
+        return "".join(c.get("text", "") for c in content if isinstance(c, dict))
+    return str(content or "")
+
+def stream_graph(graph, state: dict, config: dict, run: PlanRun):
     """
-    The core travel planning logic, now living directly inside app.py
+    Run the graph while publishing tool start/finish and answer tokens to `run`.
+    Returns the final AI message.
+    """
+    final_message = None
+    for mode, chunk in graph.stream(state, config=config, stream_mode=["updates", "messages", "custom"]):
+        if mode == "custom":
+            # The agent is rewriting an answer it already streamed
+            if isinstance(chunk, dict) and chunk.get("reset_tokens"):
+                run.emit("reset_tokens")
+            continue
+        if mode == "messages":
+            message, metadata = chunk
+            # Only the agent's own tokens (tools may call LLMs too, e.g. IATA lookups)
+            if metadata.get("langgraph_node") == "agent" and not getattr(message, "tool_call_chunks", None):
+                token = _text(message.content)
+                if token:
+                    run.emit("token", text=token)
+            continue
+
+        for node, update in chunk.items():
+            for message in (update or {}).get("messages", []):
+                if node == "agent":
+                    if getattr(message, "tool_calls", None):
+                        # Tokens of a tool-calling turn aren't part of the answer
+                        run.emit("reset_tokens")
+                        for tc in message.tool_calls:
+                            run.emit("tool_start", id=tc["id"], name=tc["name"], args=tc["args"])
+                    else:
+                        final_message = message
+                elif node == "tools":
+                    run.emit("tool_end", id=message.tool_call_id, name=message.name, content=_text(message.content))
+    return final_message
+
+def plan_trip_logic(req: TripRequest, run: Optional[PlanRun] = None) -> dict:
+    """
+    The core travel planning logic, now living directly inside app.py.
+    Runs on the planner executor, never on the Streamlit script thread.
+    With a PlanRun, progress is streamed to it as the graph runs.
     """
     try:
-        # Initialize Graph
-        graph = GraphBuilder(model_provider="openrouter")()
+        graph = get_graph()
 
         # Handle Dates
         try:
@@ -64,104 +139,100 @@ async def plan_trip_logic(req: TripRequest) -> dict:
         final_start_date = start_date_obj.strftime("%Y-%m-%d")
         checkout_date = (start_date_obj + datetime.timedelta(days=req.days)).strftime("%Y-%m-%d")
 
-        # Build Prompt
-        prompt = f"""TRIP PLANNING REQUEST
-📋 **TRIP PARAMETERS:**
-- Origin: {req.from_city}
-- Destination: {req.destination}
-- Start Date: {final_start_date}
-- End Date: {checkout_date}
-- Duration: {req.days} days
-- Travelers: {req.travelers} people
-- Budget Level: {req.budget}
-- Trip Vibe: {req.vibe}
-"""
-        if req.query:
-            prompt += f"\n🎨 **SPECIAL REQUESTS:**\n{req.query}\n"
-
-        prompt += f"""
-        
-🤖 **MULTI-AGENT EXECUTION PROTOCOL:**
-**STEP 1 - Flight Agent:**
-Execute: search_flights(origin="{req.from_city}", destination="{req.destination}", travel_date="{final_start_date}")
-→ Filter by price, layovers, travel time
-→ Display ALL flights in Budget/Moderate/Premium categories
-**STEP 2 - Hotel Agent:**
-Execute: search_hotels(location="{req.destination}", check_in_date="{final_start_date}", check_out_date="{checkout_date}")
-→ Analyze by location, budget, amenities
-→ Display ALL hotels in Budget/Moderate/Luxury categories
-**STEP 3 - Reasoning Agent (YOU):**
-→ Compare flight/hotel alternatives and explain trade-offs
-→ Recommend optimal choices based on {req.budget} budget and {req.vibe} vibe
-**STEP 4 - Dynamic Itinerary:**
-→ Generate {req.days} days of activities using REAL attraction names
-→ Include specific costs in ₹ INR
-**STEP 5 - Budget Breakdown:**
-→ Calculate GRAND TOTAL in ₹ INR (Flights + Hotels + Food + Activities)
-Execute this multi-agent workflow now.
-"""
+        # Build Prompt (same one the API sends; listings are rendered by the system when RENDER_LISTINGS=1)
+        prompt = build_trip_prompt(req, final_start_date, checkout_date, RENDER_LISTINGS)
 
         # Execute Graph
         state = {"messages": [HumanMessage(content=prompt)]}
         thread_id = str(uuid.uuid4())
         config = {"configurable": {"thread_id": thread_id}}
         
-        output = graph.invoke(state, config=config)
-        
-        # Extract Result
-        last_message = output["messages"][-1]
-        content = last_message.content
-
-        if isinstance(content, list):
-            final_answer = "".join(
-                c.get("text", "") for c in content if isinstance(c, dict)
-            )
+        if run is None:
+            last_message = graph.invoke(state, config=config)["messages"][-1]
         else:
-            final_answer = str(content)
+            last_message = stream_graph(graph, state, config, run)
 
-        return {"result": final_answer}
+        # Extract Result
+        final_answer = _text(last_message.content) if last_message is not None else ""
+        archive_plan(final_answer, {
+            "origin": req.from_city, "destination": req.destination,
+            "start_date": final_start_date, "end_date": checkout_date,
+            "days": req.days, "travelers": req.travelers, "vibe": req.vibe, "budget": req.budget,
+        }, thread_id)
+        result = {"result": final_answer}
+        if run is not None:
+            result.update(tool_tables(run.events))
+        return result
 
     except Exception as e:
         return {"error": str(traceback.format_exc())}
 
 # =========================
-# 3. HELPER FUNCTIONS (PDF)
+# 2b. PROGRESS RENDERING
 # =========================
-def md_to_pdf_bytes(title: str, md: str) -> bytes:
+FLIGHT_COLUMNS = ["Category", "Airline", "FlightNumber", "PriceFormatted", "DepartureTime",
+                  "ArrivalTime", "Duration", "Stops"]
+HOTEL_COLUMNS = ["Cat", "Name", "Rat", "Price", "Total", "Loc"]
+
+def _rows(content: str, key: str, columns: list) -> list:
     try:
-        from reportlab.lib.pagesizes import A4
-        from reportlab.pdfgen import canvas
-        from reportlab.lib.units import cm
-
-        buffer = io.BytesIO()
-        c = canvas.Canvas(buffer, pagesize=A4)
-        width, height = A4
-        y = height - 2 * cm
-
-        c.setFont("Helvetica-Bold", 16)
-        c.drawString(2*cm, y, title)
-        y -= 1.5*cm
-
-        c.setFont("Helvetica", 11)
-        text = re.sub(r"[#_*`]+", "", md)
-
-        for para in text.split("\n"):
-            if y < 2*cm:
-                c.showPage()
-                y = height - 2 * cm
-                c.setFont("Helvetica", 11)
-
-            lines = textwrap.wrap(para, width=90)
-            for line in lines:
-                c.drawString(2*cm, y, line)
-                y -= 0.5*cm
-            y -= 0.2*cm
-
-        c.save()
-        buffer.seek(0)
-        return buffer.read()
-    except Exception:
-        return b"Error generating PDF."
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        return []
+    return [{c: item.get(c) for c in columns} for item in data.get(key, [])] if isinstance(data, dict) else []
+
+def tool_tables(events: list) -> dict:
+    """Flight and hotel rows from finished search_flights / search_hotels calls"""
+    tables = {}
+    for e in events:
+        if e["kind"] != "tool_end":
+            continue
+        if e["name"] == "search_flights":
+            tables["flights"] = _rows(e["content"], "flights", FLIGHT_COLUMNS) or tables.get("flights", [])
+        elif e["name"] == "search_hotels":
+            tables["hotels"] = _rows(e["content"], "hotels", HOTEL_COLUMNS) or tables.get("hotels", [])
+    return tables
+
+def tool_log(events: list) -> str:
+    """Markdown list of tool calls with status and timings"""
+    started, lines = {}, {}
+    for e in events:
+        if e["kind"] == "tool_start":
+            started[e["id"]] = e
+            lines[e["id"]] = f"⏳ `{e['name']}` running..."
+        elif e["kind"] == "tool_end" and e["id"] in started:
+            took = e["t"] - started[e["id"]]["t"]
+            icon = "⚠️" if '"error"' in e["content"][:200] else "✅"
+            lines[e["id"]] = f"{icon} `{e['name']}` finished in {took:.1f}s"
+    return "\n".join(f"- {line}" for line in lines.values())
+
+def answer_so_far(events: list) -> str:
+    text = []
+    for e in events:
+        if e["kind"] == "reset_tokens":
+            text = []
+        elif e["kind"] == "token":
+            text.append(e["text"])
+    # Listings are merged into the final answer; the tab shows them as tables meanwhile
+    return "".join(text).replace(LISTINGS_PLACEHOLDER, "")
+
+def render_tables(tables: dict, flights_slot, hotels_slot):
+    if tables.get("flights"):
+        with flights_slot.container():
+            st.markdown("#### ✈️ Flights")
+            st.dataframe(tables["flights"], use_container_width=True, hide_index=True)
+    if tables.get("hotels"):
+        with hotels_slot.container():
+            st.markdown("#### 🏨 Hotels")
+            st.dataframe(tables["hotels"], use_container_width=True, hide_index=True)
+
+# =========================
+# 3. HELPER FUNCTIONS (PDF)
+# =========================
+# PDFs are rendered on demand in a shared process pool and cached by content hash
+from src.utils.pdf_export import get_pdf
+# Finished plans also go to the searchable archive (same store as the API's /plans)
+from src.utils.plan_archive import archive_plan
 
 # =========================
 # 4. STREAMLIT UI
@@ -206,27 +277,83 @@ with st.form("trip_form"):
     user_query = st.text_area("📝 Additional Notes", placeholder="Vegetarian, wheelchair access, etc.")
     submitted = st.form_submit_button("🚀 Generate Plan", use_container_width=True)
 
+# Per-session state: finished results and in-flight plans, both keyed by normalized request
+st.session_state.setdefault("plan_results", {})
+st.session_state.setdefault("plan_futures", {})
+st.session_state.setdefault("pdfs", {})
+
 if submitted:
     req = TripRequest(
         from_city=from_city, destination=destination, start_date=start_date.isoformat(),
         days=days, travelers=travelers, budget=budget, vibe=vibe,
         query=user_query if user_query.strip() else None
     )
+    key = request_key(req)
+    st.session_state["current_key"] = key
+    st.session_state["current_destination"] = destination
+    # Same request again -> cached result; already running -> keep waiting on it
+    if key not in st.session_state["plan_results"] and key not in st.session_state["plan_futures"]:
+        run = PlanRun()
+        run.future = get_planner_executor().submit(plan_trip_logic, req, run)
+        st.session_state["plan_futures"][key] = run
 
-    with st.spinner(f"🤖 Agents are planning trip to {destination}..."):
-        # CALL THE LOGIC DIRECTLY
-        response_dict = asyncio.run(plan_trip_logic(req))
-        
-        if "error" in response_dict:
-            st.error("❌ An error occurred!")
-            with st.expander("See Error Details"):
-                st.code(response_dict["error"])
-        else:
-            final_response = response_dict["result"]
-            st.success("✅ Trip Plan Generated!")
-            
-            tab1, tab2 = st.tabs(["📄 Itinerary", "💾 Download"])
-            with tab1: st.markdown(final_response)
-            with tab2:
-                st.download_button("⬇️ Markdown", final_response, "plan.md")
-                st.download_button("⬇️ PDF", md_to_pdf_bytes("Travel Plan", final_response), "plan.pdf")
\ No newline at end of file
+key = st.session_state.get("current_key")
+run = st.session_state["plan_futures"].get(key)
+if run is not None:
+    # Poll instead of blocking, so a widget rerun interrupts the wait, not the plan.
+    # Everything the planner has produced so far is rendered into placeholders.
+    st.markdown(f"### 🤖 Planning trip to {st.session_state.get('current_destination')}")
+    status, progress = st.empty(), st.empty()
+    flights_slot, hotels_slot, answer_slot = st.empty(), st.empty(), st.empty()
+    seen, tools_done = -1, -1
+    while True:
+        done = run.future.done()
+        events = list(run.events)
+        if not events:
+            status.caption("⏳ Waiting for a free planner..." if not run.future.running() else "⏳ Starting agents...")
+        elif len(events) != seen:
+            seen = len(events)
+            status.caption(f"⏳ Planning... {time.time() - events[0]['t']:.0f}s")
+            progress.markdown(tool_log(events))
+            finished = sum(1 for e in events if e["kind"] == "tool_end")
+            if finished != tools_done:  # tables only change when a tool returns
+                tools_done = finished
+                render_tables(tool_tables(events), flights_slot, hotels_slot)
+            answer_slot.markdown(answer_so_far(events))
+        if done:
+            break
+        time.sleep(0.3)
+    for slot in (status, progress, flights_slot, hotels_slot, answer_slot):
+        slot.empty()
+    st.session_state["plan_results"][key] = run.future.result()
+    del st.session_state["plan_futures"][key]
+
+response_dict = st.session_state["plan_results"].get(key)
+if response_dict:
+    if "error" in response_dict:
+        st.error("❌ An error occurred!")
+        with st.expander("See Error Details"):
+            st.code(response_dict["error"])
+    else:
+        final_response = response_dict["result"]
+        st.success("✅ Trip Plan Generated!")
+
+        tab1, tab_data, tab2 = st.tabs(["📄 Itinerary", "✈️ Flights & Hotels", "💾 Download"])
+        with tab1: st.markdown(final_response)
+        with tab_data:
+            if response_dict.get("flights") or response_dict.get("hotels"):
+                render_tables(response_dict, st.empty(), st.empty())
+            else:
+                st.caption("No flight or hotel results were returned.")
+        with tab2:
+            st.download_button("⬇️ Markdown", final_response, "plan.md")
+            # Only render the PDF when someone asks for it
+            if key not in st.session_state["pdfs"]:
+                if st.button("📄 Prepare PDF"):
+                    with st.spinner("Rendering PDF..."):
+                        try:
+                            st.session_state["pdfs"][key] = get_pdf("Travel Plan", final_response)
+                        except Exception as e:
+                            st.error(f"❌ Could not generate PDF: {e}")
+            if key in st.session_state["pdfs"]:
+                st.download_button("⬇️ PDF", st.session_state["pdfs"][key], "plan.pdf", mime="application/pdf")
@@ -0,0 +1,65 @@
+# Benchmark: output tokens the LLM no longer writes now that the flight and hotel
+# listings are rendered from the tool JSON (src/utils/listings.py).
+#
+# Uses the search_flights / search_hotels responses recorded by run_experiment.py,
+# renders their listings and counts the tokens. For the end-to-end number, run the
+# same sweep both ways and compare the output_tokens / latency_s columns:
+#   python -m experiments.run_experiment experiments/exp_02.yaml --listings llm
+#   python -m experiments.run_experiment experiments/exp_02.yaml --listings rendered
+#
+# Run from the project root:
+#   python -m experiments.benchmark_listing_tokens [recordings.sqlite]
+import sys
+import json
+import sqlite3
+from types import SimpleNamespace
+
+from experiments.benchmark_prompt_tokens import count_tokens, TOKENIZER
+from experiments.run_experiment import EXPERIMENT_RECORDINGS
+from src.prompt_library.prompt import LLM_LISTINGS_SYNTHESIS_PROMPT, build_phase_prompt
+from src.utils.listings import render_listings
+
+
+def recorded(path: str, tool: str):
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute("SELECT content FROM tool_recordings WHERE tool = ?", (tool,)).fetchall()
+    finally:
+        conn.close()
+    for (content,) in rows:
+        try:
+            if not json.loads(content).get("error"):
+                yield content
+        except (ValueError, AttributeError):
+            continue
+
+
+def section_tokens(tool: str, contents) -> list:
+    return [count_tokens(render_listings([SimpleNamespace(type="tool", name=tool, content=c)])) for c in contents]
+
+
+def main() -> int:
+    path = sys.argv[1] if len(sys.argv) > 1 else EXPERIMENT_RECORDINGS
+    print(f"Tokenizer: {TOKENIZER}\nRecordings: {path}\n")
+
+    flights = section_tokens("search_flights", recorded(path, "search_flights"))
+    hotels = section_tokens("search_hotels", recorded(path, "search_hotels"))
+    if not flights and not hotels:
+        print("No recorded flight/hotel responses yet - run run_experiment.py with --tools record first.")
+        return 1
+
+    mean = lambda values: sum(values) / len(values) if values else 0
+    print(f"{'section':<12}{'samples':>9}{'mean':>8}{'max':>8}")
+    for name, values in (("flights", flights), ("hotels", hotels)):
+        print(f"{name:<12}{len(values):>9}{mean(values):>8.0f}{max(values, default=0):>8}")
+
+    saved = mean(flights) + mean(hotels)
+    legacy = count_tokens(LLM_LISTINGS_SYNTHESIS_PROMPT.content)
+    rendered = count_tokens(build_phase_prompt("synthesis").content)
+    print(f"\nOutput tokens no longer generated per plan: ~{saved:.0f}")
+    print(f"Synthesis instructions: {legacy} -> {rendered} input tokens ({rendered - legacy:+d})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
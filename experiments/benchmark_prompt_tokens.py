@@ -0,0 +1,63 @@
+# Benchmark: per-turn prompt overhead (system prompt + bound tool schemas)
+# for the legacy single prompt vs. phase-aware prompting.
+#
+# Conversation messages are the same in both setups, so only the fixed overhead
+# that is re-sent on every turn is compared.
+#
+# Run from the project root:
+#   python -m experiments.benchmark_prompt_tokens
+import json
+
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from src.prompt_library.prompt import SYSTEM_PROMPT, BASE_SYSTEM_PROMPT, build_phase_prompt
+from src.agent.agentic_workflow import PHASE_TOOLS
+from src.tools.registry import get_tools
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+
+    def count_tokens(text: str) -> int:
+        return len(_encoding.encode(text))
+    TOKENIZER = "tiktoken o200k_base"
+except ImportError:
+    def count_tokens(text: str) -> int:
+        return len(text) // 4  # rough chars-per-token estimate
+    TOKENIZER = "chars/4 estimate (install tiktoken for exact counts)"
+
+# A typical run: one logistics turn (3 parallel calls), one discovery turn, one synthesis turn
+TURNS = ["logistics", "discovery", "synthesis"]
+
+
+def schema_tokens(tools) -> int:
+    return count_tokens(json.dumps([convert_to_openai_tool(t) for t in tools]))
+
+
+def main():
+    # Only the tool schemas are needed; provider clients are never constructed
+    tools = get_tools()
+    all_schema_tokens = schema_tokens(tools)
+    legacy_prompt_tokens = count_tokens(SYSTEM_PROMPT.content)
+    base_tokens = count_tokens(BASE_SYSTEM_PROMPT.content)
+
+    print(f"Tokenizer: {TOKENIZER}\n")
+    print(f"{'turn':<12}{'legacy':>10}{'phased':>10}{'saved':>10}")
+
+    legacy_total = phased_total = 0
+    for phase in TURNS:
+        legacy = legacy_prompt_tokens + all_schema_tokens
+        phase_tools = [t for t in tools if t.name in PHASE_TOOLS.get(phase, [])]
+        phased = (base_tokens + count_tokens(build_phase_prompt(phase).content)
+                  + (schema_tokens(phase_tools) if phase_tools else 0))
+        legacy_total += legacy
+        phased_total += phased
+        print(f"{phase:<12}{legacy:>10}{phased:>10}{legacy - phased:>10}")
+
+    saved = legacy_total - phased_total
+    print(f"{'TOTAL':<12}{legacy_total:>10}{phased_total:>10}{saved:>10}"
+          f"  ({saved / legacy_total * 100:.0f}% fewer input tokens)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Regression check: cold import of the agent must stay fast and must not load provider SDKs.
+#
+# Runs `python -X importtime -c "import src.agent.agentic_workflow"` in a fresh interpreter,
+# fails if the cumulative import time exceeds the budget or if any provider SDK was imported
+# (those should only load on first use, see src/tools/registry.py).
+#
+# Run from the project root (exit code 1 on regression, so it can gate CI):
+#   python -m experiments.check_import_time
+#   IMPORT_TIME_BUDGET_MS=1500 python -m experiments.check_import_time
+import os
+import re
+import sys
+import subprocess
+
+TARGET = "src.agent.agentic_workflow"
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "2500"))
+
+# Must not be imported until a tool or model actually needs them
+LAZY_MODULES = [
+    "langchain_groq",
+    "langchain_openai",
+    "langchain_google_genai",
+    "langchain_google_community",
+    "langchain_tavily",
+    "serpapi",
+]
+
+# "import time:      self [us] |  cumulative | imported package"
+_LINE_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(target: str = TARGET):
+    """Returns (cumulative ms of target, set of imported top-level module names)"""
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True, text=True, env=env,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {target} failed:\n{proc.stderr[-2000:]}")
+
+    total_us = 0
+    modules = set()
+    for line in proc.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if not match:
+            continue
+        _, cumulative, _, name = match.groups()
+        modules.add(name.split(".")[0])
+        if name == target:
+            total_us = int(cumulative)
+    return total_us / 1000, modules
+
+
+def main() -> int:
+    total_ms, modules = measure()
+    eager = [m for m in LAZY_MODULES if m in modules]
+
+    print(f"Cold import of {TARGET}: {total_ms:.0f} ms (budget {IMPORT_TIME_BUDGET_MS:.0f} ms)")
+    ok = True
+    if total_ms > IMPORT_TIME_BUDGET_MS:
+        print("❌ Import time budget exceeded")
+        ok = False
+    if eager:
+        print(f"❌ Provider SDKs imported eagerly: {', '.join(eager)}")
+        ok = False
+    if ok:
+        print("✅ Import is lazy and within budget")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,375 @@
+# Experiment runner for the YAML specs in this folder (ablations, parameter sweeps).
+#
+# Each YAML is expanded into a job matrix (sweep configurations x test cases x replications),
+# honoring model params, agent enable flags, the tools list and workflow.max_tool_calls.
+# Jobs run in a process pool against recorded tool responses, so a 40-run sweep only
+# spends LLM time and no SerpAPI quota. Per-run latency, tokens and tool sequence are
+# written to output/experiments/<name>-<timestamp>.parquet (CSV if pyarrow is missing).
+#
+# Tool modes:
+#   replay  (default) serve tool calls from the recordings only; unrecorded calls return an error to the
+#           agent and the run is marked "missing_recordings" (left out of the summary)
+#   record  serve recorded calls, call the real tool for the rest and record the response
+#   live    always call the real tools (still goes through the shared API cache)
+#
+# Run from the project root:
+#   python -m experiments.run_experiment experiments/exp_02.yaml --tools record --replications 1
+#   python -m experiments.run_experiment experiments/exp_02.yaml --workers 8
+#   python -m experiments.run_experiment experiments/*.yaml --dry-run
+import os
+import sys
+import csv
+import json
+import glob
+import time
+import sqlite3
+import argparse
+import threading
+import multiprocessing as mp
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from types import SimpleNamespace
+from typing import List, Optional
+
+import yaml
+
+EXPERIMENT_WORKERS = int(os.getenv("EXPERIMENT_WORKERS", "4"))
+EXPERIMENT_RECORDINGS = os.getenv("EXPERIMENT_RECORDINGS", "./cache/experiment_recordings.sqlite")
+EXPERIMENT_OUTPUT_DIR = os.getenv("EXPERIMENT_OUTPUT_DIR", "./output/experiments")
+# Test cases without a start_date use this one. Recordings are keyed on the dates, so when
+# it isn't set, the date picked on first use is stored in the recordings DB and reused.
+EXPERIMENT_START_DATE = os.getenv("EXPERIMENT_START_DATE")
+
+# Tools each agent flag in the YAML switches off
+AGENT_TOOLS = {
+    "flight_agent": ["search_flights"],
+    "hotel_agent": ["search_hotels"],
+    "place_discovery": ["discover_destination", "search_attractions", "search_restaurants",
+                        "search_activities", "search_transportation"],
+}
+# Keys in a sweep configuration that are labels, not model params
+_CONFIG_LABELS = {"id", "hypothesis"}
+
+
+# ---- job matrix ----
+
+def _default_start_date(recordings_path: str = EXPERIMENT_RECORDINGS) -> str:
+    if EXPERIMENT_START_DATE:
+        return EXPERIMENT_START_DATE
+    return ToolRecordings(recordings_path).default_start_date()
+
+
+def expand_jobs(path: str, replications: Optional[int] = None, start_date: Optional[str] = None,
+                recordings_path: str = EXPERIMENT_RECORDINGS) -> List[dict]:
+    """One job per (configuration, test case, replication) of an experiment YAML"""
+    from src.tools.registry import TOOL_SPECS
+    from src.agent.agentic_workflow import MAX_TOOL_CALLS
+
+    with open(path, encoding="utf-8") as f:
+        spec = yaml.safe_load(f)
+    name = spec.get("name") or os.path.splitext(os.path.basename(path))[0]
+    model = spec.get("model") or {}
+
+    sweep = spec.get("parameter_sweep")
+    if sweep:
+        variable = sweep.get("variable", "temperature")
+        configs = sweep.get("configurations") or [
+            {"id": f"{variable}_{value}", variable: value} for value in sweep.get("values", [])
+        ]
+    else:
+        configs = [{"id": "base"}]
+
+    cases = spec.get("test_cases") or [spec["test_case"]]
+    reps = replications or (spec.get("analysis") or {}).get("replications_per_config") or 1
+
+    # Tools: the YAML list (or every tool), minus those of disabled agents
+    tools = [t for t in (spec.get("tools") or list(TOOL_SPECS)) if t in TOOL_SPECS]
+    unknown = set(spec.get("tools") or []) - set(TOOL_SPECS)
+    if unknown:
+        print(f"⚠️ {name}: ignoring unknown tools {sorted(unknown)}")
+    for agent, agent_spec in (spec.get("agents") or {}).items():
+        if not (agent_spec or {}).get("enabled", True):
+            tools = [t for t in tools if t not in AGENT_TOOLS.get(agent, [])]
+
+    max_tool_calls = (spec.get("workflow") or {}).get("max_tool_calls", MAX_TOOL_CALLS)
+    default_start = start_date or _default_start_date(recordings_path)
+
+    jobs = []
+    for config in configs:
+        params = {**model, **{k: v for k, v in config.items() if k not in _CONFIG_LABELS}}
+        for i, case in enumerate(cases):
+            case_id = case.get("id", f"tc_{i + 1:02d}")
+            trip = {k: v for k, v in case.items() if k != "id"}
+            trip["start_date"] = str(start_date or trip.get("start_date") or default_start)
+            for rep in range(1, reps + 1):
+                jobs.append({
+                    "experiment": name,
+                    "job_id": f"{config['id']}/{case_id}/{rep}",
+                    "config_id": config["id"],
+                    "test_case": case_id,
+                    "replication": rep,
+                    "params": params,
+                    "trip": trip,
+                    "tools": tools,
+                    "max_tool_calls": int(max_tool_calls),
+                })
+    return jobs
+
+
+# ---- recorded tool responses ----
+
+class ToolRecordings:
+    """SQLite store of tool responses keyed on the canonical tool call (one connection per process)"""
+
+    def __init__(self, path: str = EXPERIMENT_RECORDINGS):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS tool_recordings ("
+                " key TEXT PRIMARY KEY, tool TEXT NOT NULL, content TEXT NOT NULL, recorded_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS recording_meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn.commit()
+        return self._conn
+
+    def default_start_date(self) -> str:
+        """Start date for test cases without one: picked once (30 days out), then fixed for these recordings"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR IGNORE INTO recording_meta VALUES ('default_start_date', ?)",
+                ((datetime.now() + timedelta(days=30)).strftime("%Y-%m-%d"),),
+            )
+            conn.commit()
+            return conn.execute("SELECT value FROM recording_meta WHERE name = 'default_start_date'").fetchone()[0]
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection().execute("SELECT content FROM tool_recordings WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, tool: str, content: str) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("INSERT OR IGNORE INTO tool_recordings VALUES (?, ?, ?, ?)", (key, tool, content, time.time()))
+            conn.commit()
+
+
+def wrap_tool(tool, mode: str, recordings: ToolRecordings, missing: List[str]):
+    """Same name/schema as the real tool, but served from (and/or recorded to) the recordings"""
+    from langchain_core.tools import StructuredTool
+    from src.utils.tool_memo import canonical_tool_key
+
+    def run(**kwargs) -> str:
+        key = canonical_tool_key(tool.name, kwargs)
+        if mode != "live":
+            recorded = recordings.get(key)
+            if recorded is not None:
+                return recorded
+        if mode == "replay":
+            missing.append(tool.name)
+            return (f"Error: no recorded response for {tool.name}({json.dumps(kwargs, ensure_ascii=False)}). "
+                    "Record it first with --tools record.")
+        result = tool.invoke(kwargs)
+        content = result if isinstance(result, str) else json.dumps(result, ensure_ascii=False, default=str)
+        if mode == "record":
+            recordings.put(key, tool.name, content)
+        return content
+
+    return StructuredTool.from_function(func=run, name=tool.name, description=tool.description,
+                                        args_schema=tool.args_schema)
+
+
+# ---- running one job (inside a pool process) ----
+
+def build_llm(params: dict):
+    """Chat client for the YAML model params"""
+    from src.utils.llm_clients import get_chat_client
+
+    provider = params.get("provider", "openrouter")
+    extra = {k: params[k] for k in ("top_p", "seed") if k in params}
+    if provider == "gemini":
+        return get_chat_client("gemini", params["name"], temperature=params.get("temperature", 0.1),
+                               max_output_tokens=params.get("max_tokens", 4000),
+                               **({"top_p": extra["top_p"]} if "top_p" in extra else {}))
+    return get_chat_client(provider, params["name"], temperature=params.get("temperature", 0.1),
+                           max_tokens=params.get("max_tokens", 8000), model_kwargs=extra)
+
+
+_recordings: Optional[ToolRecordings] = None
+
+
+def run_job(job: dict, tool_mode: str, recordings_path: str) -> dict:
+    """Runs one plan and returns its result row"""
+    global _recordings
+    from langchain_core.messages import AIMessage, HumanMessage
+    from src.agent.agentic_workflow import GraphBuilder
+    from src.prompt_library.prompt import build_trip_prompt
+    from src.tools.registry import get_tools
+    from src.utils.quota_scheduler import quota_lane, BATCH
+
+    if _recordings is None or _recordings.path != recordings_path:
+        _recordings = ToolRecordings(recordings_path)
+
+    params, trip = job["params"], job["trip"]
+    start = trip["start_date"]
+    end = (datetime.fromisoformat(start) + timedelta(days=int(trip["days"]))).strftime("%Y-%m-%d")
+    row = {
+        "experiment": job["experiment"], "job_id": job["job_id"], "config_id": job["config_id"],
+        "test_case": job["test_case"], "replication": job["replication"],
+        "provider": params.get("provider"), "model": params.get("name"),
+        "temperature": params.get("temperature"), "top_p": params.get("top_p"), "seed": params.get("seed"),
+        "max_tool_calls": job["max_tool_calls"], "tools_enabled": ",".join(job["tools"]),
+        "from_city": trip.get("from_city"), "destination": trip.get("destination"),
+        "start_date": start, "end_date": end, "tool_mode": tool_mode, "listings": job.get("listings", "rendered"),
+        "worker_pid": os.getpid(),
+    }
+
+    missing: List[str] = []
+    started = time.perf_counter()
+    try:
+        tools = [wrap_tool(t, tool_mode, _recordings, missing) for t in get_tools(job["tools"])]
+        rendered = job.get("listings", "rendered") == "rendered"
+        graph = GraphBuilder(model_provider=params.get("provider", "openrouter"), llm=build_llm(params),
+                             tools=tools, max_tool_calls=job["max_tool_calls"],
+                             rendered_listings=rendered)(durable=False)
+        req = SimpleNamespace(query=None, **{k: trip.get(k) for k in
+                                             ("from_city", "destination", "days", "travelers", "budget", "vibe")})
+        with quota_lane(BATCH):
+            output = graph.invoke({"messages": [HumanMessage(content=build_trip_prompt(req, start, end, rendered))]})
+
+        ai_messages = [m for m in output["messages"] if isinstance(m, AIMessage)]
+        usage = [m.usage_metadata or {} for m in ai_messages]
+        sequence = [tc["name"] for m in ai_messages for tc in (m.tool_calls or [])]
+        answer = next((m.content for m in reversed(ai_messages) if m.content and not m.tool_calls), "")
+        row.update(
+            status="ok", error=None,
+            llm_calls=len(ai_messages),
+            input_tokens=sum(u.get("input_tokens", 0) for u in usage),
+            output_tokens=sum(u.get("output_tokens", 0) for u in usage),
+            total_tokens=sum(u.get("total_tokens", 0) for u in usage),
+            tool_calls=len(sequence),
+            unique_tools=len(set(sequence)),
+            tool_sequence=" > ".join(sequence),
+            itinerary_complete="day-by-day itinerary" in answer.lower(),
+            answer_chars=len(answer),
+            answer=answer,
+        )
+    except Exception as e:
+        row.update(status="failed", error=f"{type(e).__name__}: {e}"[:500])
+    row["latency_s"] = round(time.perf_counter() - started, 3)
+    row["missing_recordings"] = len(missing)
+    if missing and row["status"] == "ok":
+        # The agent got "no recorded response" errors instead of tool data: not comparable
+        row["status"] = "missing_recordings"
+    return row
+
+
+# ---- output ----
+
+def write_results(rows: List[dict], name: str, out_dir: str = EXPERIMENT_OUTPUT_DIR) -> str:
+    """Parquet if pyarrow is installed, CSV otherwise. Returns the path written."""
+    os.makedirs(out_dir, exist_ok=True)
+    base = os.path.join(out_dir, f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+    columns = list(dict.fromkeys(k for row in rows for k in row))
+    rows = sorted(rows, key=lambda r: r["job_id"])
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        path = f"{base}.csv"
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+    path = f"{base}.parquet"
+    pq.write_table(pa.Table.from_pylist([{c: row.get(c) for c in columns} for row in rows]), path)
+    return path
+
+
+def summarize(rows: List[dict]) -> None:
+    print(f"\n{'config':<14}{'runs':>6}{'ok':>5}{'latency_s':>11}{'tokens':>9}{'output':>9}{'tool calls':>12}")
+    for config_id in dict.fromkeys(r["config_id"] for r in rows):
+        group = [r for r in rows if r["config_id"] == config_id]
+        ok = [r for r in group if r["status"] == "ok"]
+        mean = lambda key: sum(r[key] for r in ok) / len(ok) if ok else 0
+        print(f"{config_id:<14}{len(group):>6}{len(ok):>5}{mean('latency_s'):>11.1f}"
+              f"{mean('total_tokens'):>9.0f}{mean('output_tokens'):>9.0f}{mean('tool_calls'):>12.1f}")
+
+
+def run_experiment(path: str, args) -> Optional[str]:
+    jobs = expand_jobs(path, args.replications, args.start_date, args.recordings)
+    if args.provider:
+        for job in jobs:
+            job["params"] = {**job["params"], "provider": args.provider, **({"name": args.model} if args.model else {})}
+    for job in jobs:
+        job["listings"] = args.listings
+    if args.limit:
+        jobs = jobs[:args.limit]
+    name = jobs[0]["experiment"] if jobs else os.path.basename(path)
+    print(f"🧪 {name}: {len(jobs)} runs, tools={jobs[0]['tools'] if jobs else []}, "
+          f"max_tool_calls={jobs[0]['max_tool_calls'] if jobs else '-'}, mode={args.tools}")
+    if args.dry_run:
+        for job in jobs:
+            print(f"   {job['job_id']:<22} {json.dumps(job['params'], sort_keys=True)} {job['trip']}")
+        return None
+
+    rows, started = [], time.perf_counter()
+    if args.workers <= 1:
+        results = (run_job(job, args.tools, args.recordings) for job in jobs)
+    else:
+        # spawn: each worker builds its own clients and sqlite handles
+        pool = ProcessPoolExecutor(max_workers=args.workers, mp_context=mp.get_context("spawn"))
+        futures = [pool.submit(run_job, job, args.tools, args.recordings) for job in jobs]
+        results = (f.result() for f in as_completed(futures))
+    try:
+        for row in results:
+            rows.append(row)
+            icon = "✅" if row["status"] == "ok" else "❌"
+            print(f"{icon} [{len(rows)}/{len(jobs)}] {row['job_id']} {row['latency_s']:.1f}s"
+                  + (f" ({row['missing_recordings']} unrecorded tool calls)" if row["missing_recordings"] else "")
+                  + (f" {row['error']}" if row["error"] else ""))
+    finally:
+        if args.workers > 1:
+            pool.shutdown(cancel_futures=True)
+
+    summarize(rows)
+    path = write_results(rows, name, args.out)
+    print(f"\n⏱️ {len(rows)} runs in {time.perf_counter() - started:.0f}s -> {path}")
+    return path
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run experiment YAMLs (ablations / parameter sweeps)")
+    parser.add_argument("specs", nargs="*", default=sorted(glob.glob("experiments/*.yaml")))
+    parser.add_argument("--workers", type=int, default=EXPERIMENT_WORKERS)
+    parser.add_argument("--tools", choices=["replay", "record", "live"], default="replay")
+    parser.add_argument("--recordings", default=EXPERIMENT_RECORDINGS)
+    parser.add_argument("--replications", type=int, help="override analysis.replications_per_config")
+    parser.add_argument("--start-date", help="override every test case's start date (YYYY-MM-DD)")
+    parser.add_argument("--provider", help="override model.provider (e.g. openrouter)")
+    parser.add_argument("--model", help="override model.name (with --provider)")
+    parser.add_argument("--limit", type=int, help="only run the first N jobs of each spec")
+    parser.add_argument("--listings", choices=["rendered", "llm"], default="rendered",
+                        help="flight/hotel listings rendered from tool JSON, or written by the LLM (legacy)")
+    parser.add_argument("--out", default=EXPERIMENT_OUTPUT_DIR)
+    parser.add_argument("--dry-run", action="store_true", help="print the job matrix and exit")
+    args = parser.parse_args()
+
+    if not args.specs:
+        parser.error("no experiment YAMLs found")
+    for path in args.specs:
+        run_experiment(path, args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
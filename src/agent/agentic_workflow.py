@@ -1,67 +1,146 @@
-from typing import TypedDict, Annotated, List
+from typing import TypedDict, Annotated, List, Optional, Set
+import os
 import operator
 from langgraph.graph import StateGraph, END
+from langgraph.config import get_stream_writer
 from langgraph.prebuilt import ToolNode
-from langchain_core.messages import AnyMessage, SystemMessage, AIMessage
+from langchain_core.messages import AnyMessage, SystemMessage, AIMessage, ToolMessage
 
 # Import your existing tools
-from src.tools.flight_serpapi_tool import search_flights
-from src.tools.hotel_serpapi_tool import search_hotels
-from src.tools.weather_info_tool import get_weather_forecast
-from src.tools.place_search_tool import PlaceSearchTool  
+from src.tools.registry import get_tools
 
 from src.utils.model_loader import ModelLoader
-from src.prompt_library.prompt import SYSTEM_PROMPT
+from src.utils.llm_pool import LLMProviderPool
+from src.utils.resilience import get_guard
+from src.utils.tool_memo import canonical_tool_key
+from src.utils.checkpointer import get_checkpointer
+from src.utils.listings import render_listings, merge_listings, message_text, is_error_result
+from src.prompt_library.prompt import BASE_SYSTEM_PROMPT, build_phase_prompt
+
+def merge_memo(left: dict, right: dict) -> dict:
+    return {**(left or {}), **(right or {})}
 
 class AgentState(TypedDict):
     messages: Annotated[List[AnyMessage], operator.add]
     tool_calls_count: int  # Track number of tool calls
+    tool_memo: Annotated[dict, merge_memo]  # canonical tool call -> ToolMessage content (this run only)
+
+# Default tool-call budget before the agent is forced to write the final answer
+MAX_TOOL_CALLS = 10
+# Flight/hotel listings rendered from the tool JSON instead of written by the LLM
+RENDER_LISTINGS = os.getenv("RENDER_LISTINGS", "1") == "1"
+
+# Tools bound to the LLM in each phase (synthesis binds none)
+PHASE_TOOLS = {
+    "logistics": ["search_flights", "search_hotels", "get_weather_forecast", "get_price_history"],
+    "discovery": ["discover_destination", "search_attractions", "search_restaurants",
+                  "search_activities", "search_transportation"],
+}
+
+def current_phase(messages: List[AnyMessage], tool_names: Optional[Set[str]] = None) -> str:
+    """
+    Work out the phase from the tools the agent has already called.
+    tool_names limits the check to the tools actually registered (e.g. ablations without flights).
+    """
+    called = {
+        tc.get("name")
+        for m in messages if isinstance(m, AIMessage)
+        for tc in (m.tool_calls or [])
+    }
+    available = tool_names if tool_names is not None else {
+        name for names in PHASE_TOOLS.values() for name in names
+    }
+    if not ({"search_flights", "search_hotels", "get_weather_forecast"} & available) <= called:
+        return "logistics"
+    discover = {"discover_destination"} & available
+    core = {"search_attractions", "search_restaurants"} & available
+    if (discover or core) and not (discover & called) and not (core and core <= called):
+        return "discovery"
+    return "synthesis"
+
+# Sections an early answer needs to be kept as the final plan (case-insensitive)
+ANSWER_REQUIRED_SECTIONS = ("itinerary", "budget breakdown")
+
+def is_complete_answer(text: str) -> bool:
+    """True if the answer already has the plan's core sections (day-by-day itinerary + budget)"""
+    lowered = text.casefold()
+    return all(section in lowered for section in ANSWER_REQUIRED_SECTIONS)
 
 class GraphBuilder:
-    def __init__(self, model_provider="groq"):
+    def __init__(self, model_provider="pool", llm=None, tools=None, max_tool_calls: int = MAX_TOOL_CALLS,
+                 rendered_listings: bool = RENDER_LISTINGS):
+        """
+        llm / tools override the provider's model and the full tool registry
+        (the experiment runner passes model params from YAML and recorded tools).
+        rendered_listings=False lets the LLM write the flight/hotel listings itself.
+        """
         self.model_provider = model_provider
+        self.max_tool_calls = max_tool_calls
+        self.rendered_listings = rendered_listings
         
         # Load LLM
-        loader = ModelLoader(model_provider=model_provider)
-        self.llm = loader.load_llm()
+        self.llm = llm if llm is not None else ModelLoader(model_provider=model_provider).load_llm()
+        # Breaker + adaptive timeout around every chat completion
+        # (a provider pool guards each of its members itself)
+        self.llm_guard = get_guard(model_provider)
         
-        # Initialize Place Tools
-        place_tools_instance = PlaceSearchTool()
-        place_tools_list = place_tools_instance.place_search_tool_list
-
-        # Register ALL tools
-        self.tools = [
-            search_flights, 
-            search_hotels, 
-            get_weather_forecast
-        ] + place_tools_list
+        # Register ALL tools (Flights, Hotels, Weather + Places), loaded on first use
+        self.tools = tools if tools is not None else get_tools()
+        self.tool_names = {t.name for t in self.tools}
         
-        # Bind tools to LLM
+        # Bind tools to LLM (all tools, kept for callers that don't use phases)
         self.llm_with_tools = self.llm.bind_tools(self.tools)
+
+        # Bind only the tools relevant to each phase, so later turns don't re-send every schema
+        self.phase_llms = {}
+        for phase, names in PHASE_TOOLS.items():
+            phase_tools = [t for t in self.tools if t.name in names]
+            self.phase_llms[phase] = self.llm.bind_tools(phase_tools) if phase_tools else self.llm
+        self.phase_llms["synthesis"] = self.llm
         
         print(f"✅ Agent initialized")
         print(f"   Provider: {model_provider}")
         print(f"   Tools: {len(self.tools)} (Flights, Hotels, Weather + Places)")
 
+    def _invoke_llm(self, llm, messages):
+        if isinstance(llm, LLMProviderPool):
+            return llm.invoke(messages)
+        return self.llm_guard.call(llm.invoke, messages, thread_timeout=True)
+
+    def _with_listings(self, response, messages):
+        """Final answer with the rendered flight/hotel sections merged in"""
+        if not self.rendered_listings:
+            return response
+        answer = message_text(response.content)
+        merged = merge_listings(answer, render_listings(messages))
+        if merged == answer:
+            return response
+        return response.model_copy(update={"content": merged})
+
     def agent_node(self, state: AgentState):
         """Main agent decision node"""
         messages = state['messages']
         tool_calls_count = state.get('tool_calls_count', 0)
         
-        # Add system prompt if not present
+        # Byte-stable base prompt first; the current phase's instructions go last
+        phase = current_phase(messages, self.tool_names)
         if not isinstance(messages[0], SystemMessage):
-            messages = [SYSTEM_PROMPT] + messages
+            messages = [BASE_SYSTEM_PROMPT] + messages
+        messages = messages + [build_phase_prompt(phase, self.rendered_listings)]
         
         print(f"\n🤖 AGENT PROCESSING...")
         print(f"   Context: {len(messages)} messages")
+        print(f"   Phase: {phase} ({len(PHASE_TOOLS.get(phase, []))} tools bound)")
         print(f"   Tools called so far: {tool_calls_count}")
         
         # **FIX 1: Add stopping condition based on tool call count**
         # After 8-10 tool calls, force the agent to generate final response
-        if tool_calls_count >= 10:
+        if tool_calls_count >= self.max_tool_calls:
             print(f"   🛑 Tool limit reached ({tool_calls_count}). Forcing final response...")
             
             # Create a modified system message that forces response generation
+            if phase != "synthesis":
+                messages = messages + [build_phase_prompt("synthesis", self.rendered_listings)]
             forced_messages = messages + [
                 SystemMessage(content="""
                 You have gathered all necessary information from src.tools.
@@ -71,37 +150,104 @@ class GraphBuilder:
             ]
             
             # Use LLM without tools to force text generation
-            response = self.llm.invoke(forced_messages)
+            response = self._invoke_llm(self.llm, forced_messages)
+            response = self._with_listings(response, state['messages'])
             return {"messages": [response], "tool_calls_count": tool_calls_count}
         
         try:
-            response = self.llm_with_tools.invoke(messages)
+            response = self._invoke_llm(self.phase_llms[phase], messages)
             
             # Check what agent decided
             if hasattr(response, 'tool_calls') and response.tool_calls:
                 print(f"   🔧 Agent calling {len(response.tool_calls)} tool(s):")
+                memo = state.get('tool_memo') or {}
+                new_keys = set()
                 for tc in response.tool_calls:
                     tool_name = tc.get('name', 'unknown')
-                    print(f"      → {tool_name}")
+                    key = canonical_tool_key(tool_name, tc.get('args', {}))
+                    if key in memo or key in new_keys:
+                        print(f"      → {tool_name} (duplicate, served from memo)")
+                    else:
+                        new_keys.add(key)
+                        print(f"      → {tool_name}")
                 
-                # Increment tool call counter
-                new_count = tool_calls_count + len(response.tool_calls)
+                # Increment tool call counter (duplicates don't count against the budget)
+                new_count = tool_calls_count + len(new_keys)
                 return {"messages": [response], "tool_calls_count": new_count}
             else:
                 print(f"   ✏️ Agent generating final response")
+                # Answering early (e.g. after a failed search): a full plan is kept (listings
+                # get merged in below), anything shorter is rewritten with the synthesis prompt
+                if phase != "synthesis" and not is_complete_answer(message_text(response.content)):
+                    print(f"   🔁 Incomplete answer in the {phase} phase, regenerating with the synthesis prompt")
+                    # Streaming UIs drop the tokens shown so far (stream_mode "custom")
+                    get_stream_writer()({"reset_tokens": True})
+                    response = self._invoke_llm(
+                        self.llm, messages + [build_phase_prompt("synthesis", self.rendered_listings)]
+                    )
+                response = self._with_listings(response, state['messages'])
                 return {"messages": [response], "tool_calls_count": tool_calls_count}
             
         except Exception as e:
             print(f"   ❌ Agent error: {str(e)}")
             raise
 
+    def tools_node(self, state: AgentState):
+        """
+        Executes the requested tools, memoized for the run:
+        a call whose canonical (name, args) already ran gets the earlier result back.
+        """
+        last_message = state['messages'][-1]
+        memo = state.get('tool_memo') or {}
+
+        to_run = []
+        first_call_for_key = {}
+        for tc in last_message.tool_calls:
+            key = canonical_tool_key(tc['name'], tc.get('args', {}))
+            if key not in memo and key not in first_call_for_key:
+                first_call_for_key[key] = tc['id']
+                to_run.append(tc)
+
+        results = {}
+        new_memo = {}
+        if to_run:
+            output = self.tool_node.invoke(
+                {"messages": [AIMessage(content="", tool_calls=to_run)]}
+            )
+            results = {m.tool_call_id: m for m in output["messages"]}
+            for key, call_id in first_call_for_key.items():
+                message = results.get(call_id)
+                # Failed calls aren't memoized, so the agent may retry them. Most tools report
+                # failures as normal output ({"error": ...} JSON, "❌ Error ..."), not as exceptions
+                if (message is not None and getattr(message, "status", "success") != "error"
+                        and not is_error_result(message.content)):
+                    new_memo[key] = message.content
+
+        # One ToolMessage per requested call, in the original order
+        known = {**memo, **new_memo}
+        messages = []
+        for tc in last_message.tool_calls:
+            if tc['id'] in results:
+                messages.append(results[tc['id']])
+                continue
+            key = canonical_tool_key(tc['name'], tc.get('args', {}))
+            if key in known:
+                print(f"   ♻️ Reusing earlier result for {tc['name']}")
+                content = known[key]
+            else:
+                # Duplicate of a call in this same turn that failed
+                content = results[first_call_for_key[key]].content
+            messages.append(ToolMessage(content=content, name=tc['name'], tool_call_id=tc['id']))
+
+        return {"messages": messages, "tool_memo": new_memo}
+
     def should_continue(self, state: AgentState):
         """Route to tools or end"""
         last_message = state['messages'][-1]
         tool_calls_count = state.get('tool_calls_count', 0)
         
         # **FIX 2: Stop if tool limit reached**
-        if tool_calls_count >= 10:
+        if tool_calls_count >= self.max_tool_calls:
             print(f"   ➡️ Routing to END (tool limit reached)")
             return END
         
@@ -121,13 +267,18 @@ class GraphBuilder:
         print(f"   ➡️ Routing to END (response ready)")
         return END
 
-    def __call__(self):
-        """Build and compile the workflow graph"""
+    def __call__(self, durable: bool = True):
+        """
+        Build and compile the workflow graph.
+        With durable=True every node is checkpointed to SQLite under the run's
+        thread_id, so a failed run can be resumed with graph.invoke(None, config).
+        """
         workflow = StateGraph(AgentState)
 
         # Add nodes
         workflow.add_node("agent", self.agent_node)
-        workflow.add_node("tools", ToolNode(self.tools))
+        self.tool_node = ToolNode(self.tools)
+        workflow.add_node("tools", self.tools_node)
 
         # Add edges
         workflow.set_entry_point("agent")
@@ -141,5 +292,6 @@ class GraphBuilder:
         workflow.add_edge("tools", "agent")
 
         # Compile
+        checkpointer = get_checkpointer() if durable else None
         print("✅ Workflow compiled successfully")
-        return workflow.compile()
\ No newline at end of file
+        return workflow.compile(checkpointer=checkpointer)
\ No newline at end of file
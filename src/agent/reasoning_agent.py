@@ -1,5 +1,6 @@
 # This agent uses a Large Language Model (LLM) to clearly explain why a particular flight and hotel were chosen.
 from langchain_core.messages import SystemMessage, HumanMessage
+from src.utils.llm_clients import get_chat_client
 
 class ReasoningAgent:
     """
@@ -8,6 +9,11 @@ class ReasoningAgent:
     # it only explains narrates and compares
 
     def explain(self, llm, flight: dict, hotel: dict) -> str:
+        # No client handed in -> reuse the shared registry client instead of building a new one.
+        # Temperature 0 keeps the explanation a pure function of (flight, hotel), so it can be cached.
+        if llm is None:
+            llm = get_chat_client("openrouter", "openai/gpt-oss-120b", temperature=0, max_tokens=2000)
+
         prompt = [
             SystemMessage(content="You are an expert travel advisor."),
             HumanMessage(
@@ -26,4 +32,4 @@ class ReasoningAgent:
         ]
 
         return llm.invoke(prompt).content
-# Prompt is sent to the model,Model generates explanation,Only text output is returned
\ No newline at end of file
+# Prompt is sent to the model,Model generates explanation,Only text output is returned
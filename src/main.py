@@ -1,19 +1,35 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List
+import json
 import uuid
+import asyncio
 from datetime import datetime, timedelta
 from langchain_core.messages import HumanMessage
 from src.agent.agentic_workflow import GraphBuilder
+from src.prompt_library.prompt import build_trip_prompt
+from src.utils.quota_scheduler import QuotaExceeded
+from src.utils.checkpointer import record_thread, get_thread, cleanup_checkpoints
+from src.utils import job_queue
+from src.utils.job_queue import QueueFull
+from src.utils.plan_archive import archive_plan, plan_archive
+from src.utils.plan_worker import WorkerPool, PLAN_WORKERS_EMBEDDED
+from src.utils.fast_json import FastJSONResponse, json_response
+from src.utils.admission import AdmissionMiddleware, admission_stats, client_id
 
 # Initialize App
 app = FastAPI(
     title="AI Travel Planner - Multi-Agent System",
     description="Automated travel planning with Flight Agent, Hotel Agent, and Reasoning Agent",
-    version="2.0"
+    version="2.0",
+    default_response_class=FastJSONResponse,  # orjson when installed
 )
 
+# Per-client rate limits + global plan slots (added first so CORS also wraps its 429/503s)
+app.add_middleware(AdmissionMiddleware)
+
 # Enable CORS
 app.add_middleware(
     CORSMiddleware,
@@ -23,6 +39,48 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# SerpAPI quota rejections become 429s with a Retry-After hint
+@app.exception_handler(QuotaExceeded)
+async def quota_exceeded_handler(request: Request, exc: QuotaExceeded):
+    return JSONResponse(
+        status_code=429,
+        content={"error": str(exc), "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+# Full plan queue -> 429, the client should retry later
+@app.exception_handler(QueueFull)
+async def queue_full_handler(request: Request, exc: QueueFull):
+    return JSONResponse(
+        status_code=429,
+        content={"error": str(exc), "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.on_event("startup")
+def prune_old_checkpoints():
+    # Checkpoints are only useful for resuming recent runs
+    cleanup_checkpoints()
+    job_queue.cleanup_jobs()
+
+# Plan workers for /plan-jobs: `python -m src.utils.plan_worker`, or PLAN_WORKERS_EMBEDDED=1
+# to start them here (single-process uvicorn only: every process would start its own pool)
+worker_pool = WorkerPool() if PLAN_WORKERS_EMBEDDED else None
+
+@app.on_event("startup")
+def start_plan_workers():
+    if worker_pool:
+        worker_pool.start()
+        print(f"👷 Started {worker_pool.size} plan workers")
+    else:
+        print("👷 No embedded plan workers: run `python -m src.utils.plan_worker` to process /plan-jobs")
+
+@app.on_event("shutdown")
+def stop_plan_workers():
+    if worker_pool:
+        worker_pool.stop()
+    plan_archive.flush()
+
 # --- Pydantic Models ---
 class TripRequest(BaseModel):
     from_city: str
@@ -40,99 +98,124 @@ class FlightSearchRequest(BaseModel):
     travel_date: str
     return_date: Optional[str] = None
 
+class BatchTripRequest(BaseModel):
+    requests: List[TripRequest]
+    parallelism: Optional[int] = None
+
 class HotelSearchRequest(BaseModel):
     location: str
     check_in_date: str
     check_out_date: str
 
 # --- Core Logic (Exported Function) ---
-async def plan_trip_logic(req: TripRequest) -> dict:
+def trip_dates(req: TripRequest):
+    """(start, end) as YYYY-MM-DD; past or invalid start dates move to two days from now"""
+    try:
+        start_date_obj = datetime.fromisoformat(req.start_date)
+        if start_date_obj < datetime.now():
+            start_date_obj = datetime.now() + timedelta(days=2)
+    except:
+        start_date_obj = datetime.now() + timedelta(days=2)
+
+    final_start_date = start_date_obj.strftime("%Y-%m-%d")
+    checkout_date = (start_date_obj + timedelta(days=req.days)).strftime("%Y-%m-%d")
+    return final_start_date, checkout_date
+
+async def plan_trip_logic(req: TripRequest, thread_id: Optional[str] = None) -> dict:
     """
     Core logic extracted from the endpoint so it can be imported by Streamlit directly.
+    Plan workers pass their job id as thread_id.
     """
+    # Every run is checkpointed under its thread_id so it can be resumed if it fails
+    thread_id = thread_id or str(uuid.uuid4())
+    record_thread(thread_id, "running", request=req.model_dump())
     try:
         # 1. Initialize Graph
-        graph = GraphBuilder(model_provider="groq")()
+        builder = GraphBuilder(model_provider="pool")
+        graph = builder()
 
         # 2. Date Handling
-        try:
-            start_date_obj = datetime.fromisoformat(req.start_date)
-            if start_date_obj < datetime.now():
-                start_date_obj = datetime.now() + timedelta(days=2)
-        except:
-            start_date_obj = datetime.now() + timedelta(days=2)
-            
-        final_start_date = start_date_obj.strftime("%Y-%m-%d")
-        checkout_date = (start_date_obj + timedelta(days=req.days)).strftime("%Y-%m-%d")
+        final_start_date, checkout_date = trip_dates(req)
 
         # 3. Build Detailed Prompt
-        prompt = f"""TRIP PLANNING REQUEST
-
-📋 **TRIP PARAMETERS:**
-- Origin: {req.from_city}
-- Destination: {req.destination}
-- Start Date: {final_start_date}
-- End Date: {checkout_date}
-- Duration: {req.days} days
-- Travelers: {req.travelers} people
-- Budget Level: {req.budget}
-- Trip Vibe: {req.vibe}
-"""
-        if req.query:
-            prompt += f"\n🎨 **SPECIAL REQUESTS:**\n{req.query}\n"
-
-        prompt += f"""
-        
-🤖 **MULTI-AGENT EXECUTION PROTOCOL:**
-
-**STEP 1 - Flight Agent:**
-Execute: search_flights(origin="{req.from_city}", destination="{req.destination}", travel_date="{final_start_date}")
-→ Filter by price, layovers, travel time
-→ Display ALL flights in Budget/Moderate/Premium categories
-
-**STEP 2 - Hotel Agent:**
-Execute: search_hotels(location="{req.destination}", check_in_date="{final_start_date}", check_out_date="{checkout_date}")
-→ Analyze by location, budget, amenities
-→ Display ALL hotels in Budget/Moderate/Luxury categories
-
-**STEP 3 - Reasoning Agent (YOU):**
-→ Compare flight/hotel alternatives and explain trade-offs
-→ Recommend optimal choices based on {req.budget} budget and {req.vibe} vibe
-
-**STEP 4 - Dynamic Itinerary:**
-→ Generate {req.days} days of activities using REAL attraction names
-→ Include specific costs in ₹ INR
-
-**STEP 5 - Budget Breakdown:**
-→ Calculate GRAND TOTAL in ₹ INR (Flights + Hotels + Food + Activities)
-
-Execute this multi-agent workflow now.
-"""
+        prompt = build_trip_prompt(req, final_start_date, checkout_date, builder.rendered_listings)
 
         # 4. Invoke Graph
         state = {"messages": [HumanMessage(content=prompt)]}
-        thread_id = str(uuid.uuid4())
         config = {"configurable": {"thread_id": thread_id}}
         
-        output = graph.invoke(state, config=config)
+        # Off the event loop: a plan takes minutes and admission/health must keep answering
+        output = await asyncio.to_thread(graph.invoke, state, config=config)
         
         # 5. Extract Content
-        last_message = output["messages"][-1]
-        content = last_message.content
+        final_answer = _final_answer(output)
+        record_thread(thread_id, "completed", result=final_answer)
+        # Queued for the searchable archive (written in the background)
+        archive_plan(final_answer, _archive_metadata(req.model_dump(), final_start_date, checkout_date), thread_id)
+        return {"result": final_answer, "thread_id": thread_id}
 
-        if isinstance(content, list):
-            final_answer = "".join(
-                c.get("text", "") for c in content if isinstance(c, dict)
-            )
-        else:
-            final_answer = str(content)
+    except Exception as e:
+        import traceback
+        print(traceback.format_exc())
+        record_thread(thread_id, "failed", error=str(e))
+        return {"error": str(e), "thread_id": thread_id}
+
+
+def _archive_metadata(request: dict, start_date: Optional[str] = None, end_date: Optional[str] = None) -> dict:
+    return {
+        "origin": request.get("from_city"),
+        "destination": request.get("destination"),
+        "start_date": start_date or request.get("start_date"),
+        "end_date": end_date,
+        "days": request.get("days"),
+        "travelers": request.get("travelers"),
+        "vibe": request.get("vibe"),
+        "budget": request.get("budget"),
+    }
 
-        return {"result": final_answer}
 
+def _final_answer(output: dict) -> str:
+    """Text of the last message in a graph output"""
+    content = output["messages"][-1].content
+    if isinstance(content, list):
+        return "".join(c.get("text", "") for c in content if isinstance(c, dict))
+    return str(content)
+
+
+async def resume_plan_logic(thread_id: str) -> dict:
+    """
+    Continue a checkpointed run from its last completed node.
+    Finished runs just return their stored answer.
+    """
+    thread = get_thread(thread_id)
+    if thread is None:
+        raise HTTPException(status_code=404, detail=f"Unknown thread_id: {thread_id}")
+    if thread["status"] == "completed" and thread["result"]:
+        return {"result": thread["result"], "thread_id": thread_id}
+
+    graph = GraphBuilder(model_provider="pool")()
+    config = {"configurable": {"thread_id": thread_id}}
+    snapshot = await asyncio.to_thread(graph.get_state, config)
+    if not snapshot.values:
+        raise HTTPException(status_code=404, detail=f"No checkpoints left for thread_id: {thread_id}")
+
+    record_thread(thread_id, "running")
+    try:
+        if snapshot.next:
+            print(f"🔁 Resuming {thread_id} at {', '.join(snapshot.next)}")
+            output = await asyncio.to_thread(graph.invoke, None, config=config)
+        else:
+            # Graph already reached END, only the bookkeeping missed it
+            output = snapshot.values
+        final_answer = _final_answer(output)
+        record_thread(thread_id, "completed", result=final_answer)
+        archive_plan(final_answer, _archive_metadata(thread["request"] or {}), thread_id)
+        return {"result": final_answer, "thread_id": thread_id}
     except Exception as e:
         import traceback
         print(traceback.format_exc())
-        return {"error": str(e)}
+        record_thread(thread_id, "failed", error=str(e))
+        return {"error": str(e), "thread_id": thread_id}
 
 # --- API Endpoints ---
 
@@ -145,33 +228,187 @@ async def plan_trip(req: TripRequest):
     response = await plan_trip_logic(req)
     
     if "error" in response:
-        raise HTTPException(status_code=500, detail=response["error"])
+        # thread_id lets the client resume the run instead of starting over
+        raise HTTPException(status_code=500, detail={"error": response["error"], "thread_id": response["thread_id"]})
         
     return response
 
+@app.post("/plan-trip/{thread_id}/resume")
+async def resume_plan(thread_id: str):
+    """
+    Resume a failed /plan-trip run from its last checkpoint.
+    """
+    response = await resume_plan_logic(thread_id)
+
+    if "error" in response:
+        raise HTTPException(status_code=500, detail={"error": response["error"], "thread_id": thread_id})
+
+    return response
+
+@app.post("/plan-trips/batch")
+async def plan_trips_batch_endpoint(batch: BatchTripRequest, request: Request):
+    """
+    Plan many trips at once. Inputs shared across requests (IATA codes, flights, hotels,
+    weather, places) are fetched once; plans then run in parallel and stream back as
+    NDJSON lines in completion order.
+    """
+    from src.utils.batch_planner import plan_trips_batch, PLAN_BATCH_MAX_REQUESTS, PLAN_BATCH_PARALLELISM
+    if not batch.requests:
+        raise HTTPException(status_code=400, detail="Empty batch")
+    if len(batch.requests) > PLAN_BATCH_MAX_REQUESTS:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {PLAN_BATCH_MAX_REQUESTS} requests)")
+    print(f"Received batch of {len(batch.requests)} trip requests")
+
+    async def ndjson():
+        async for item in plan_trips_batch(batch.requests, batch.parallelism or PLAN_BATCH_PARALLELISM,
+                                           client=client_id(request.scope)):
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+@app.post("/plan-jobs", status_code=202)
+async def create_plan_job(req: TripRequest):
+    """
+    Queue a trip plan and return immediately; poll GET /plan-jobs/{job_id} for the result.
+    """
+    job_id = job_queue.enqueue(req.model_dump())
+    print(f"Queued plan job {job_id} for {req.destination}")
+    return {"job_id": job_id, "status": job_queue.QUEUED}
+
+@app.get("/plan-jobs/{job_id}")
+async def get_plan_job(job_id: str):
+    """
+    Status of a queued plan; includes the result once completed.
+    """
+    job = job_queue.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job_id: {job_id}")
+    response = {key: job[key] for key in ("status", "attempts", "created_at", "started_at", "finished_at")}
+    response["job_id"] = job_id
+    if "position" in job:
+        response["position"] = job["position"]
+    if job["status"] == job_queue.COMPLETED:
+        response["result"] = job["result"]
+    elif job["status"] == job_queue.FAILED:
+        # job_id is also the checkpoint thread_id, so failed jobs can be resumed
+        response["error"] = job["error"]
+    return response
+
+def _plan_markdown(plan_id: str) -> str:
+    """Finished plan text for a job id or /plan-trip thread id"""
+    job = job_queue.get_job(plan_id)
+    thread = None if job else get_thread(plan_id)
+    record = job or thread
+    if record is None:
+        # Older plans may only be left in the archive
+        archived = plan_archive.get(plan_id)
+        if archived is None:
+            raise HTTPException(status_code=404, detail=f"Unknown plan id: {plan_id}")
+        return archived["text"]
+    if record["status"] != "completed" or not record["result"]:
+        raise HTTPException(status_code=409, detail=f"Plan {plan_id} is {record['status']}, no result yet")
+    return record["result"]
+
+@app.get("/plans")
+async def search_plans(q: Optional[str] = None, destination: Optional[str] = None,
+                       origin: Optional[str] = None, vibe: Optional[str] = None,
+                       budget: Optional[str] = None, start_date: Optional[str] = None,
+                       limit: int = 20, offset: int = 0):
+    """
+    Search archived plans (full text + trip fields). Returns metadata only, newest first
+    or best match first when q is given. Page with limit/offset.
+    """
+    return plan_archive.search(q=q, limit=limit, offset=offset, destination=destination,
+                               origin=origin, vibe=vibe, budget=budget, start_date=start_date)
+
+@app.get("/plans/{plan_id}")
+async def get_plan(plan_id: str):
+    """
+    One archived plan with its full markdown text.
+    """
+    plan = plan_archive.get(plan_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail=f"Unknown plan id: {plan_id}")
+    return plan
+
+@app.get("/plans/{plan_id}/pdf")
+async def plan_pdf(plan_id: str):
+    """
+    PDF of a finished plan. Rendered on first request in the PDF process pool, then cached.
+    """
+    from src.utils.pdf_export import get_pdf_async
+    markdown = _plan_markdown(plan_id)
+    try:
+        pdf = await get_pdf_async("Travel Plan", markdown)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="PDF rendering timed out, try again shortly")
+    return Response(
+        content=pdf,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'attachment; filename="plan-{plan_id[:8]}.pdf"'},
+    )
+
 @app.post("/search-flights")
-async def search_flights_endpoint(req: FlightSearchRequest):
-    from src.tools.flight_serpapi_tool import search_flights
-    result = search_flights.invoke({
-        "origin": req.origin,
-        "destination": req.destination,
-        "travel_date": req.travel_date,
-        "return_date": req.return_date
-    })
-    import json
-    return json.loads(result)
+async def search_flights_endpoint(req: FlightSearchRequest, request: Request):
+    """Structured result straight from the search core (no tool JSON round trip)"""
+    from src.tools.flight_serpapi_tool import flight_search_result
+    result = await asyncio.to_thread(
+        flight_search_result, req.origin, req.destination, req.travel_date, req.return_date
+    )
+    return json_response(request, result)
 
 @app.post("/search-hotels")
-async def search_hotels_endpoint(req: HotelSearchRequest):
-    from src.tools.hotel_serpapi_tool import search_hotels
-    result = search_hotels.invoke({
-        "location": req.location,
-        "check_in_date": req.check_in_date,
-        "check_out_date": req.check_out_date
-    })
-    import json
-    return json.loads(result)
+async def search_hotels_endpoint(req: HotelSearchRequest, request: Request):
+    """Structured result straight from the search core (no tool JSON round trip)"""
+    from src.tools.hotel_serpapi_tool import hotel_search_result
+    result = await asyncio.to_thread(
+        hotel_search_result, req.location, req.check_in_date, req.check_out_date
+    )
+    return json_response(request, result)
+
+@app.get("/price-history")
+async def price_history_endpoint(destination: str, origin: Optional[str] = None, month: Optional[str] = None):
+    """
+    Cheapest known days to fly origin -> destination and typical hotel prices at the
+    destination, from earlier searches (no SerpAPI call). month = YYYY-MM.
+    """
+    from src.tools.price_history_tool import price_history_result
+    # to_thread: city names may need an IATA lookup the first time
+    return await asyncio.to_thread(price_history_result, destination, origin, month)
 
 @app.get("/health")
 async def health():
     return {"status": "healthy"}
+
+@app.get("/metrics")
+async def metrics():
+    """Operational counters for upstream providers"""
+    from src.utils.latency_stats import latency_tracker
+    from src.utils.hedged_request import hedge_stats
+    from src.utils.resilience import breaker_states
+    from src.utils.quota_scheduler import serpapi_scheduler
+    from src.utils.llm_pool import pool_stats
+    from src.utils.llm_clients import http_pool_stats
+    from src.utils.llm_cache import llm_cache_stats
+    from src.utils.tiered_cache import cache_stats
+    from src.utils.pdf_export import pdf_stats
+    from src.utils.fast_json import response_stats
+    from src.utils.price_history import price_history
+    from src.utils.geo_index import geo_stats
+    return {
+        "latency": latency_tracker.snapshot(),
+        "hedging": hedge_stats(),
+        "breakers": breaker_states(),
+        "serpapi_quota": serpapi_scheduler.snapshot(),
+        "llm_pool": pool_stats(),
+        "llm_http_pool": http_pool_stats(),
+        "llm_cache": llm_cache_stats(),
+        "api_cache": cache_stats(),
+        "pdf_export": pdf_stats(),
+        "plan_archive": plan_archive.snapshot(),
+        "search_responses": response_stats(),
+        "admission": admission_stats(),
+        "price_history": price_history.snapshot(),
+        "geo": geo_stats(),
+        "plan_jobs": {**job_queue.queue_stats(), "workers_alive": worker_pool.alive() if worker_pool else None},
+    }
@@ -0,0 +1 @@
+# Keep this package import-light: tools are loaded on demand via src.tools.registry
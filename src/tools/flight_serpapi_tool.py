@@ -3,11 +3,14 @@ import os
 import json
 from datetime import datetime, timedelta
 from typing import Optional
-import serpapi
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool
-from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
+from src.utils.resilience import get_guard, serpapi_failed
+from src.utils.quota_scheduler import serpapi_scheduler
+from src.utils.llm_clients import get_chat_client
+from src.utils.tiered_cache import get_cache, cache_key
+from src.utils.price_history import price_history
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -16,8 +19,9 @@ load_dotenv()
 # 1. LLM SETUP & HELPER
 # ==========================================
 
-# Initialize Groq LLM (Ensure GROQ_API_KEY is in your environment variables)
-llm = ChatGroq(model="meta-llama/llama-4-scout-17b-16e-instruct", temperature=0)
+# Groq LLM for IATA lookups (Ensure GROQ_API_KEY is in your environment variables).
+# Comes from the shared client registry, so it reuses the common connection pool.
+IATA_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
 
 # This part uses a Llama-4 model as a specialized translator.
 # It follows strict rules: only 3 letters, uppercase, and prefers primary airports (e.g., Paris → CDG).
@@ -48,15 +52,24 @@ def get_iata_code_from_llm(location_name: str) -> str:
         ("user", "Location: {location}")
     ])
     
-    chain = prompt | llm
-    
+    # Airport codes don't change; cached across workers so each city is resolved once
+    iata_cache = get_cache("iata")
+    key = cache_key(" ".join(location_name.split()).casefold())
+    cached = iata_cache.get(key)
+    if cached:
+        return cached
+
     try:
+        llm = get_chat_client("groq", IATA_MODEL, temperature=0)
+        chain = prompt | llm
+
         # Invoke LLM
         response = chain.invoke({"location": location_name})
         code = response.content.strip().upper()
         
         # Validation: Code must be exactly 3 letters
         if len(code) == 3 and code.isalpha():
+            iata_cache.set(key, code)
             return code
         return "UNKNOWN"
         
@@ -114,10 +127,24 @@ def _execute_search(origin_code, dest_code, date_str, ret_date_str=None):
     if ret_date_str: 
         params["return_date"] = ret_date_str
 
+    # Cached results cost no SerpAPI quota (key excludes the api_key)
+    serpapi_cache = get_cache("serpapi")
+    key = cache_key({k: v for k, v in params.items() if k != "api_key"})
+    cached = serpapi_cache.get(key)
+    if cached is not None:
+        print(f"\n✈️ FLIGHT SEARCH (cached): {origin_code} → {dest_code} on {date_str}")
+        return cached
+
+    # Take a SerpAPI token first; QuotaExceeded propagates so callers can answer 429
+    serpapi_scheduler.acquire()
+
     try:
         print(f"\n✈️ FLIGHT SEARCH: {origin_code} → {dest_code} on {date_str}")
+        import serpapi  # imported on first search, keeps tool imports light
+        guard = get_guard("serpapi_flights")
         search = serpapi.GoogleSearch(params)
-        results = search.get_dict()
+        search.timeout = guard.timeout()  # SerpApiClient defaults to effectively no timeout
+        results = guard.call(search.get_dict, is_failure=serpapi_failed)
         
         if "error" in results:
             print(f"   ❌ API Error: {results['error']}")
@@ -127,6 +154,7 @@ def _execute_search(origin_code, dest_code, date_str, ret_date_str=None):
         other_count = len(results.get("other_flights", []))
         print(f"   ✅ Found: {best_count} best + {other_count} other flights")
         
+        serpapi_cache.set(key, results)
         return results
         
     except Exception as e:
@@ -234,12 +262,10 @@ def _process_results(results):
 # ==========================================
 # Once it has a list of flights, it sorts them by Price → Duration → Layovers. 
 # It then splits them into three buckets budget,moderate,premium
-@tool(args_schema=FlightSearchInput)
-def search_flights(origin: str, destination: str, travel_date: str, return_date: Optional[str] = None) -> str:
+def flight_search_result(origin: str, destination: str, travel_date: str, return_date: Optional[str] = None) -> dict:
     """
-    Search flights between cities worldwide.
-    Automatically resolves city names (e.g. 'Tokyo', 'NYC') to IATA codes using an AI Agent.
-    Returns categorized options in INR.
+    Structured flight search result (the REST endpoint returns this as-is,
+    the agent tool below serializes it once).
     """
     
     # 1. RESOLVE LOCATIONS USING LLM
@@ -266,13 +292,14 @@ def search_flights(origin: str, destination: str, travel_date: str, return_date:
     results = _execute_search(origin_code, dest_code, travel_date, return_date)
     
     if "error" in results:
-        return json.dumps({
+        return {
             "error": f"Could not find flights from {origin} ({origin_code}) to {destination} ({dest_code})",
             "details": results.get("error")
-        })
+        }
     
     # 4. PROCESS & FILTER
     flights = _process_results(results)
+    priced_date = travel_date
     
     # Fallback to next week if no flights found today
     if not flights:
@@ -280,11 +307,16 @@ def search_flights(origin: str, destination: str, travel_date: str, return_date:
         print(f"   🔄 No flights found. Trying fallback date: {fallback_date}")
         fallback_results = _execute_search(origin_code, dest_code, fallback_date, None)
         flights = _process_results(fallback_results)
+        priced_date = fallback_date
         
         if not flights:
-            return json.dumps({
+            return {
                 "error": f"No flights available for {origin} to {destination} even on fallback dates."
-            })
+            }
+
+    # Keep the prices for "cheapest day" lookups (one-way fares only, round trips price differently)
+    if not return_date:
+        price_history.record_flights(origin_code, dest_code, priced_date, flights)
     
     # 5. CATEGORIZE (Budget vs Moderate vs Premium)
     flights.sort(key=lambda x: (x['Price'], x['DurationMinutes'], x['Layovers']))
@@ -301,11 +333,25 @@ def search_flights(origin: str, destination: str, travel_date: str, return_date:
             f['Category'] = "Premium"
             f['Recommendation'] = "Best service and timing"
     
-    return json.dumps({
+    return {
         "route": f"{origin} ({origin_code}) → {destination} ({dest_code})",
         "search_date": travel_date,
         "flights": flights,
         "count": len(flights),
         "currency": "INR",
         "agent_note": "Flight Agent evaluated based on price, duration, and layovers"
-    }, indent=2) 
+    }
+
+
+@tool(args_schema=FlightSearchInput)
+def search_flights(origin: str, destination: str, travel_date: str, return_date: Optional[str] = None) -> str:
+    """
+    Search flights between cities worldwide.
+    Automatically resolves city names (e.g. 'Tokyo', 'NYC') to IATA codes using an AI Agent.
+    Returns categorized options in INR.
+    """
+    result = flight_search_result(origin, destination, travel_date, return_date)
+    if "error" in result:
+        return json.dumps(result)
+    return json.dumps(result, indent=2)
+
@@ -3,27 +3,29 @@
 # an AI agent to reason on
 import os
 import json
-import serpapi
 from datetime import datetime, timedelta
 from typing import Optional
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool
+from src.utils.resilience import get_guard, serpapi_failed
+from src.utils.quota_scheduler import serpapi_scheduler
+from src.utils.tiered_cache import get_cache, cache_key
+from src.utils.price_history import price_history
 
 class HotelSearchInput(BaseModel):
     location: str = Field(description="City or location name")
     check_in_date: str = Field(description="Check-in date YYYY-MM-DD")
     check_out_date: str = Field(description="Check-out date YYYY-MM-DD")
 
-@tool(args_schema=HotelSearchInput)
-def search_hotels(location: str, check_in_date: str, check_out_date: str) -> str:
+def hotel_search_result(location: str, check_in_date: str, check_out_date: str) -> dict:
     """
-    Search for hotels globally and return categorized results in INR.
-    Returns 5-10 hotels per category (Budget, Moderate, Luxury) with ratings 4.0-5.0.
+    Structured hotel search result (the REST endpoint returns this as-is,
+    the agent tool below serializes it once).
     """
     
     api_key = os.getenv("SERPAPI_API_KEY")
     if not api_key: 
-        return json.dumps({"error": "Missing SERPAPI_API_KEY"})
+        return {"error": "Missing SERPAPI_API_KEY"}
 
     # --- 1. Date Validation ---
     # This block handles bad or past dates:
@@ -63,19 +65,43 @@ def search_hotels(location: str, check_in_date: str, check_out_date: str) -> str
         "api_key": api_key
     }
 
+    from src.utils import geo_index  # numpy, loaded on first search
+    attractions = None
+
+    # Cached results cost no SerpAPI quota (key excludes the api_key)
+    serpapi_cache = get_cache("serpapi")
+    key = cache_key({k: v for k, v in params.items() if k != "api_key"})
+    results = serpapi_cache.get(key)
+
+    # Take a SerpAPI token first; QuotaExceeded propagates so callers can answer 429
+    if results is None:
+        serpapi_scheduler.acquire()
+
     try:
-        print(f"\n🏨 HOTEL SEARCH: {location} ({nights} nights)")
-        search = serpapi.GoogleSearch(params)
-        results = search.get_dict()
+        if results is None:
+            print(f"\n🏨 HOTEL SEARCH: {location} ({nights} nights)")
+            # Live search going ahead: look up the attraction coordinates meanwhile
+            # (cache hits are scored against the attractions already indexed)
+            if geo_index.GEO_ENABLED:
+                attractions = geo_index.prefetch_attractions(location)
+            import serpapi  # imported on first search, keeps tool imports light
+            guard = get_guard("serpapi_hotels")
+            search = serpapi.GoogleSearch(params)
+            search.timeout = guard.timeout()  # SerpApiClient defaults to effectively no timeout
+            results = guard.call(search.get_dict, is_failure=serpapi_failed)
+            if "error" not in results:
+                serpapi_cache.set(key, results)
+        else:
+            print(f"\n🏨 HOTEL SEARCH (cached): {location} ({nights} nights)")
         # Now you receive raw Google hotel data,This data is huge, noisy, and messy.
         
         if "error" in results:
-            return json.dumps({"error": results["error"]})
+            return {"error": results["error"]}
         
         properties = results.get("properties", [])
         
         if not properties:
-            return json.dumps({"error": f"No hotels found in {location}"})
+            return {"error": f"No hotels found in {location}"}
 
         processed = []
         seen_names = set()
@@ -111,14 +137,18 @@ def search_hotels(location: str, check_in_date: str, check_out_date: str) -> str
             amenities = hotel.get("amenities", [])[:3] # Only top 3 amenities
             amenities_str = ", ".join(amenities) if amenities else "Standard"
             
-            processed.append({
+            entry = {
                 "Name": name,
                 "Rat": rating,             # Shortened key
                 "Price": price,            # Raw integer for sorting
                 "Total": price * nights,   # Total cost
                 "Loc": addr,               # Shortened key
                 "Amens": amenities_str     # Shortened key
-            })
+            }
+            # Coordinates for the location score (4 decimals ~ 10 m), dropped before returning
+            if gps.get("latitude") is not None and gps.get("longitude") is not None:
+                entry["GPS"] = [round(gps["latitude"], 4), round(gps["longitude"], 4)]
+            processed.append(entry)
 
         # --- 3. Categorization Logic (Target: 5-10 per group) ---
         
@@ -140,16 +170,27 @@ def search_hotels(location: str, check_in_date: str, check_out_date: str) -> str
         for h in moderate: h['Cat'] = "Moderate"
         for h in luxury: h['Cat'] = "Luxury"
 
+        # Location score: how many top attractions each hotel is close to
+        near_attractions = []
+        if geo_index.GEO_ENABLED:
+            near_attractions = geo_index.score_hotels(location, budget + moderate + luxury, attractions)
+            if near_attractions and geo_index.GEO_RANK_HOTELS:
+                budget, moderate, luxury = (geo_index.rank_hotels(g) for g in (budget, moderate, luxury))
+        for h in budget + moderate + luxury:
+            h.pop("GPS", None)  # kept in the geo index; only Near / AttrKm go to the LLM
+
         final_list = budget + moderate + luxury
         
         print(f"   📊 Returning: {len(budget)} Budget, {len(moderate)} Moderate, {len(luxury)} Luxury")
 
         if not final_list:
-             return json.dumps({"error": f"No 4-star+ hotels found in {location}"})
+             return {"error": f"No 4-star+ hotels found in {location}"}
 
-        # --- 4. Return Compact JSON ---
-        # separators=(',', ':') removes all whitespace to save ~30% tokens
-        return json.dumps({
+        # Keep the nightly prices for "typical hotel price" lookups
+        price_history.record_hotels(location, check_in_date, final_list)
+
+        # --- 4. Return Compact Result ---
+        result = {
             "loc": location,
             "nights": nights,
             "hotels": final_list,
@@ -159,9 +200,25 @@ def search_hotels(location: str, check_in_date: str, check_out_date: str) -> str
                 "luxury": len(luxury)
             },
             "cur": "INR"
-        }, separators=(',', ':'))
+        }
+        if near_attractions:
+            # Near = how many of these are within km, AttrKm = mean km to them
+            result["near"] = {"km": geo_index.GEO_NEAR_KM, "attractions": near_attractions}
+        return result
 
     except Exception as e:
         print(f"   ❌ Exception: {str(e)}")
-        return json.dumps({"error": f"Hotel search failed: {str(e)}"})
+        return {"error": f"Hotel search failed: {str(e)}"}
+
 
+@tool(args_schema=HotelSearchInput)
+def search_hotels(location: str, check_in_date: str, check_out_date: str) -> str:
+    """
+    Search for hotels globally and return categorized results in INR.
+    Returns 5-10 hotels per category (Budget, Moderate, Luxury) with ratings 4.0-5.0.
+    """
+    result = hotel_search_result(location, check_in_date, check_out_date)
+    if "error" in result:
+        return json.dumps(result)
+    # separators=(',', ':') removes all whitespace to save ~30% tokens
+    return json.dumps(result, separators=(',', ':'))
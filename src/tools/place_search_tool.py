@@ -1,9 +1,29 @@
 import os
+import re
+import json
+from concurrent.futures import ThreadPoolExecutor
 from src.utils.place_info_search import GooglePlaceSearchTool, TavilyPlaceSearchTool
+from src.utils.hedged_request import HedgedRequest
 from typing import List
-from langchain.tools import tool
+from langchain_core.tools import tool
 from dotenv import load_dotenv
 
+# Max characters kept per category in the discover_destination payload
+DISCOVERY_SECTION_CHARS = int(os.getenv("DISCOVERY_SECTION_CHARS", "1500"))
+
+# Category fan-out for discover_destination (separate from the hedge pool so they can't starve each other)
+_discovery_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="discover")
+
+def _compact(text, limit: int = DISCOVERY_SECTION_CHARS) -> str:
+    """Strip noise (place IDs, blank lines) and cap the size of one category"""
+    text = str(text)
+    text = "\n".join(
+        line.strip() for line in text.splitlines()
+        if line.strip() and not line.strip().startswith("Google place ID")
+    )
+    text = re.sub(r"[ \t]+", " ", text)
+    return text[:limit] + "..." if len(text) > limit else text
+
 # it onlt set up tools ,configure apis, exposes them to agents
 class PlaceSearchTool:
     def __init__(self):
@@ -11,52 +31,100 @@ class PlaceSearchTool:
         self.google_api_key = os.environ.get("GPLACES_API_KEY")
         self.google_places_search = GooglePlaceSearchTool(self.google_api_key)
         self.tavily_search = TavilyPlaceSearchTool()
+        # Google is primary; Tavily is fired in parallel if Google is slower than usual
+        # (both are wrapped in ProviderGuards, which record their latency)
+        self.hedge = HedgedRequest(primary="google_places", fallback="tavily", record_latency=False)
         self.place_search_tool_list = self._setup_tools()
 
+    def _hedged_search(self, google_fn, tavily_fn, place: str, google_label: str, tavily_label: str) -> str:
+        """Run Google and Tavily as a hedged pair and format whichever answers first"""
+        provider, result = self.hedge.run(lambda: google_fn(place), lambda: tavily_fn(place))
+        if provider == "google_places":
+            return f"{google_label} as suggested by google: {result}"
+        return f"{tavily_label}: {result}"
+
     def _setup_tools(self) -> List:
         """Setup all tools for the place search tool"""
         @tool
         def search_attractions(place:str) -> str:
             """Search attractions of a place"""
-            try:
-                attraction_result = self.google_places_search.google_search_attractions(place)
-                if attraction_result:
-                    return f"Following are the attractions of {place} as suggested by google: {attraction_result}"
-            except Exception as e:
-                tavily_result = self.tavily_search.tavily_search_attractions(place)
-                return f"Google cannot find the details due to {e}. \nFollowing are the attractions of {place}: {tavily_result}"  ## Fallback search using tavily in case google places fail
-        
+            return self._hedged_search(
+                self.google_places_search.google_search_attractions,
+                self.tavily_search.tavily_search_attractions,
+                place,
+                f"Following are the attractions of {place}",
+                f"Following are the attractions of {place}",
+            )
+
         @tool
         def search_restaurants(place:str) -> str:
             """Search restaurants of a place"""
-            try:
-                restaurants_result = self.google_places_search.google_search_restaurants(place)
-                if restaurants_result:
-                    return f"Following are the restaurants of {place} as suggested by google: {restaurants_result}"
-            except Exception as e:
-                tavily_result = self.tavily_search.tavily_search_restaurants(place)
-                return f"Google cannot find the details due to {e}. \nFollowing are the restaurants of {place}: {tavily_result}"  ## Fallback search using tavily in case google places fail
-        
+            return self._hedged_search(
+                self.google_places_search.google_search_restaurants,
+                self.tavily_search.tavily_search_restaurants,
+                place,
+                f"Following are the restaurants of {place}",
+                f"Following are the restaurants of {place}",
+            )
+
         @tool
         def search_activities(place:str) -> str:
             """Search activities of a place"""
-            try:
-                restaurants_result = self.google_places_search.google_search_activity(place)
-                if restaurants_result:
-                    return f"Following are the activities in and around {place} as suggested by google: {restaurants_result}"
-            except Exception as e:
-                tavily_result = self.tavily_search.tavily_search_activity(place)
-                return f"Google cannot find the details due to {e}. \nFollowing are the activities of {place}: {tavily_result}"  ## Fallback search using tavily in case google places fail
-        
+            return self._hedged_search(
+                self.google_places_search.google_search_activity,
+                self.tavily_search.tavily_search_activity,
+                place,
+                f"Following are the activities in and around {place}",
+                f"Following are the activities of {place}",
+            )
+
         @tool
         def search_transportation(place:str) -> str:
             """Search transportation of a place"""
-            try:
-                restaurants_result = self.google_places_search.google_search_transportation(place)
-                if restaurants_result:
-                    return f"Following are the modes of transportation available in {place} as suggested by google: {restaurants_result}"
-            except Exception as e:
-                tavily_result = self.tavily_search.tavily_search_transportation(place)
-                return f"Google cannot find the details due to {e}. \nFollowing are the modes of transportation available in {place}: {tavily_result}"  ## Fallback search using tavily in case google places fail
-        
-        return [search_attractions, search_restaurants, search_activities, search_transportation]
\ No newline at end of file
+            return self._hedged_search(
+                self.google_places_search.google_search_transportation,
+                self.tavily_search.tavily_search_transportation,
+                place,
+                f"Following are the modes of transportation available in {place}",
+                f"Following are the modes of transportation available in {place}",
+            )
+
+        @tool
+        def discover_destination(place: str) -> str:
+            """
+            Discover a destination in ONE call: attractions, restaurants, activities and
+            local transportation are fetched together. Prefer this over calling the
+            individual place tools one by one. Results don't depend on the trip's vibe;
+            pick the spots that match it from what comes back.
+            """
+            categories = {
+                "attractions": (self.google_places_search.google_search_attractions,
+                                self.tavily_search.tavily_search_attractions),
+                "restaurants": (self.google_places_search.google_search_restaurants,
+                                self.tavily_search.tavily_search_restaurants),
+                "activities": (self.google_places_search.google_search_activity,
+                               self.tavily_search.tavily_search_activity),
+                "transportation": (self.google_places_search.google_search_transportation,
+                                   self.tavily_search.tavily_search_transportation),
+            }
+
+            print(f"\n🧭 DISCOVERY: {place} ({', '.join(categories)}) in parallel")
+            futures = {
+                name: _discovery_executor.submit(
+                    self.hedge.run, (lambda g=g: g(place)), (lambda t=t: t(place))
+                )
+                for name, (g, t) in categories.items()
+            }
+
+            payload = {"place": place}
+            for name, future in futures.items():
+                try:
+                    provider, result = future.result()
+                    payload[name] = {"src": provider, "data": _compact(result)}
+                except Exception as e:
+                    payload[name] = {"error": str(e)[:200]}
+
+            # Compact JSON, same as the hotel tool, to keep the context small
+            return json.dumps(payload, separators=(',', ':'), ensure_ascii=False)
+
+        return [search_attractions, search_restaurants, search_activities, search_transportation, discover_destination]
@@ -0,0 +1,44 @@
+# price_history_tool.py answers "cheapest day to fly X -> Y this month" and "typical hotel
+# price in Z" from the local price history (src/utils/price_history.py) that every
+# search_flights / search_hotels call feeds. No SerpAPI call, so it's instant and free;
+# it only knows dates and places that were searched before.
+import json
+from typing import Optional
+from pydantic import BaseModel, Field
+from langchain_core.tools import tool
+from src.utils.price_history import price_history
+
+
+class PriceHistoryInput(BaseModel):
+    destination: str = Field(description="Destination city (hotel prices are for this city)")
+    origin: Optional[str] = Field(default=None, description="Origin city, to also get the cheapest days to fly")
+    month: Optional[str] = Field(default=None, description="Month to look at, YYYY-MM (default: all upcoming dates)")
+
+
+def _iata(city: str) -> str:
+    city = city.strip()
+    if len(city) == 3 and city.isalpha() and city.isupper():
+        return city
+    from src.tools.flight_serpapi_tool import get_iata_code_from_llm  # cached per city
+    code = get_iata_code_from_llm(city)
+    return city if code == "UNKNOWN" else code
+
+
+def price_history_result(destination: str, origin: Optional[str] = None, month: Optional[str] = None) -> dict:
+    """Cheapest known flight days (if origin is given) and typical hotel prices for destination"""
+    result = {"hotels": price_history.hotel_summary(destination, month)}
+    if origin:
+        result["flights"] = price_history.cheapest_days(_iata(origin), _iata(destination), month)
+    known = result["hotels"]["days_known"] + result.get("flights", {}).get("days_known", 0)
+    if not known:
+        result["note"] = "No price history yet for this route/month - use search_flights / search_hotels"
+    return result
+
+
+@tool(args_schema=PriceHistoryInput)
+def get_price_history(destination: str, origin: Optional[str] = None, month: Optional[str] = None) -> str:
+    """
+    Past prices from earlier searches, answered locally without a live search.
+    Use for "cheapest day to fly" or "typical hotel price" questions; prices in INR.
+    """
+    return json.dumps(price_history_result(destination, origin, month), separators=(',', ':'))
@@ -0,0 +1,50 @@
+# Lazy tool registry.
+# Tool modules are imported the first time a tool is requested (not when the agent
+# module is imported), and provider SDKs inside them load on the first actual call.
+import threading
+from importlib import import_module
+from typing import Dict, List, Optional
+
+# Agent tools in binding order: name -> (module, attribute)
+# Place tools come from one shared PlaceSearchTool instance instead of module attributes.
+TOOL_SPECS = {
+    "search_flights": ("src.tools.flight_serpapi_tool", "search_flights"),
+    "search_hotels": ("src.tools.hotel_serpapi_tool", "search_hotels"),
+    "get_weather_forecast": ("src.tools.weather_info_tool", "get_weather_forecast"),
+    "get_price_history": ("src.tools.price_history_tool", "get_price_history"),
+    "search_attractions": None,
+    "search_restaurants": None,
+    "search_activities": None,
+    "search_transportation": None,
+    "discover_destination": None,
+}
+
+_loaded: Dict[str, object] = {}
+_lock = threading.Lock()
+
+
+def _load_place_tools() -> None:
+    from src.tools.place_search_tool import PlaceSearchTool
+    for t in PlaceSearchTool().place_search_tool_list:
+        _loaded[t.name] = t
+
+
+def get_tool(name: str):
+    """Tool by name, importing its module on first use"""
+    with _lock:
+        if name not in _loaded:
+            if name not in TOOL_SPECS:
+                raise KeyError(f"Unknown tool: {name}")
+            spec = TOOL_SPECS[name]
+            if spec is None:
+                _load_place_tools()
+            else:
+                module, attr = spec
+                _loaded[name] = getattr(import_module(module), attr)
+        return _loaded[name]
+
+
+def get_tools(names: Optional[List[str]] = None) -> List:
+    """Tools in registry order (all of them by default)"""
+    wanted = set(names) if names is not None else set(TOOL_SPECS)
+    return [get_tool(name) for name in TOOL_SPECS if name in wanted]
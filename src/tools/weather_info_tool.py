@@ -9,9 +9,11 @@ from collections import defaultdict
 # Group weather by date
 from typing import Optional
 # Travel date may or may not exist
-from langchain.tools import tool
+from langchain_core.tools import tool
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
+from src.utils.resilience import get_guard
+from src.utils.tiered_cache import get_cache, cache_key
 
 load_dotenv()
 
@@ -35,16 +37,30 @@ def get_weather_forecast(city: str, travel_date: Optional[str] = None) -> str:
     url = f"http://api.openweathermap.org/data/2.5/forecast?q={city}&appid={api_key}&units=metric"
     # This endpoint returns 5 days,Data comes in 3-hour intervals,Around 40 entries total
 
+    # The raw forecast is cached per city; travel_date only changes how it's sliced
+    weather_cache = get_cache("weather")
+    key = cache_key("forecast", " ".join(city.split()).casefold())
+
     try:
-        print(f"\n🌦️ WEATHER API CALL: {city} for date: {travel_date}")
-        response = requests.get(url, timeout=10)
-        # Timeout prevents the app from hanging forever.
-        data = response.json()
-
-        if response.status_code != 200:
-            error_msg = data.get('message', 'Unknown error')
-            print(f"   ❌ API Error: {error_msg}")
-            return f"❌ Error fetching weather for {city}: {error_msg}"
+        data = weather_cache.get(key)
+        if data is None:
+            print(f"\n🌦️ WEATHER API CALL: {city} for date: {travel_date}")
+            guard = get_guard("openweathermap")
+            response = guard.call(
+                requests.get, url,
+                timeout=guard.timeout(),
+                is_failure=lambda r: r.status_code >= 500,
+            )
+            # Timeout adapts to observed latency; the breaker fails fast if the API is down.
+            data = response.json()
+
+            if response.status_code != 200:
+                error_msg = data.get('message', 'Unknown error')
+                print(f"   ❌ API Error: {error_msg}")
+                return f"❌ Error fetching weather for {city}: {error_msg}"
+            weather_cache.set(key, data)
+        else:
+            print(f"\n🌦️ WEATHER (cached): {city} for date: {travel_date}")
 
         if 'list' not in data or not data['list']:
             return f"⚠️ No weather data available for {city}"
@@ -0,0 +1 @@
+# Keep this package import-light: modules here import provider SDKs only when first used
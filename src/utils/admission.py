@@ -0,0 +1,321 @@
+# Admission control for the FastAPI service.
+# One client hammering /plan-trip shouldn't be able to take every worker and burn the
+# shared LLM / SerpAPI budgets, so requests to the expensive routes are admitted in two steps:
+#   1. per-client token buckets (API key, else IP): over the rate -> 429 + Retry-After
+#   2. plan runs take a slot under a global in-flight cap, derived from the measured
+#      plan latency (Little's law: cap = sustainable plans/s x p90 latency). Extra requests
+#      queue, unless the expected queueing time would push them past the latency SLO:
+#      those are shed right away with 503 + Retry-After instead of timing out later.
+# A batch call is admitted per plan, not per HTTP call: each plan in it waits for its own
+# token, client in-flight unit and slot (batch_plan_slot) instead of being rejected.
+import os
+import math
+import time
+import json
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+from src.utils.latency_stats import latency_tracker
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+# Per-client rates (requests per minute) and bursts
+ADMISSION_PLAN_RATE_PER_MIN = float(os.getenv("ADMISSION_PLAN_RATE_PER_MIN", "6"))
+ADMISSION_PLAN_BURST = float(os.getenv("ADMISSION_PLAN_BURST", "3"))
+ADMISSION_SEARCH_RATE_PER_MIN = float(os.getenv("ADMISSION_SEARCH_RATE_PER_MIN", "30"))
+ADMISSION_SEARCH_BURST = float(os.getenv("ADMISSION_SEARCH_BURST", "10"))
+# Plan runs one client may have in flight at once
+ADMISSION_CLIENT_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_CLIENT_MAX_IN_FLIGHT", "2"))
+# Global cap: plans/minute the LLM + SerpAPI budgets sustain, bounded by min/max slots
+ADMISSION_PLAN_THROUGHPUT_PER_MIN = float(os.getenv("ADMISSION_PLAN_THROUGHPUT_PER_MIN", "12"))
+ADMISSION_MIN_IN_FLIGHT = int(os.getenv("ADMISSION_MIN_IN_FLIGHT", "1"))
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "8"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "16"))
+# End-to-end latency a plan request should stay under (queueing + run)
+PLAN_LATENCY_SLO = float(os.getenv("PLAN_LATENCY_SLO", "120"))
+# Assumed plan latency until enough runs were measured
+PLAN_LATENCY_DEFAULT = float(os.getenv("PLAN_LATENCY_DEFAULT", "45"))
+# Use the first X-Forwarded-For hop as the client IP (only behind a trusted proxy)
+ADMISSION_TRUST_PROXY = os.getenv("ADMISSION_TRUST_PROXY", "0") == "1"
+
+# Clients whose buckets are kept (least recently seen are dropped first)
+MAX_TRACKED_CLIENTS = 10000
+PLAN_LATENCY_KEY = "plan"
+
+
+class TokenBucket:
+    def __init__(self, rate_per_min: float, burst: float):
+        self.rate = rate_per_min / 60
+        self.capacity = max(burst, 1)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def take(self) -> float:
+        """0 if a token was taken, else seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+
+class ClientLimiter:
+    """One token bucket per client, LRU-bounded"""
+
+    def __init__(self, rate_per_min: float, burst: float):
+        self.rate_per_min = rate_per_min
+        self.burst = burst
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, client: str) -> float:
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = TokenBucket(self.rate_per_min, self.burst)
+                while len(self._buckets) > MAX_TRACKED_CLIENTS:
+                    self._buckets.popitem(last=False)
+            self._buckets.move_to_end(client)
+            return bucket.take()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(f"Server busy ({reason}); retry after {self.retry_after}s")
+
+
+class PlanGate:
+    """Global in-flight cap for plan runs with a bounded, SLO-aware wait queue"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.waiting = 0
+        self._cond: Optional[asyncio.Condition] = None
+
+    def _condition(self) -> asyncio.Condition:
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    @staticmethod
+    def latency(pct: float) -> float:
+        return latency_tracker.percentile(PLAN_LATENCY_KEY, pct, default=PLAN_LATENCY_DEFAULT)
+
+    def limit(self) -> int:
+        """Slots = sustainable plans per second x p90 plan latency"""
+        slots = math.ceil(ADMISSION_PLAN_THROUGHPUT_PER_MIN / 60 * self.latency(90))
+        return max(ADMISSION_MIN_IN_FLIGHT, min(ADMISSION_MAX_IN_FLIGHT, slots))
+
+    def expected_wait(self, position: int) -> float:
+        """Rough queueing time for the request at `position` in the queue (1 = next)"""
+        if position <= 0:
+            return 0.0
+        return math.ceil(position / self.limit()) * self.latency(50)
+
+    async def acquire(self) -> None:
+        cond = self._condition()
+        async with cond:
+            if self.waiting == 0 and self.in_flight < self.limit():
+                self.in_flight += 1
+                return
+
+            expected = self.expected_wait(self.waiting + 1)
+            if self.waiting >= ADMISSION_MAX_QUEUE:
+                raise _shed("queue_full", expected)
+            if expected + self.latency(50) > PLAN_LATENCY_SLO:
+                raise _shed("slo", expected)
+
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(cond.wait_for(lambda: self.in_flight < self.limit()),
+                                       timeout=max(PLAN_LATENCY_SLO - self.latency(50), 1))
+            except asyncio.TimeoutError:
+                raise _shed("wait_timeout", self.expected_wait(self.waiting))
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+
+    async def release(self) -> None:
+        cond = self._condition()
+        async with cond:
+            self.in_flight -= 1
+            cond.notify_all()
+
+
+plan_limiter = ClientLimiter(ADMISSION_PLAN_RATE_PER_MIN, ADMISSION_PLAN_BURST)
+search_limiter = ClientLimiter(ADMISSION_SEARCH_RATE_PER_MIN, ADMISSION_SEARCH_BURST)
+plan_gate = PlanGate()
+_client_in_flight: Dict[str, int] = {}
+stats = {"admitted": 0, "rejected": {"rate_limited": 0, "client_in_flight": 0},
+         "shed": {"queue_full": 0, "slo": 0, "wait_timeout": 0}}
+
+
+def _shed(reason: str, retry_after: float) -> Overloaded:
+    stats["shed"][reason] += 1
+    return Overloaded(reason, retry_after)
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """plan (sync run) / batch / job (queued) / search, or None for unmetered routes"""
+    if method != "POST":
+        return None
+    if path == "/plan-trip" or (path.startswith("/plan-trip/") and path.endswith("/resume")):
+        return "plan"
+    if path == "/plan-trips/batch":
+        return "batch"
+    if path == "/plan-jobs":
+        return "job"
+    if path in ("/search-flights", "/search-hotels"):
+        return "search"
+    return None
+
+
+def client_id(scope: dict) -> str:
+    headers = dict(scope.get("headers") or [])
+    api_key = headers.get(b"x-api-key")
+    if api_key:
+        return "key:" + hashlib.sha256(api_key).hexdigest()[:16]  # never keep raw keys around
+    if ADMISSION_TRUST_PROXY and headers.get(b"x-forwarded-for"):
+        return "ip:" + headers[b"x-forwarded-for"].decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return f"ip:{client[0]}" if client else "ip:unknown"
+
+
+async def _reject(send, status: int, message: str, retry_after: float) -> None:
+    retry_after = max(1, math.ceil(retry_after))
+    body = json.dumps({"error": message, "retry_after": retry_after}).encode("utf-8")
+    await send({"type": "http.response.start", "status": status, "headers": [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+        (b"retry-after", str(retry_after).encode()),
+    ]})
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """ASGI middleware (pure ASGI, so streamed responses hold their slot until the last chunk)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        kind = route_class(scope.get("method", ""), scope.get("path", "")) if scope["type"] == "http" else None
+        if not ADMISSION_ENABLED or kind is None:
+            return await self.app(scope, receive, send)
+
+        client = client_id(scope)
+        if kind == "batch":
+            # The plans in the batch take their tokens and slots one by one (batch_plan_slot)
+            if _client_in_flight.get(client, 0) >= ADMISSION_CLIENT_MAX_IN_FLIGHT:
+                stats["rejected"]["client_in_flight"] += 1
+                return await _reject(send, 429, "Too many plans in flight for this client", plan_gate.latency(50))
+            stats["admitted"] += 1
+            return await self.app(scope, receive, send)
+
+        limiter = search_limiter if kind == "search" else plan_limiter
+        retry_after = limiter.check(client)
+        if retry_after:
+            stats["rejected"]["rate_limited"] += 1
+            return await _reject(send, 429, "Rate limit exceeded for this client", retry_after)
+
+        if kind != "plan":
+            stats["admitted"] += 1
+            return await self.app(scope, receive, send)
+
+        if _client_in_flight.get(client, 0) >= ADMISSION_CLIENT_MAX_IN_FLIGHT:
+            stats["rejected"]["client_in_flight"] += 1
+            return await _reject(send, 429, "Too many plans in flight for this client", plan_gate.latency(50))
+        try:
+            await plan_gate.acquire()
+        except Overloaded as e:
+            return await _reject(send, 503, str(e), e.retry_after)
+
+        stats["admitted"] += 1
+        _enter(client)
+        started = time.monotonic()
+        status = {}
+
+        async def send_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            await plan_gate.release()
+            _leave(client)
+            # Single plans feed the latency the cap and the SLO check are based on
+            if status.get("code") == 200:
+                latency_tracker.record(PLAN_LATENCY_KEY, time.monotonic() - started)
+
+
+def _enter(client: str) -> None:
+    _client_in_flight[client] = _client_in_flight.get(client, 0) + 1
+
+
+def _leave(client: str) -> None:
+    _client_in_flight[client] -= 1
+    if not _client_in_flight[client]:
+        del _client_in_flight[client]
+
+
+@asynccontextmanager
+async def batch_plan_slot(client: Optional[str]) -> AsyncIterator[None]:
+    """
+    Admission for one plan of a batch: the client's rate token, one of its in-flight
+    units and a global slot, same as a /plan-trip call. Waits instead of rejecting
+    (a batch is offline work). client=None (not called over HTTP) runs unmetered.
+    """
+    if not ADMISSION_ENABLED or client is None:
+        yield
+        return
+    while True:
+        retry_after = plan_limiter.check(client)
+        if not retry_after:
+            break
+        await asyncio.sleep(retry_after)
+    while _client_in_flight.get(client, 0) >= ADMISSION_CLIENT_MAX_IN_FLIGHT:
+        await asyncio.sleep(1)
+    _enter(client)  # held while waiting for the slot, so single plans can't jump ahead forever
+    try:
+        while True:
+            try:
+                await plan_gate.acquire()
+                break
+            except Overloaded as e:
+                await asyncio.sleep(e.retry_after)
+        stats["admitted"] += 1
+        try:
+            yield
+        finally:
+            await plan_gate.release()
+    finally:
+        _leave(client)
+
+
+def admission_stats() -> dict:
+    return {
+        "in_flight": plan_gate.in_flight,
+        "queue_depth": plan_gate.waiting,
+        "in_flight_limit": plan_gate.limit(),
+        "plan_latency_p50": round(plan_gate.latency(50), 2),
+        "plan_latency_p90": round(plan_gate.latency(90), 2),
+        "expected_wait_s": round(plan_gate.expected_wait(plan_gate.waiting + 1)
+                                 if plan_gate.waiting or plan_gate.in_flight >= plan_gate.limit() else 0, 2),
+        "slo_s": PLAN_LATENCY_SLO,
+        "admitted": stats["admitted"],
+        "rejected": dict(stats["rejected"]),
+        "shed": dict(stats["shed"]),
+        "clients_tracked": len(plan_limiter) + len(search_limiter),
+    }
@@ -0,0 +1,156 @@
+# Batch trip planning.
+# Partner batches often share origins, destinations and dates, so the inputs those
+# plans have in common (IATA codes, flight/hotel searches, weather, place discovery)
+# are fetched once up front. They land in the shared API cache, so when each plan's
+# agent makes the same tool call it's a cache hit. The per-request synthesis then runs
+# with bounded parallelism and results are yielded as each plan completes.
+import os
+import time
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from src.utils.quota_scheduler import quota_lane, serpapi_scheduler, BATCH, QuotaExceeded
+from src.utils.admission import batch_plan_slot
+
+PLAN_BATCH_PARALLELISM = int(os.getenv("PLAN_BATCH_PARALLELISM", "4"))
+PLAN_BATCH_MAX_PARALLELISM = int(os.getenv("PLAN_BATCH_MAX_PARALLELISM", "16"))
+PLAN_BATCH_MAX_REQUESTS = int(os.getenv("PLAN_BATCH_MAX_REQUESTS", "500"))
+# Concurrent upstream lookups while prefetching shared inputs
+PREFETCH_WORKERS = int(os.getenv("PLAN_BATCH_PREFETCH_WORKERS", "8"))
+# Lookups that take a SerpAPI token on a cache miss
+SERPAPI_KINDS = ("flights", "hotels")
+
+
+def _norm(text: str) -> str:
+    return " ".join(str(text).split()).casefold()
+
+
+def shared_lookups(reqs: List, dates: List[Tuple[str, str]]) -> Dict[str, Dict[tuple, Callable[[], object]]]:
+    """
+    Unique upstream lookups across the batch, grouped by kind.
+    Each lookup is a zero-arg callable issuing the same call the agent would make.
+    Requests without a from_city only get the destination lookups (no flights).
+    """
+    from src.tools.flight_serpapi_tool import get_iata_code_from_llm
+    from src.tools.registry import get_tool
+
+    flights, hotels, weather = get_tool("search_flights"), get_tool("search_hotels"), get_tool("get_weather_forecast")
+    discover = get_tool("discover_destination")
+
+    lookups = {"iata": {}, "flights": {}, "hotels": {}, "weather": {}, "places": {}}
+    for req, (start, end) in zip(reqs, dates):
+        origin, dest = req.from_city, req.destination
+        if origin:
+            for city in (origin, dest):
+                lookups["iata"].setdefault((_norm(city),), lambda c=city: get_iata_code_from_llm(c))
+            lookups["flights"].setdefault(
+                (_norm(origin), _norm(dest), start),
+                lambda o=origin, d=dest, s=start: flights.invoke({"origin": o, "destination": d, "travel_date": s}),
+            )
+        lookups["hotels"].setdefault(
+            (_norm(dest), start, end),
+            lambda d=dest, s=start, e=end: hotels.invoke({"location": d, "check_in_date": s, "check_out_date": e}),
+        )
+        lookups["weather"].setdefault(
+            (_norm(dest),), lambda d=dest, s=start: weather.invoke({"city": d, "travel_date": s})
+        )
+        lookups["places"].setdefault((_norm(dest),), lambda d=dest: discover.invoke({"place": d}))
+    return lookups
+
+
+def prefetch(reqs: List, dates: List[Tuple[str, str]], serpapi_budget: Optional[int] = None,
+             label: str = "Batch prefetch") -> dict:
+    """
+    Run every shared lookup once (IATA first, flights depend on it). Best effort.
+    With a serpapi_budget, flight/hotel lookups stop once that many SerpAPI tokens were
+    spent (cache hits are free); lookups run roughly in the order the requests are given.
+    """
+    lookups = shared_lookups(reqs, dates)
+    stats = {"requests": len(reqs), "skipped_budget": 0}
+    started = time.perf_counter()
+    tokens_before = serpapi_scheduler.granted[BATCH]
+    budget_lock = threading.Lock()
+    in_flight = {"searches": 0}
+
+    def run(kind: str, fn: Callable[[], object]) -> bool:
+        budgeted = serpapi_budget is not None and kind in SERPAPI_KINDS
+        if budgeted:
+            # Searches still running may each spend a token too
+            with budget_lock:
+                spent = serpapi_scheduler.granted[BATCH] - tokens_before
+                if spent + in_flight["searches"] >= serpapi_budget:
+                    stats["skipped_budget"] += 1
+                    return False
+                in_flight["searches"] += 1
+        try:
+            with quota_lane(BATCH):
+                fn()
+            return True
+        except QuotaExceeded:
+            return False  # the plan itself will retry (or report) the search
+        except Exception as e:
+            print(f"⚠️ {label} ({kind}) failed: {e}")
+            return False
+        finally:
+            if budgeted:
+                with budget_lock:
+                    in_flight["searches"] -= 1
+
+    with ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="batch-prefetch") as pool:
+        for stage in (["iata"], ["flights", "hotels", "weather", "places"]):
+            # Each lookup runs in a copy of the caller's context (cache TTL overrides etc.)
+            futures = [(kind, pool.submit(contextvars.copy_context().run, run, kind, fn))
+                       for kind in stage for fn in lookups[kind].values()]
+            for kind in stage:
+                done = [f.result() for k, f in futures if k == kind]
+                stats[kind] = {"unique": len(done), "ok": sum(done)}
+
+    stats["serpapi_calls"] = serpapi_scheduler.granted[BATCH] - tokens_before
+    stats["prefetch_s"] = round(time.perf_counter() - started, 2)
+    print(f"📦 {label}: {stats}")
+    return stats
+
+
+async def plan_trips_batch(reqs: List, parallelism: int = PLAN_BATCH_PARALLELISM,
+                           client: Optional[str] = None) -> AsyncIterator[dict]:
+    """
+    Plan a batch of TripRequests. Yields one prefetch summary, then one result per
+    request in completion order: {"type": "plan", "index", "destination", "result"|"error", "thread_id"}.
+    client (the admission client id) makes every plan go through admission like a /plan-trip call.
+    """
+    # Imported lazily: main imports this module for the endpoint
+    from src.main import plan_trip_logic, trip_dates
+
+    if len(reqs) > PLAN_BATCH_MAX_REQUESTS:
+        raise ValueError(f"Batch too large: {len(reqs)} requests (max {PLAN_BATCH_MAX_REQUESTS})")
+    parallelism = max(1, min(int(parallelism), PLAN_BATCH_MAX_PARALLELISM))
+
+    dates = [trip_dates(req) for req in reqs]
+    stats = await asyncio.to_thread(prefetch, reqs, dates)
+    yield {"type": "prefetch", **stats}
+
+    semaphore = asyncio.Semaphore(parallelism)
+
+    async def plan_one(index: int, req) -> dict:
+        async with semaphore, batch_plan_slot(client):
+            started = time.perf_counter()
+            try:
+                # Each task has its own context, so the lane only covers this plan's graph thread
+                with quota_lane(BATCH):
+                    response = await plan_trip_logic(req)
+            except Exception as e:
+                response = {"error": str(e)}
+            return {"type": "plan", "index": index, "destination": req.destination,
+                    "elapsed_s": round(time.perf_counter() - started, 2), **response}
+
+    tasks = [asyncio.create_task(plan_one(i, req)) for i, req in enumerate(reqs)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client went away: don't start plans nobody will read
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,167 @@
+# Cache warmer for popular routes and destinations.
+# Morning-peak plans mostly ask for the same handful of routes, and the first request
+# for each one used to pay for cold SerpAPI / weather / places / IATA lookups. The warmer
+# runs those lookups ahead of the peak (the same calls the agent makes, via the batch
+# prefetch) so they land in the shared API cache:
+#   - routes come from src/config/warm_routes.yaml plus the most planned trips in the
+#     plan archive over the last few days
+#   - each route is warmed for departures over the next N days, nearest first
+#   - SerpAPI calls run in the batch lane and stop at a per-run budget; cached keys are free
+#   - entries it writes get a longer TTL so they are still warm when the peak arrives
+#
+# Run once (e.g. from cron) or keep it running on a daily schedule:
+#   python -m src.utils.cache_warmer
+#   python -m src.utils.cache_warmer --loop          # at WARM_AT every day
+#   python -m src.utils.cache_warmer --dry-run       # list what would be warmed
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import List, Optional, Tuple
+
+import yaml
+
+from src.utils.batch_planner import prefetch, _norm
+from src.utils.tiered_cache import cache_ttls
+
+WARM_ROUTES_FILE = os.getenv("WARM_ROUTES_FILE", "src/config/warm_routes.yaml")
+# Also warm the most planned trips from the plan archive
+WARM_FROM_ARCHIVE = os.getenv("WARM_FROM_ARCHIVE", "1") == "1"
+WARM_LOOKBACK_DAYS = int(os.getenv("WARM_LOOKBACK_DAYS", "7"))
+WARM_TOP_ROUTES = int(os.getenv("WARM_TOP_ROUTES", "20"))
+# Departure dates to warm: tomorrow .. N days ahead
+WARM_DAYS_AHEAD = int(os.getenv("WARM_DAYS_AHEAD", "3"))
+# Max SerpAPI calls per run (flight + hotel searches that missed the cache)
+WARM_SERPAPI_BUDGET = int(os.getenv("WARM_SERPAPI_BUDGET", "60"))
+# TTL (seconds) of the price / forecast entries the warmer writes; run it about this long before the peak
+WARM_TTL = int(os.getenv("WARM_TTL", str(4 * 3600)))
+# Daily run times for --loop, local time, comma separated
+WARM_AT = os.getenv("WARM_AT", "05:30")
+
+DEFAULT_DAYS = 3
+
+
+def _route(entry: dict) -> Optional[dict]:
+    destination = entry.get("to") or entry.get("destination")
+    if not destination:
+        return None
+    return {
+        "from_city": str(entry.get("from") or entry.get("origin") or "").strip(),
+        "destination": str(destination).strip(),
+        "days": int(entry.get("days") or DEFAULT_DAYS),
+    }
+
+
+def configured_routes(path: str = WARM_ROUTES_FILE) -> List[dict]:
+    """Routes from the YAML (or JSON) routes file; [] if it doesn't exist"""
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f) if path.endswith(".json") else yaml.safe_load(f)
+    entries = data.get("routes", []) if isinstance(data, dict) else (data or [])
+    return [r for r in map(_route, entries) if r]
+
+
+def archived_routes(lookback_days: int = WARM_LOOKBACK_DAYS, limit: int = WARM_TOP_ROUTES) -> List[dict]:
+    """Most planned trips over the last lookback_days, most popular first"""
+    from src.utils.plan_archive import plan_archive
+
+    try:
+        trips = plan_archive.popular_trips(time.time() - lookback_days * 86400, limit)
+    except Exception as e:
+        print(f"⚠️ Cache warmer: couldn't read recent plans: {e}")
+        return []
+    return [r for r in (_route({"from": t["origin"], "to": t["destination"], "days": t["days"]})
+                        for t in trips) if r]
+
+
+def warm_routes(routes_file: str = WARM_ROUTES_FILE, from_archive: bool = WARM_FROM_ARCHIVE) -> List[dict]:
+    """Configured routes first, then popular archived ones, without duplicates"""
+    routes, seen = [], set()
+    for route in configured_routes(routes_file) + (archived_routes() if from_archive else []):
+        key = (_norm(route["from_city"]), _norm(route["destination"]), route["days"])
+        if key not in seen:
+            seen.add(key)
+            routes.append(route)
+    return routes
+
+
+def warm_requests(routes: List[dict], days_ahead: int = WARM_DAYS_AHEAD) -> Tuple[List, List[Tuple[str, str]]]:
+    """One request per route and departure date, nearest dates first (so the budget goes there)"""
+    today = datetime.now().date()
+    reqs, dates = [], []
+    for offset in range(1, days_ahead + 1):
+        start = today + timedelta(days=offset)
+        for route in routes:
+            reqs.append(SimpleNamespace(**route))
+            dates.append((start.isoformat(), (start + timedelta(days=route["days"])).isoformat()))
+    return reqs, dates
+
+
+def warm_once(routes_file: str = WARM_ROUTES_FILE, from_archive: bool = WARM_FROM_ARCHIVE,
+              days_ahead: int = WARM_DAYS_AHEAD, budget: int = WARM_SERPAPI_BUDGET) -> dict:
+    routes = warm_routes(routes_file, from_archive)
+    if not routes:
+        print("🔥 Cache warmer: no routes to warm")
+        return {"routes": 0}
+
+    reqs, dates = warm_requests(routes, days_ahead)
+    print(f"🔥 Warming {len(routes)} routes x {days_ahead} days (SerpAPI budget {budget})")
+    with cache_ttls({"serpapi": WARM_TTL, "weather": WARM_TTL}):
+        stats = prefetch(reqs, dates, serpapi_budget=budget, label="Cache warmer")
+    return {"routes": len(routes), **stats}
+
+
+def next_run(now: datetime, times: str = WARM_AT) -> datetime:
+    """Next datetime matching one of the HH:MM entries in times"""
+    candidates = []
+    for hhmm in filter(None, (t.strip() for t in times.split(","))):
+        hour, minute = map(int, hhmm.split(":"))
+        at = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        candidates.append(at if at > now else at + timedelta(days=1))
+    if not candidates:
+        raise ValueError("WARM_AT has no HH:MM times")
+    return min(candidates)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Pre-populate the API caches for popular routes")
+    parser.add_argument("--routes", default=WARM_ROUTES_FILE, help="YAML/JSON routes file")
+    parser.add_argument("--no-archive", action="store_true", help="don't add popular routes from recent plans")
+    parser.add_argument("--days", type=int, default=WARM_DAYS_AHEAD, help="departure dates to warm (from tomorrow)")
+    parser.add_argument("--budget", type=int, default=WARM_SERPAPI_BUDGET, help="max SerpAPI calls per run")
+    parser.add_argument("--loop", action="store_true", help=f"run every day at WARM_AT ({WARM_AT})")
+    parser.add_argument("--dry-run", action="store_true", help="list the routes and dates, don't call anything")
+    args = parser.parse_args()
+    from_archive = WARM_FROM_ARCHIVE and not args.no_archive
+
+    if args.dry_run:
+        reqs, dates = warm_requests(warm_routes(args.routes, from_archive), args.days)
+        for req, (start, end) in zip(reqs, dates):
+            print(f"{req.from_city or '-':<12} -> {req.destination:<12} {start} .. {end}")
+        print(f"{len(reqs)} route-days")
+        return 0
+
+    if not args.loop:
+        warm_once(args.routes, from_archive, args.days, args.budget)
+        return 0
+
+    print(f"✅ Cache warmer scheduled at {WARM_AT} daily. Ctrl+C to stop.")
+    try:
+        while True:
+            at = next_run(datetime.now())
+            print(f"⏰ Next warm-up at {at:%Y-%m-%d %H:%M}")
+            time.sleep(max(0.0, (at - datetime.now()).total_seconds()))
+            try:
+                warm_once(args.routes, from_archive, args.days, args.budget)
+            except Exception as e:
+                print(f"⚠️ Cache warmer run failed: {e}")
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
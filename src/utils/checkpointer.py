@@ -0,0 +1,132 @@
+# Durable LangGraph checkpoints in a local SQLite file.
+# Every node of a plan run is checkpointed under its thread_id, so a run that
+# fails late (e.g. the final synthesis call times out after six good tool calls)
+# can be resumed from its last completed node instead of starting over.
+import os
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from typing import Any, Optional, Tuple
+
+
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", "./cache/checkpoints.sqlite")
+CHECKPOINT_RETENTION_DAYS = float(os.getenv("CHECKPOINT_RETENTION_DAYS", "7"))
+# Payloads larger than this are zlib-compressed (tool results are mostly JSON text)
+COMPRESS_MIN_BYTES = 512
+
+
+class CompressedSerializer:
+    """JsonPlusSerializer with zlib compression for large payloads"""
+
+    def __init__(self):
+        from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+        self._inner = JsonPlusSerializer()
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        type_, data = self._inner.dumps_typed(obj)
+        if len(data) >= COMPRESS_MIN_BYTES:
+            return f"z:{type_}", zlib.compress(data)
+        return type_, data
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_.startswith("z:"):
+            return self._inner.loads_typed((type_[2:], zlib.decompress(payload)))
+        return self._inner.loads_typed((type_, payload))
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._inner.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return self._inner.loads(data)
+
+
+_saver = None
+_conn: Optional[sqlite3.Connection] = None
+_lock = threading.Lock()
+
+
+def _connect() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(CHECKPOINT_DB) or ".", exist_ok=True)
+    conn = sqlite3.connect(CHECKPOINT_DB, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def _connection() -> sqlite3.Connection:
+    """Bookkeeping connection (LangGraph's saver keeps its own)"""
+    global _conn
+    if _conn is None:
+        _conn = _connect()
+        # Our own bookkeeping next to LangGraph's tables: one row per plan run
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS plan_threads ("
+            " thread_id TEXT PRIMARY KEY, status TEXT NOT NULL,"
+            " request TEXT, error TEXT, result TEXT,"
+            " created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        _conn.commit()
+    return _conn
+
+
+def get_checkpointer():
+    """Process-wide SQLite checkpointer (a SqliteSaver) shared by every compiled graph"""
+    global _saver
+    with _lock:
+        if _saver is None:
+            from langgraph.checkpoint.sqlite import SqliteSaver
+            _saver = SqliteSaver(_connect(), serde=CompressedSerializer())
+            _saver.setup()
+        return _saver
+
+
+def record_thread(thread_id: str, status: str, request: Optional[dict] = None,
+                  error: Optional[str] = None, result: Optional[str] = None) -> None:
+    """Insert or update the bookkeeping row of a plan run"""
+    now = time.time()
+    with _lock:
+        conn = _connection()
+        conn.execute(
+            "INSERT INTO plan_threads (thread_id, status, request, error, result, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(thread_id) DO UPDATE SET status = excluded.status,"
+            " request = COALESCE(excluded.request, plan_threads.request),"
+            " error = excluded.error, result = excluded.result, updated_at = excluded.updated_at",
+            (thread_id, status, json.dumps(request) if request else None, error, result, now, now),
+        )
+        conn.commit()
+
+
+def get_thread(thread_id: str) -> Optional[dict]:
+    with _lock:
+        row = _connection().execute(
+            "SELECT thread_id, status, request, error, result, created_at, updated_at"
+            " FROM plan_threads WHERE thread_id = ?", (thread_id,)
+        ).fetchone()
+    if row is None:
+        return None
+    keys = ("thread_id", "status", "request", "error", "result", "created_at", "updated_at")
+    thread = dict(zip(keys, row))
+    thread["request"] = json.loads(thread["request"]) if thread["request"] else None
+    return thread
+
+
+def cleanup_checkpoints(retention_days: float = CHECKPOINT_RETENTION_DAYS) -> int:
+    """Delete checkpoints of plan runs not touched for `retention_days`. Returns threads removed."""
+    cutoff = time.time() - retention_days * 24 * 3600
+    get_checkpointer()  # make sure LangGraph's tables exist
+    with _lock:
+        conn = _connection()
+        old = [r[0] for r in conn.execute(
+            "SELECT thread_id FROM plan_threads WHERE updated_at < ?", (cutoff,)
+        ).fetchall()]
+        for thread_id in old:
+            conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            conn.execute("DELETE FROM plan_threads WHERE thread_id = ?", (thread_id,))
+        conn.commit()
+    if old:
+        print(f"🧹 Removed checkpoints of {len(old)} plan run(s) older than {retention_days:g} days")
+    return len(old)
@@ -1,16 +1,33 @@
 import requests
+from src.utils.resilience import get_guard
+from src.utils.tiered_cache import get_cache, cache_key
 
 class CurrencyConverter:
     def __init__(self, api_key: str):
         self.base_url = f"https://v6.exchangerate-api.com/v6/{api_key}/latest/"
     
+    def _rates(self, from_currency: str) -> dict:
+        """Latest rates for a base currency, shared across workers (CURRENCY_CACHE_TTL)"""
+        cache = get_cache("currency")
+        key = cache_key(from_currency.upper())
+        rates = cache.get(key)
+        if rates is None:
+            url = f"{self.base_url}/{from_currency}"
+            guard = get_guard("exchange_rate")
+            response = guard.call(
+                requests.get, url,
+                timeout=guard.timeout(),
+                is_failure=lambda r: r.status_code >= 500,
+            )
+            if response.status_code != 200:
+                raise Exception("API call failed:", response.json())
+            rates = response.json()["conversion_rates"]
+            cache.set(key, rates)
+        return rates
+
     def convert(self, amount:float, from_currency:str, to_currency:str):
         """Convert the amount from one currency to another"""
-        url = f"{self.base_url}/{from_currency}"
-        response = requests.get(url)
-        if response.status_code != 200:
-            raise Exception("API call failed:", response.json())
-        rates = response.json()["conversion_rates"]
+        rates = self._rates(from_currency)
         if to_currency not in rates:
             raise ValueError(f"{to_currency} not found in exchange rates.")
         return amount * rates[to_currency]
\ No newline at end of file
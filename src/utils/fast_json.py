@@ -0,0 +1,69 @@
+# JSON responses for the search endpoints: serialized once (orjson when installed),
+# gzipped when large and the client accepts it, and tagged with an ETag so clients
+# repeating a search get a 304 while the upstream result is still cached.
+import os
+import gzip
+import json
+import hashlib
+from typing import Any
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+except ImportError:  # plain json fallback
+    orjson = None
+    FastJSONResponse = JSONResponse
+
+# Bodies smaller than this aren't worth compressing
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1024"))
+GZIP_LEVEL = 5
+
+stats = {"responses": 0, "not_modified": 0, "gzipped": 0, "bytes_raw": 0, "bytes_sent": 0}
+
+
+def dumps(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def _etag_matches(etag: str, header: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison: gzipped and plain bodies share a tag
+    candidates = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+
+def json_response(request: Request, payload: Any) -> Response:
+    """
+    200 with the serialized payload (or 304 if the client's If-None-Match still matches).
+    Error payloads are sent untagged so they aren't revalidated against later.
+    """
+    body = dumps(payload)
+    stats["responses"] += 1
+    stats["bytes_raw"] += len(body)
+    headers = {"Vary": "Accept-Encoding"}
+
+    if not (isinstance(payload, dict) and payload.get("error")):
+        etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        headers.update({"ETag": etag, "Cache-Control": "private, no-cache"})
+        if _etag_matches(etag, request.headers.get("if-none-match", "")):
+            stats["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+
+    if len(body) >= GZIP_MIN_SIZE and "gzip" in request.headers.get("accept-encoding", ""):
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        headers["Content-Encoding"] = "gzip"
+        stats["gzipped"] += 1
+    stats["bytes_sent"] += len(body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def response_stats() -> dict:
+    return {**stats, "orjson": orjson is not None}
@@ -0,0 +1,187 @@
+# Geospatial index over hotels and attractions, per destination.
+# search_hotels used to drop the hotels' GPS coordinates and the place tools only return
+# names and addresses, so the LLM had to guess which hotel is "central". Coordinates are
+# now kept here in a lat/lng grid per destination: Near comes from a grid lookup around
+# each hotel, and the mean distance from one NumPy haversine matrix (hotels x top attractions).
+# A destination's attractions stay indexed, so searches answered from the SerpAPI cache
+# are scored without another attraction lookup.
+# The score goes back into the hotel JSON as two compact fields:
+#   Near   : how many of the top attractions are within GEO_NEAR_KM
+#   AttrKm : mean distance (km) to the top attractions
+import os
+import math
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+GEO_ENABLED = os.getenv("GEO_ENABLED", "1") == "1"
+# Attractions each hotel is scored against (most reviewed first)
+GEO_TOP_ATTRACTIONS = int(os.getenv("GEO_TOP_ATTRACTIONS", "5"))
+GEO_NEAR_KM = float(os.getenv("GEO_NEAR_KM", "3"))
+# Order hotels within each price category by Near (then price) instead of price alone
+GEO_RANK_HOTELS = os.getenv("GEO_RANK_HOTELS", "1") == "1"
+# Max extra wait for the attraction lookup once the hotel search is done
+GEO_ATTRACTIONS_TIMEOUT = float(os.getenv("GEO_ATTRACTIONS_TIMEOUT", "4"))
+
+GRID_CELL_KM = 2.0
+KM_PER_DEG_LAT = 111.32
+EARTH_RADIUS_KM = 6371.0088
+MAX_DESTINATIONS = 64
+
+# Attraction lookups run next to the hotel search, not after it
+_geo_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="geo")
+stats = {"hotels_scored": 0, "searches_scored": 0, "no_attractions": 0, "attraction_errors": 0}
+
+
+def haversine_matrix(a, b) -> np.ndarray:
+    """Great-circle distances in km between every row of a (n x [lat, lng]) and b (m x [lat, lng]) -> n x m"""
+    a = np.radians(np.asarray(a, dtype=float).reshape(-1, 2))
+    b = np.radians(np.asarray(b, dtype=float).reshape(-1, 2))
+    dlat = b[None, :, 0] - a[:, None, 0]
+    dlng = b[None, :, 1] - a[:, None, 1]
+    h = np.sin(dlat / 2) ** 2 + np.cos(a[:, None, 0]) * np.cos(b[None, :, 0]) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+class GeoIndex:
+    """Named points of one destination by kind ("hotels", "attractions"), bucketed in a ~2 km grid"""
+
+    def __init__(self, cell_km: float = GRID_CELL_KM):
+        self.cell_km = cell_km
+        self.lat_step = cell_km / KM_PER_DEG_LAT
+        self.lng_step = None  # fixed from the first point's latitude
+        self._points: Dict[str, Dict[str, Tuple[float, float]]] = defaultdict(dict)
+        self._grid: Dict[str, Dict[Tuple[int, int], set]] = defaultdict(lambda: defaultdict(set))
+        self._lock = threading.Lock()
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return math.floor(lat / self.lat_step), math.floor(lng / self.lng_step)
+
+    def add(self, kind: str, points: List[dict], replace: bool = False) -> None:
+        """
+        points: [{"name", "lat", "lng"}]; a name seen again moves to its new position.
+        replace=True drops the kind's previous points first.
+        """
+        with self._lock:
+            if replace:
+                self._points.pop(kind, None)
+                self._grid.pop(kind, None)
+            for p in points:
+                lat, lng = float(p["lat"]), float(p["lng"])
+                if self.lng_step is None:
+                    self.lng_step = self.lat_step / max(math.cos(math.radians(lat)), 0.01)
+                old = self._points[kind].get(p["name"])
+                if old is not None:
+                    self._grid[kind][self._cell(*old)].discard(p["name"])
+                self._points[kind][p["name"]] = (lat, lng)
+                self._grid[kind][self._cell(lat, lng)].add(p["name"])
+
+    def nearby(self, lat: float, lng: float, radius_km: float, kind: str = "attractions") -> List[Tuple[str, float]]:
+        """(name, km) of the points within radius_km, nearest first; only the covering grid cells are checked"""
+        with self._lock:
+            if self.lng_step is None:
+                return []
+            reach = math.ceil(radius_km / self.cell_km)
+            row, col = self._cell(lat, lng)
+            grid = self._grid[kind]
+            names = [name for r in range(row - reach, row + reach + 1)
+                     for c in range(col - reach, col + reach + 1) for name in grid.get((r, c), ())]
+            coords = [self._points[kind][name] for name in names]
+        if not names:
+            return []
+        distances = haversine_matrix([(lat, lng)], coords)[0]
+        return sorted(((n, round(float(d), 2)) for n, d in zip(names, distances) if d <= radius_km),
+                      key=lambda item: item[1])
+
+    def points(self, kind: str) -> Dict[str, Tuple[float, float]]:
+        with self._lock:
+            return dict(self._points[kind])
+
+    def size(self, kind: str) -> int:
+        return len(self._points[kind])
+
+
+_indexes: "OrderedDict[str, GeoIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+_place_search = None
+
+
+def get_index(destination: str) -> GeoIndex:
+    """Process-wide index for a destination (least recently used destinations are dropped)"""
+    key = " ".join(destination.split()).casefold()
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = GeoIndex()
+            while len(_indexes) > MAX_DESTINATIONS:
+                _indexes.popitem(last=False)
+        _indexes.move_to_end(key)
+        return _indexes[key]
+
+
+def attraction_points(destination: str) -> List[dict]:
+    """Top attractions with coordinates (cached Google Places lookup), most reviewed first"""
+    global _place_search
+    api_key = os.environ.get("GPLACES_API_KEY")
+    if not api_key:
+        return []
+    if _place_search is None:
+        from src.utils.place_info_search import GooglePlaceSearchTool
+        _place_search = GooglePlaceSearchTool(api_key)
+    points = _place_search.google_attraction_points(destination)
+    top = sorted(points, key=lambda p: -(p.get("reviews") or 0))[:GEO_TOP_ATTRACTIONS]
+    get_index(destination).add("attractions", top, replace=True)
+    return top
+
+
+def prefetch_attractions(destination: str) -> Future:
+    """Start the attraction lookup in the background (call right before a live hotel search)"""
+    return _geo_executor.submit(attraction_points, destination)
+
+
+def score_hotels(destination: str, hotels: List[dict], attractions: Optional[Future] = None) -> List[str]:
+    """
+    Add Near / AttrKm to every hotel with a "GPS" [lat, lng] and index the hotels.
+    attractions: a prefetch_attractions future; without one, the attractions already
+    indexed for the destination are used. Returns the attraction names scored against.
+    """
+    index = get_index(destination)
+    located = [h for h in hotels if h.get("GPS")]
+    if located:
+        index.add("hotels", [{"name": h["Name"], "lat": h["GPS"][0], "lng": h["GPS"][1]} for h in located])
+    if attractions is not None:
+        try:
+            attractions.result(timeout=GEO_ATTRACTIONS_TIMEOUT)  # fills the index
+        except Exception as e:
+            # Also covers the timeout: the hotels just go out without the location score
+            stats["attraction_errors"] += 1
+            print(f"   ⚠️ Attraction coordinates unavailable: {str(e) or type(e).__name__}")
+            return []
+    points = index.points("attractions")
+    if not points:
+        stats["no_attractions"] += 1
+        return []
+    if not located:
+        return []
+
+    mean_km = haversine_matrix([h["GPS"] for h in located], list(points.values())).mean(axis=1)
+    for hotel, km in zip(located, mean_km):
+        hotel["Near"] = len(index.nearby(hotel["GPS"][0], hotel["GPS"][1], GEO_NEAR_KM))
+        hotel["AttrKm"] = round(float(km), 1)
+    stats["hotels_scored"] += len(located)
+    stats["searches_scored"] += 1
+    return list(points)
+
+
+def rank_hotels(hotels: List[dict]) -> List[dict]:
+    """Most top attractions nearby first, then cheapest (hotels without a score go last)"""
+    return sorted(hotels, key=lambda h: (-h.get("Near", -1), h["Price"]))
+
+
+def geo_stats() -> dict:
+    with _indexes_lock:
+        destinations = len(_indexes)
+    return {**stats, "destinations_indexed": destinations, "near_km": GEO_NEAR_KM,
+            "top_attractions": GEO_TOP_ATTRACTIONS, "enabled": GEO_ENABLED}
@@ -0,0 +1,124 @@
+# Hedged execution: start the primary provider, and if it hasn't answered
+# within its usual latency (a configurable percentile), fire the fallback in
+# parallel and take whichever good answer arrives first.
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from collections import defaultdict
+from typing import Callable, Dict, Tuple, Any
+
+from src.utils.latency_stats import latency_tracker
+
+# Percentile of the primary's latency after which the fallback is fired
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "90"))
+# Hedge delay used until enough latency samples have been collected
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "2.0"))
+
+# Shared pool so hedged calls don't pay thread start-up every time
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+
+_stats = defaultdict(lambda: {"requests": 0, "hedges_fired": 0, "wins": 0, "errors": 0})
+_stats_lock = threading.Lock()
+
+
+def _bump(provider: str, key: str) -> None:
+    with _stats_lock:
+        _stats[provider][key] += 1
+
+
+def hedge_stats() -> Dict[str, dict]:
+    """Per-provider hedge counters plus derived hedge-fire and win rates"""
+    with _stats_lock:
+        snapshot = {name: dict(values) for name, values in _stats.items()}
+
+    for values in snapshot.values():
+        requests = values["requests"] or 1
+        values["hedge_fire_rate"] = round(values["hedges_fired"] / requests, 3)
+        values["win_rate"] = round(values["wins"] / requests, 3)
+    return snapshot
+
+
+class HedgedRequest:
+    """
+    Runs a primary call and hedges it with a fallback call.
+    Latencies of both providers are fed into the shared LatencyTracker
+    (unless record_latency=False).
+    """
+
+    def __init__(self, primary: str, fallback: str,
+                 percentile: float = HEDGE_PERCENTILE,
+                 default_delay: float = HEDGE_DEFAULT_DELAY,
+                 record_latency: bool = True):
+        self.primary = primary
+        self.fallback = fallback
+        self.percentile = percentile
+        self.default_delay = default_delay
+        # Set to False when the calls already go through a ProviderGuard (it records latency itself)
+        self.record_latency = record_latency
+
+    def hedge_delay(self) -> float:
+        """How long to wait for the primary before firing the fallback"""
+        return latency_tracker.percentile(self.primary, self.percentile, default=self.default_delay)
+
+    def _submit(self, provider: str, fn: Callable[[], Any]):
+        if not self.record_latency:
+            future = _executor.submit(fn)
+            future.provider = provider
+            return future
+
+        def timed():
+            start = time.perf_counter()
+            try:
+                return fn()
+            finally:
+                latency_tracker.record(provider, time.perf_counter() - start)
+
+        future = _executor.submit(timed)
+        future.provider = provider
+        return future
+
+    def run(self, primary_fn: Callable[[], Any], fallback_fn: Callable[[], Any],
+            is_good: Callable[[Any], bool] = bool) -> Tuple[str, Any]:
+        """
+        Returns (provider_name, result) of the first good answer.
+        Raises the last error if neither provider produced a good answer.
+        """
+        _bump(self.primary, "requests")
+        pending = {self._submit(self.primary, primary_fn)}
+        fallback_started = False
+        last_error = None
+
+        # First wait only for the primary, up to its usual latency
+        timeout = self.hedge_delay()
+
+        while True:
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                try:
+                    result = future.result()
+                    if is_good(result):
+                        _bump(future.provider, "wins")
+                        return future.provider, result
+                    last_error = ValueError(f"{future.provider} returned an empty result")
+                except Exception as e:
+                    last_error = e
+                _bump(future.provider, "errors")
+
+            if not fallback_started and (not done or not pending):
+                # Primary is slow (hedge) or already failed (plain fallback)
+                if not done:
+                    _bump(self.fallback, "hedges_fired")
+                    print(f"   ⏱️ {self.primary} slower than p{self.percentile:g} "
+                          f"({timeout:.2f}s) - hedging with {self.fallback}")
+                _bump(self.fallback, "requests")
+                pending.add(self._submit(self.fallback, fallback_fn))
+                fallback_started = True
+                timeout = None
+                continue
+
+            if not pending:
+                raise last_error or RuntimeError("No provider returned a result")
+
+            timeout = None
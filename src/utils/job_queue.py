@@ -0,0 +1,216 @@
+# Durable plan-job queue in a local SQLite file.
+# The web process only enqueues and reads jobs; worker processes (src/utils/plan_worker.py)
+# claim them one at a time, so planning capacity no longer depends on web-server workers.
+import os
+import json
+import math
+import time
+import uuid
+import sqlite3
+import threading
+import functools
+from typing import Optional
+
+PLAN_QUEUE_DB = os.getenv("PLAN_QUEUE_DB", "./cache/plan_jobs.sqlite")
+# Max jobs waiting for a worker; beyond this POST /plan-jobs answers 429
+PLAN_QUEUE_MAX = int(os.getenv("PLAN_QUEUE_MAX", "20"))
+PLAN_JOB_RETENTION_DAYS = float(os.getenv("PLAN_JOB_RETENTION_DAYS", "7"))
+# Jobs are retried this many times if their worker process dies mid-run
+PLAN_JOB_MAX_ATTEMPTS = int(os.getenv("PLAN_JOB_MAX_ATTEMPTS", "2"))
+
+QUEUED, RUNNING, COMPLETED, FAILED = "queued", "running", "completed", "failed"
+_COLUMNS = ("id", "status", "request", "result", "error", "attempts", "worker",
+            "created_at", "started_at", "finished_at")
+
+
+class QueueFull(Exception):
+    """Raised when the plan queue has no room left"""
+
+    def __init__(self, depth: int, retry_after: int):
+        self.depth = depth
+        self.retry_after = retry_after
+        super().__init__(f"Plan queue is full ({depth} jobs waiting). Retry in ~{retry_after}s")
+
+
+# One connection per process (workers are separate processes, never share a handle)
+_conn: Optional[sqlite3.Connection] = None
+_conn_pid: Optional[int] = None
+# ...but FastAPI's threadpool shares it, so transactions must not interleave
+_lock = threading.RLock()
+
+
+def _locked(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with _lock:
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def _connection() -> sqlite3.Connection:
+    global _conn, _conn_pid
+    if _conn is None or _conn_pid != os.getpid():
+        os.makedirs(os.path.dirname(PLAN_QUEUE_DB) or ".", exist_ok=True)
+        # isolation_level=None -> we manage transactions (BEGIN IMMEDIATE) ourselves
+        _conn = sqlite3.connect(PLAN_QUEUE_DB, timeout=30, isolation_level=None, check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS plan_jobs ("
+            " id TEXT PRIMARY KEY, status TEXT NOT NULL, request TEXT NOT NULL,"
+            " result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, worker TEXT,"
+            " created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+        )
+        _conn.execute("CREATE INDEX IF NOT EXISTS plan_jobs_status ON plan_jobs(status, created_at)")
+        _conn_pid = os.getpid()
+    return _conn
+
+
+def _row_to_job(row) -> dict:
+    job = dict(zip(_COLUMNS, row))
+    job["request"] = json.loads(job["request"])
+    return job
+
+
+def _retry_after(conn: sqlite3.Connection, depth: int) -> int:
+    """Rough wait estimate from recent job durations"""
+    avg = conn.execute(
+        "SELECT AVG(finished_at - started_at) FROM (SELECT finished_at, started_at FROM plan_jobs"
+        " WHERE status = ? ORDER BY finished_at DESC LIMIT 20)", (COMPLETED,)
+    ).fetchone()[0] or 30.0
+    workers = max(int(os.getenv("PLAN_WORKERS", "2")), 1)
+    return max(1, math.ceil(avg * max(depth - PLAN_QUEUE_MAX + 1, 1) / workers))
+
+
+@_locked
+def enqueue(request: dict) -> str:
+    """Add a job and return its id. Raises QueueFull when PLAN_QUEUE_MAX jobs are already waiting."""
+    conn = _connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        depth = conn.execute("SELECT COUNT(*) FROM plan_jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+        if depth >= PLAN_QUEUE_MAX:
+            raise QueueFull(depth, _retry_after(conn, depth))
+        job_id = str(uuid.uuid4())
+        conn.execute(
+            "INSERT INTO plan_jobs (id, status, request, created_at) VALUES (?, ?, ?, ?)",
+            (job_id, QUEUED, json.dumps(request), time.time()),
+        )
+        conn.execute("COMMIT")
+        return job_id
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+@_locked
+def claim(worker: str) -> Optional[dict]:
+    """Atomically take the oldest queued job, or None if the queue is empty"""
+    conn = _connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM plan_jobs WHERE status = ?"
+            " ORDER BY created_at LIMIT 1", (QUEUED,)
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        job = _row_to_job(row)
+        conn.execute(
+            "UPDATE plan_jobs SET status = ?, worker = ?, attempts = attempts + 1, started_at = ? WHERE id = ?",
+            (RUNNING, worker, time.time(), job["id"]),
+        )
+        conn.execute("COMMIT")
+        job.update(status=RUNNING, worker=worker, attempts=job["attempts"] + 1)
+        return job
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+@_locked
+def finish(job_id: str, result: Optional[str] = None, error: Optional[str] = None) -> None:
+    status = FAILED if error else COMPLETED
+    _connection().execute(
+        "UPDATE plan_jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+        (status, result, error, time.time(), job_id),
+    )
+
+
+@_locked
+def requeue_worker_jobs(worker: str) -> int:
+    """Put the running jobs of a dead worker back in the queue (or fail them after max attempts)"""
+    conn = _connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "UPDATE plan_jobs SET status = ?, error = 'Worker died during planning', finished_at = ?"
+            " WHERE worker = ? AND status = ? AND attempts >= ?",
+            (FAILED, time.time(), worker, RUNNING, PLAN_JOB_MAX_ATTEMPTS),
+        )
+        requeued = conn.execute(
+            "UPDATE plan_jobs SET status = ?, worker = NULL WHERE worker = ? AND status = ?",
+            (QUEUED, worker, RUNNING),
+        ).rowcount
+        conn.execute("COMMIT")
+        return requeued
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@_locked
+def requeue_orphaned() -> int:
+    """Requeue running jobs whose worker process (worker = its pid) is gone"""
+    workers = [r[0] for r in _connection().execute(
+        "SELECT DISTINCT worker FROM plan_jobs WHERE status = ?", (RUNNING,)
+    ).fetchall()]
+    requeued = 0
+    for worker in workers:
+        if not (worker and worker.isdigit() and _pid_alive(int(worker))):
+            requeued += requeue_worker_jobs(worker)
+    return requeued
+
+
+@_locked
+def get_job(job_id: str) -> Optional[dict]:
+    row = _connection().execute(
+        f"SELECT {', '.join(_COLUMNS)} FROM plan_jobs WHERE id = ?", (job_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    job = _row_to_job(row)
+    if job["status"] == QUEUED:
+        job["position"] = _connection().execute(
+            "SELECT COUNT(*) FROM plan_jobs WHERE status = ? AND created_at < ?", (QUEUED, job["created_at"])
+        ).fetchone()[0] + 1
+    return job
+
+
+@_locked
+def cleanup_jobs(retention_days: float = PLAN_JOB_RETENTION_DAYS) -> int:
+    """Delete finished jobs older than `retention_days`"""
+    cutoff = time.time() - retention_days * 24 * 3600
+    return _connection().execute(
+        "DELETE FROM plan_jobs WHERE status IN (?, ?) AND finished_at < ?", (COMPLETED, FAILED, cutoff)
+    ).rowcount
+
+
+@_locked
+def queue_stats() -> dict:
+    """Job counts per status, for /metrics"""
+    counts = dict(_connection().execute("SELECT status, COUNT(*) FROM plan_jobs GROUP BY status").fetchall())
+    return {
+        "max_queued": PLAN_QUEUE_MAX,
+        **{status: counts.get(status, 0) for status in (QUEUED, RUNNING, COMPLETED, FAILED)},
+    }
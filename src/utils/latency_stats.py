@@ -0,0 +1,62 @@
+# Keeps a rolling window of observed latencies per upstream provider
+# (Google Places, Tavily, SerpAPI, ...) so other parts of the system can ask
+# "how slow is this provider usually?" without hard-coding numbers.
+import threading
+from collections import defaultdict, deque
+from typing import Dict, Optional
+
+
+class LatencyTracker:
+    """
+    Thread-safe rolling latency window per provider.
+    Percentiles are computed on demand from the last `window` samples.
+    """
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, seconds: float) -> None:
+        """Store one latency sample (in seconds) for a provider"""
+        with self._lock:
+            self._samples[provider].append(seconds)
+
+    def count(self, provider: str) -> int:
+        with self._lock:
+            return len(self._samples.get(provider, ()))
+
+    def percentile(self, provider: str, pct: float, default: Optional[float] = None,
+                   min_samples: int = 5) -> Optional[float]:
+        """
+        Return the pct-th percentile (0-100) of recent latencies for a provider.
+        Falls back to `default` until at least `min_samples` samples exist.
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(provider, ()))
+
+        if len(samples) < min_samples:
+            return default
+
+        # Nearest-rank percentile
+        rank = max(0, min(len(samples) - 1, int(round(pct / 100 * len(samples))) - 1))
+        return samples[rank]
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Summary per provider (sample count, p50, p90, p99) for metrics"""
+        with self._lock:
+            providers = list(self._samples.keys())
+
+        return {
+            name: {
+                "samples": self.count(name),
+                "p50": self.percentile(name, 50, min_samples=1),
+                "p90": self.percentile(name, 90, min_samples=1),
+                "p99": self.percentile(name, 99, min_samples=1),
+            }
+            for name in providers
+        }
+
+
+# Process-wide tracker shared by every upstream wrapper
+latency_tracker = LatencyTracker()
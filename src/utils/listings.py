@@ -0,0 +1,171 @@
+# Flight and hotel listings rendered straight from the search_flights / search_hotels JSON.
+# Copying every flight and hotel into markdown used to be the longest part of the LLM's
+# answer (output tokens are the slow part of a run), so the LLM now writes a placeholder
+# and only the recommendations; the listings are merged in here afterwards.
+import json
+from typing import List, Optional
+
+from src.prompt_library.prompt import LISTINGS_PLACEHOLDER
+
+FLIGHT_CATEGORIES = ("Budget", "Moderate", "Premium")
+HOTEL_CATEGORIES = (
+    ("Budget", "Budget Hotels (Under ₹5,000/night)"),
+    ("Moderate", "Moderate Hotels (₹5,000-15,000/night)"),
+    ("Luxury", "Luxury Hotels (Over ₹15,000/night)"),
+)
+
+
+def message_text(content) -> str:
+    if isinstance(content, list):
+        return "".join(c.get("text", "") for c in content if isinstance(c, dict))
+    return str(content or "")
+
+
+def _payload(content) -> Optional[dict]:
+    try:
+        data = json.loads(message_text(content))
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def is_error_result(content) -> bool:
+    """Tool output reporting a failure: {"error": ...} JSON or a ❌ / ⚠️ message"""
+    if message_text(content).lstrip().startswith(("❌", "⚠️")):
+        return True
+    data = _payload(content)
+    return data is not None and bool(data.get("error"))
+
+
+def latest_payload(messages: List, tool_name: str) -> Optional[dict]:
+    """
+    Parsed result of the most recent successful call to tool_name
+    (the last error if every call failed, None if it was never called).
+    """
+    last_error = None
+    for m in reversed(messages):
+        if getattr(m, "type", None) != "tool" or getattr(m, "name", None) != tool_name:
+            continue
+        data = _payload(m.content)
+        if data is None:
+            data = {"error": f"{tool_name} returned an unreadable response"}
+        if not data.get("error"):
+            return data
+        last_error = last_error or data
+    return last_error
+
+
+def _money(value) -> str:
+    try:
+        return f"₹{int(value):,}"
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def render_flights(payload: dict) -> str:
+    if payload.get("error"):
+        return f"## 🛫 Flight Options\n\n⚠️ {payload['error']}\n"
+
+    route = payload.get("route")
+    lines = [f"## 🛫 Flight Options ({route})" if route else "## 🛫 Flight Options", ""]
+    if payload.get("search_date"):
+        lines += [f"*Departing {payload['search_date']} · prices per person in INR*", ""]
+
+    flights = payload.get("flights") or []
+    groups = [(c, [f for f in flights if f.get("Category") == c]) for c in FLIGHT_CATEGORIES]
+    other = [f for f in flights if f.get("Category") not in FLIGHT_CATEGORIES]
+    for category, group in groups + [("Other", other)]:
+        if not group:
+            continue
+        lines += [f"### {category} Flights", ""]
+        for f in group:
+            stops = f.get("Stops") or "Non-stop"
+            if stops != "Non-stop" and f.get("Route"):
+                stops = f"{stops} ({f['Route']})"
+            lines += [
+                f"**{f.get('Airline', 'Unknown')} {f.get('FlightNumber', '')}** - "
+                f"{f.get('PriceFormatted') or _money(f.get('Price'))}",
+                f"- 🛫 Departs: {f.get('DepartureTime', 'N/A')} from {f.get('DepartureAirport', '')}",
+                f"- 🛬 Arrives: {f.get('ArrivalTime', 'N/A')} at {f.get('ArrivalAirport', '')}",
+                f"- ⏱️ Duration: {f.get('Duration', 'N/A')}",
+                f"- 🔄 {stops}",
+                "",
+            ]
+    if not flights:
+        lines += ["No flights were returned for this route.", ""]
+    return "\n".join(lines)
+
+
+def render_hotels(payload: dict) -> str:
+    if payload.get("error"):
+        return f"## 🏨 Hotels\n\n⚠️ {payload['error']}\n"
+
+    location = payload.get("loc")
+    nights = payload.get("nights")
+    lines = [f"## 🏨 Hotels in {location}" if location else "## 🏨 Hotels", ""]
+
+    hotels = payload.get("hotels") or []
+    near_km = (payload.get("near") or {}).get("km")
+    for category, heading in HOTEL_CATEGORIES:
+        group = [h for h in hotels if h.get("Cat") == category]
+        if not group:
+            continue
+        lines += [f"### {heading}", ""]
+        for h in group:
+            price = f"💰 {_money(h.get('Price'))}/night"
+            if nights:
+                price += f" × {nights} nights = {_money(h.get('Total'))}"
+            lines += [
+                f"**{h.get('Name', 'Unknown')}** ⭐{h.get('Rat', '-')}",
+                f"- {price}",
+                f"- 📍 {h.get('Loc', '')}",
+            ]
+            if h.get("Near") is not None and near_km is not None:
+                lines.append(f"- 🗺️ {h['Near']} top attractions within {near_km:g} km (avg {h['AttrKm']} km)")
+            lines += [
+                f"- ✨ {h.get('Amens', 'Standard')}",
+                "",
+            ]
+    if not hotels:
+        lines += ["No hotels were returned for these dates.", ""]
+    return "\n".join(lines)
+
+
+def render_listings(messages: List) -> str:
+    """Markdown for the flight and hotel sections ('' if neither tool was called)"""
+    sections = []
+    flights = latest_payload(messages, "search_flights")
+    if flights is not None:
+        sections.append(render_flights(flights))
+    hotels = latest_payload(messages, "search_hotels")
+    if hotels is not None:
+        sections.append(render_hotels(hotels))
+    return "".join(f"{s.rstrip()}\n\n---\n\n" for s in sections)
+
+
+def merge_listings(answer: str, listings: str) -> str:
+    """
+    Put the rendered listings where the LLM wrote the placeholder. Without a placeholder
+    they go after the title block (or first, if there is no title); answers that already
+    list flights/hotels themselves are left alone.
+    """
+    if LISTINGS_PLACEHOLDER in answer:
+        # Placeholder written more than once: keep the first
+        head, tail = answer.split(LISTINGS_PLACEHOLDER, 1)
+        return head + listings.rstrip() + "\n" + tail.replace(LISTINGS_PLACEHOLDER, "")
+    if not listings or "## 🛫 Flight Options" in answer or "## 🏨 Hotels" in answer:
+        return answer
+
+    lines = answer.split("\n")
+    title = next((i for i, line in enumerate(lines) if line.startswith("# ")), None)
+    if title is None:
+        return listings + answer
+    # After the first horizontal rule below the title, else right before the first section
+    for i in range(title + 1, len(lines)):
+        if lines[i].strip() == "---":
+            return "\n".join(lines[:i + 1]) + "\n\n" + listings + "\n".join(lines[i + 1:]).lstrip("\n")
+        if lines[i].startswith("## "):
+            break
+    else:
+        i = len(lines)
+    return "\n".join(lines[:i]).rstrip("\n") + "\n\n---\n\n" + listings + "\n".join(lines[i:])
@@ -0,0 +1,184 @@
+# Opt-in persistent cache for deterministic chat completions.
+# Several LLM calls are pure functions of their input (IATA lookups at temperature 0,
+# ReasoningAgent explanations, replayed experiment turns), so their responses are
+# stored in SQLite keyed on model + params + bound tool schemas + normalized messages.
+#
+# Enable with LLM_CACHE_ENABLED=1. Calls with a non-zero temperature bypass the
+# cache unless LLM_CACHE_ALL_TEMPERATURES=1 (useful when replaying experiments).
+import os
+import re
+import ast
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "0") == "1"
+LLM_CACHE_ALL_TEMPERATURES = os.getenv("LLM_CACHE_ALL_TEMPERATURES", "0") == "1"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./cache/llm_cache.sqlite")
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+# Message fields that differ between otherwise identical runs (random ids, token usage)
+_VOLATILE_KEYS = {"id", "tool_call_id", "response_metadata", "usage_metadata"}
+_TEMPERATURE_RE = re.compile(r"""['"]temperature['"]\s*[:,]\s*([0-9.]+(?:[eE][-+]?[0-9]+)?)""")
+# ChatGroq turns temperature=0 into 1e-08; anything this small is greedy decoding
+ZERO_TEMPERATURE = 1e-6
+
+
+def _strip_volatile(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _strip_volatile(v) for k, v in value.items() if k not in _VOLATILE_KEYS}
+    if isinstance(value, list):
+        return [_strip_volatile(v) for v in value]
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return value
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Serialized message list -> canonical form (no ids, collapsed whitespace)"""
+    try:
+        return json.dumps(_strip_volatile(json.loads(prompt)), sort_keys=True, ensure_ascii=False)
+    except (ValueError, TypeError):
+        return " ".join(prompt.split())
+
+
+def _temperature(llm_string: str) -> Optional[float]:
+    # LangChain builds llm_string as "<serialized model>---<sorted(params.items())>"
+    try:
+        params = dict(ast.literal_eval(llm_string.rsplit("---", 1)[1]))
+        if params.get("temperature") is not None:
+            return float(params["temperature"])
+    except (IndexError, ValueError, TypeError, SyntaxError):
+        pass
+    match = _TEMPERATURE_RE.search(llm_string)
+    try:
+        return float(match.group(1)) if match else None
+    except ValueError:
+        return None
+
+
+def is_deterministic(llm_string: str) -> bool:
+    """True if the model params pin temperature to 0 (or close enough, see ZERO_TEMPERATURE)"""
+    temperature = _temperature(llm_string)
+    return temperature is not None and temperature <= ZERO_TEMPERATURE
+
+
+class SQLiteLLMCache(BaseCache):
+    """LangChain cache backed by SQLite with TTL and LRU-style size bound"""
+
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl: int = LLM_CACHE_TTL,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "bypassed": 0, "writes": 0, "evicted": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL,"
+            " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache(accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        # llm_string already carries model name, params and bound tool schemas
+        return hashlib.sha256(f"{llm_string}\0{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+    def _cacheable(self, llm_string: str) -> bool:
+        if LLM_CACHE_ALL_TEMPERATURES or is_deterministic(llm_string):
+            return True
+        with self._lock:
+            self.stats["bypassed"] += 1
+        return False
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        if not self._cacheable(llm_string):
+            return None
+
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.stats["hits"] += 1
+
+        return loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        if not (LLM_CACHE_ALL_TEMPERATURES or is_deterministic(llm_string)):
+            return
+
+        key = self._key(prompt, llm_string)
+        value = zlib.compress(dumps(list(return_val)).encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self.stats["writes"] += 1
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """Drop expired rows, then least recently used rows above max_entries"""
+        removed = self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,)).rowcount
+        count = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        if count > self.max_entries:
+            # Trim 10% below the bound so we don't evict on every write
+            excess = count - int(self.max_entries * 0.9)
+            removed += self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY accessed_at ASC LIMIT ?)", (excess,)
+            ).rowcount
+        self.stats["evicted"] += max(removed, 0)
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        return stats
+
+
+_cache: Optional[SQLiteLLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[SQLiteLLMCache]:
+    """The shared cache, or None when caching is not enabled"""
+    global _cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SQLiteLLMCache()
+        return _cache
+
+
+def llm_cache_stats() -> dict:
+    cache = get_llm_cache()
+    return cache.snapshot() if cache else {"enabled": False}
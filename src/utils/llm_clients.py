@@ -0,0 +1,182 @@
+# Registry of long-lived chat clients.
+# One client per (provider, model, params), all sharing a single HTTP connection
+# pool with explicit keep-alive and concurrency limits, so chat completions reuse
+# warm TLS connections instead of paying connection setup on every call.
+import os
+import json
+import threading
+from typing import Dict, Tuple
+
+import httpx
+
+from src.utils.llm_cache import get_llm_cache
+
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "20"))
+LLM_HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "10"))
+LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "60"))
+# Per-request timeout on the shared pool (the provider guards apply tighter, adaptive ones)
+LLM_HTTP_TIMEOUT = float(os.getenv("LLM_HTTP_TIMEOUT", "120"))
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+
+class _PoolUsage:
+    """In-flight request counter used to report connection pool saturation"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.saturated = 0  # requests that started while every connection was busy
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self.in_flight >= LLM_HTTP_MAX_CONNECTIONS:
+                self.saturated += 1
+            self.in_flight += 1
+            self.requests += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def finish(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "max_connections": LLM_HTTP_MAX_CONNECTIONS,
+                "max_keepalive": LLM_HTTP_MAX_KEEPALIVE,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "requests": self.requests,
+                "saturated_requests": self.saturated,
+                "utilization": round(self.in_flight / LLM_HTTP_MAX_CONNECTIONS, 3),
+            }
+
+
+_usage = _PoolUsage()
+
+
+class _CountingTransport(httpx.HTTPTransport):
+    def handle_request(self, request):
+        _usage.start()
+        try:
+            return super().handle_request(request)
+        finally:
+            _usage.finish()
+
+
+class _AsyncCountingTransport(httpx.AsyncHTTPTransport):
+    async def handle_async_request(self, request):
+        _usage.start()
+        try:
+            return await super().handle_async_request(request)
+        finally:
+            _usage.finish()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=LLM_HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+_http_client = None
+_async_http_client = None
+_clients: Dict[Tuple[str, str, str], object] = {}
+_lock = threading.Lock()
+
+
+def shared_http_client() -> httpx.Client:
+    """Process-wide sync HTTP client used by every chat client"""
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(transport=_CountingTransport(limits=_limits()),
+                                        timeout=LLM_HTTP_TIMEOUT)
+        return _http_client
+
+
+def shared_async_http_client() -> httpx.AsyncClient:
+    """Process-wide async HTTP client used by every chat client"""
+    global _async_http_client
+    with _lock:
+        if _async_http_client is None:
+            _async_http_client = httpx.AsyncClient(transport=_AsyncCountingTransport(limits=_limits()),
+                                                   timeout=LLM_HTTP_TIMEOUT)
+        return _async_http_client
+
+
+def _build(provider: str, model: str, params: dict):
+    # Opt-in persistent response cache (only serves temperature-0 calls by default)
+    cache = get_llm_cache()
+    if cache is not None:
+        params = {**params, "cache": cache}
+
+    if provider == "openrouter":
+        from langchain_openai import ChatOpenAI
+
+        api_key = os.getenv("OPENROUTER_API_KEY")
+        if not api_key:
+            raise ValueError("❌ OPENROUTER_API_KEY is missing from environment variables.")
+        return ChatOpenAI(
+            model=model,
+            openai_api_key=api_key,
+            openai_api_base=OPENROUTER_BASE_URL,
+            default_headers={
+                "HTTP-Referer": "http://localhost:8501",
+                "X-Title": "AI Travel Planner",
+            },
+            http_client=shared_http_client(),
+            http_async_client=shared_async_http_client(),
+            **params,
+        )
+
+    if provider == "groq":
+        from langchain_groq import ChatGroq
+
+        api_key = os.getenv("GROQ_API_KEY")
+        if not api_key:
+            raise ValueError("❌ GROQ_API_KEY is missing from environment variables.")
+        return ChatGroq(
+            model=model,
+            api_key=api_key,
+            http_client=shared_http_client(),
+            http_async_client=shared_async_http_client(),
+            **params,
+        )
+
+    if provider == "gemini":
+        # Gemini talks gRPC through its own SDK, so it can't use the shared HTTP pool
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        return ChatGoogleGenerativeAI(model=model, **params)
+
+    raise ValueError(f"Unknown model provider: {provider}")
+
+
+def get_chat_client(provider: str, model: str, **params):
+    """
+    Returns the single long-lived client for (provider, model, params),
+    building it on first use.
+    """
+    key = (provider, model, json.dumps(params, sort_keys=True, default=str))
+    with _lock:
+        client = _clients.get(key)
+    if client is not None:
+        return client
+
+    client = _build(provider, model, params)
+    with _lock:
+        # Another thread may have built the same client meanwhile; keep the first one
+        return _clients.setdefault(key, client)
+
+
+def http_pool_stats() -> dict:
+    """Connection pool usage and number of registered clients, for /metrics"""
+    stats = _usage.snapshot()
+    with _lock:
+        stats["clients"] = len(_clients)
+    return stats
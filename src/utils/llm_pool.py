@@ -0,0 +1,154 @@
+# Latency-aware pool of chat models.
+# Each call is routed to the provider with the best rolling latency/error
+# estimate; timeouts, 429s, 5xx and connection errors fail over to the next
+# provider in the same call instead of waiting out a 120s request_timeout.
+import time
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from src.utils.resilience import get_guard, CircuitOpenError
+
+# Weight of the newest sample in the rolling estimates
+EWMA_ALPHA = 0.3
+# How long a provider is skipped after answering 429
+RATE_LIMIT_COOLDOWN_SECONDS = 30.0
+
+
+class ProviderEstimate:
+    """Rolling latency / error estimate for one provider (shared process-wide)"""
+
+    def __init__(self):
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.cooldown_until = 0.0
+        self.calls = 0
+
+    def record(self, latency: Optional[float], ok: bool) -> None:
+        self.calls += 1
+        self.error_rate = EWMA_ALPHA * (0.0 if ok else 1.0) + (1 - EWMA_ALPHA) * self.error_rate
+        if latency is not None:
+            self.latency = latency if self.latency is None else (
+                EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.latency
+            )
+
+    def score(self, order: int, unmeasured_latency: float = 1.0) -> float:
+        """
+        Lower is better. Unmeasured providers are assumed as slow as the slowest measured
+        one, so with equal health the configured order wins and a plan doesn't switch
+        models just because another provider hasn't been timed yet.
+        """
+        latency = self.latency if self.latency is not None else unmeasured_latency
+        return latency * (1 + 5 * self.error_rate) + order * 0.01
+
+
+_estimates: Dict[str, ProviderEstimate] = {}
+# Per-call record of the chosen provider and its latency
+llm_call_log: deque = deque(maxlen=500)
+_lock = threading.Lock()
+
+
+def _estimate(name: str) -> ProviderEstimate:
+    with _lock:
+        if name not in _estimates:
+            _estimates[name] = ProviderEstimate()
+        return _estimates[name]
+
+
+def _is_failover_error(e: Exception) -> Tuple[bool, bool]:
+    """Returns (should_fail_over, is_rate_limit)"""
+    status = getattr(e, "status_code", None) or getattr(getattr(e, "response", None), "status_code", None)
+    name = type(e).__name__
+    if status == 429 or "RateLimit" in name or "429" in str(e)[:200]:
+        return True, True
+    if isinstance(e, (TimeoutError, CircuitOpenError, ConnectionError)):
+        return True, False
+    if "Timeout" in name or "Connection" in name:
+        return True, False
+    if isinstance(status, int) and status >= 500:
+        return True, False
+    return False, False
+
+
+def pool_stats() -> dict:
+    """Current estimates and the most recent calls, for /metrics"""
+    with _lock:
+        estimates = {
+            name: {
+                "latency_s": round(est.latency, 3) if est.latency is not None else None,
+                "error_rate": round(est.error_rate, 3),
+                "cooling_down": est.cooldown_until > time.monotonic(),
+                "calls": est.calls,
+            }
+            for name, est in _estimates.items()
+        }
+    return {"providers": estimates, "recent_calls": list(llm_call_log)[-20:]}
+
+
+class LLMProviderPool(Runnable):
+    """
+    Holds several configured chat models and routes each invoke() to the
+    currently fastest healthy one, failing over mid-run when needed.
+    """
+
+    def __init__(self, members: List[Tuple[str, Any]]):
+        if not members:
+            raise ValueError("❌ LLM provider pool has no configured providers.")
+        self.members = members
+
+    def bind_tools(self, tools, **kwargs) -> "LLMProviderPool":
+        """Bind the same tools on every member (estimates stay shared)"""
+        return LLMProviderPool([(name, llm.bind_tools(tools, **kwargs)) for name, llm in self.members])
+
+    def _ranked(self) -> List[Tuple[str, Any]]:
+        now = time.monotonic()
+        estimates = [_estimate(name) for name, _ in self.members]
+        measured = [est.latency for est in estimates if est.latency is not None]
+        unmeasured_latency = max(measured, default=1.0)
+        scored = []
+        for order, ((name, llm), est) in enumerate(zip(self.members, estimates)):
+            cooling = est.cooldown_until > now
+            scored.append((cooling, est.score(order, unmeasured_latency), name, llm))
+        # Providers cooling down after a 429 go last, but are still tried as a final resort
+        scored.sort(key=lambda item: (item[0], item[1]))
+        return [(name, llm) for _, _, name, llm in scored]
+
+    def invoke(self, input, config: Optional[RunnableConfig] = None, **kwargs):
+        last_error = None
+
+        for name, llm in self._ranked():
+            est = _estimate(name)
+            start = time.perf_counter()
+            try:
+                response = get_guard(name).call(llm.invoke, input, config, thread_timeout=True, **kwargs)
+            except Exception as e:
+                latency = time.perf_counter() - start
+                fail_over, rate_limited = _is_failover_error(e)
+                with _lock:
+                    # Instant rejections (open breaker) say nothing about latency
+                    est.record(None if isinstance(e, CircuitOpenError) else latency, ok=False)
+                    if rate_limited:
+                        est.cooldown_until = time.monotonic() + RATE_LIMIT_COOLDOWN_SECONDS
+                    llm_call_log.append({"provider": name, "latency_s": round(latency, 3),
+                                         "ok": False, "error": type(e).__name__})
+                if not fail_over:
+                    raise
+                print(f"   🔁 LLM provider {name} failed ({type(e).__name__}) - failing over")
+                last_error = e
+                continue
+
+            latency = time.perf_counter() - start
+            with _lock:
+                est.record(latency, ok=True)
+                llm_call_log.append({"provider": name, "latency_s": round(latency, 3), "ok": True})
+            print(f"   🧠 LLM provider: {name} ({latency:.1f}s)")
+
+            metadata = getattr(response, "response_metadata", None)
+            if isinstance(metadata, dict):
+                metadata["llm_provider"] = name
+                metadata["llm_latency_s"] = round(latency, 3)
+            return response
+
+        raise last_error
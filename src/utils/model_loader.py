@@ -67,33 +67,58 @@
 
 
 import os
-from langchain_openai import ChatOpenAI
 from langchain_core.language_models.chat_models import BaseChatModel
+from src.utils.llm_clients import get_chat_client
+
+# Providers the "pool" provider may use, in order of preference (comma separated)
+LLM_POOL_PROVIDERS = os.getenv("LLM_POOL_PROVIDERS", "openrouter,groq,gemini")
+
+# API key each provider needs before it can join the pool
+PROVIDER_API_KEYS = {
+    "openrouter": "OPENROUTER_API_KEY",
+    "groq": "GROQ_API_KEY",
+    "gemini": "GOOGLE_API_KEY",
+}
 
 class ModelLoader:
     def __init__(self, model_provider: str = "openrouter"):
         self.model_provider = model_provider
 
+    def load_pool(self):
+        """
+        Builds an LLMProviderPool from every provider in LLM_POOL_PROVIDERS
+        whose API key is configured.
+        """
+        from src.utils.llm_pool import LLMProviderPool
+
+        members = []
+        for name in [p.strip() for p in LLM_POOL_PROVIDERS.split(",") if p.strip()]:
+            if not os.getenv(PROVIDER_API_KEYS.get(name, ""), ""):
+                continue
+            members.append((name, ModelLoader(model_provider=name).load_llm()))
+
+        print(f"🔧 LLM pool: {', '.join(name for name, _ in members) or 'no providers'}")
+        return LLMProviderPool(members)
+
     def load_llm(self) -> BaseChatModel:
         """
         Loads the LLM via OpenRouter's API with optimized settings.
+        "groq" and "gemini" load single alternative providers, "pool" loads a
+        latency-aware LLMProviderPool over all configured providers.
+        Clients come from the shared registry, so repeated calls reuse one instance.
         """
-        if self.model_provider == "openrouter":
-            # 1. Get API Key
-            api_key = os.getenv("OPENROUTER_API_KEY")
-            if not api_key:
-                raise ValueError("❌ OPENROUTER_API_KEY is missing from environment variables.")
+        if self.model_provider == "pool":
+            return self.load_pool()
 
-            # 2. Configure ChatOpenAI for OpenRouter with optimized settings
-            return ChatOpenAI(
+        if self.model_provider == "openrouter":
+            # Shared client from the registry (API key, base URL and headers are set there)
+            return get_chat_client(
+                "openrouter",
                 # Use a more reliable model with better output
                 # model="nvidia/nemotron-3-nano-30b-a3b:free",
                 # Alternative models if above fails:
                 # model="qwen/qwen3-next-80b-a3b-instruct:free",
-                model="openai/gpt-oss-120b",
-                
-                openai_api_key=api_key,
-                openai_api_base="https://openrouter.ai/api/v1",
+                "openai/gpt-oss-120b",
                 
                 # Optimized temperature for consistent output
                 temperature=0.3,  # Lower for more consistent output
@@ -104,12 +129,6 @@ class ModelLoader:
                 # Timeout settings
                 request_timeout=120,  # 2 minutes timeout
                 
-                # Required headers
-                default_headers={
-                    "HTTP-Referer": "http://localhost:8501",
-                    "X-Title": "AI Travel Planner",
-                },
-                
                 # Additional settings for reliability
                 model_kwargs={
                     "top_p": 0.9,
@@ -118,11 +137,20 @@ class ModelLoader:
                 }
             )
         
+        elif self.model_provider == "groq":
+            return get_chat_client(
+                "groq",
+                "meta-llama/llama-4-scout-17b-16e-instruct",
+                temperature=0.3,
+                max_tokens=8000,
+                timeout=120,
+            )
+
         # Fallback for Gemini
         elif self.model_provider == "gemini":
-            from langchain_google_genai import ChatGoogleGenerativeAI
-            return ChatGoogleGenerativeAI(
-                model="gemini-1.5-flash",
+            return get_chat_client(
+                "gemini",
+                "gemini-2.5-flash",  # 1.5 models are retired
                 temperature=0.3,
                 max_output_tokens=4000,
             )
@@ -0,0 +1,254 @@
+# Markdown -> PDF export shared by the FastAPI app and the Streamlit UI.
+# PDFs are rendered on demand (never eagerly) in a small process pool, so layout work
+# doesn't block a request thread or hold the GIL, and the bytes are cached by content
+# hash: the same plan is only rendered once, across processes.
+import os
+import re
+import io
+import asyncio
+import hashlib
+import textwrap
+import threading
+import multiprocessing as mp
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Optional
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", "./cache/pdf")
+PDF_RENDER_TIMEOUT = float(os.getenv("PDF_RENDER_TIMEOUT", "60"))
+# Recently rendered PDFs kept in memory (older ones are read back from PDF_CACHE_DIR)
+PDF_MEMORY_CACHE_SIZE = 32
+PDF_DISK_CACHE_MAX_FILES = int(os.getenv("PDF_DISK_CACHE_MAX_FILES", "500"))
+
+# Built-in PDF fonts are Latin-1 only: spell out the rupee sign, drop emoji & co.
+_REPLACEMENTS = {"₹": "Rs.", "→": "->", "–": "-", "—": "-", "•": "-", "’": "'", "“": '"', "”": '"'}
+_INLINE_MARKUP_RE = re.compile(r"(\*\*|__|`|\*(?=\S)|(?<=\S)\*)")
+_LINK_RE = re.compile(r"\[([^\]]+)\]\([^)]+\)")
+_TABLE_RULE_RE = re.compile(r"^\|?\s*:?-{3,}")
+
+# Font/size per line kind
+_STYLES = {
+    "h1": ("Helvetica-Bold", 15),
+    "h2": ("Helvetica-Bold", 13),
+    "h3": ("Helvetica-Bold", 11.5),
+    "body": ("Helvetica", 10),
+    "mono": ("Courier", 8.5),
+}
+
+
+def _to_latin1(text: str) -> str:
+    for src, dst in _REPLACEMENTS.items():
+        text = text.replace(src, dst)
+    return text.encode("latin-1", "ignore").decode("latin-1")
+
+
+def _clean_inline(text: str) -> str:
+    text = _LINK_RE.sub(r"\1", text)
+    return _to_latin1(_INLINE_MARKUP_RE.sub("", text)).strip()
+
+
+def _classify(line: str):
+    """(style, text, indent) for one markdown line; None for lines that are skipped"""
+    stripped = line.strip()
+    if not stripped:
+        return ("blank", "", 0)
+    if stripped in ("---", "***", "___") or _TABLE_RULE_RE.match(stripped):
+        return None
+    if stripped.startswith("#"):
+        level = len(stripped) - len(stripped.lstrip("#"))
+        return (f"h{min(level, 3)}", _clean_inline(stripped.lstrip("#")), 0)
+    if stripped.startswith("|"):
+        cells = [_clean_inline(c) for c in stripped.strip("|").split("|")]
+        return ("mono", " | ".join(cells), 0)
+    bullet = re.match(r"^(\s*)([-*+]|\d+[.)])\s+(.*)", line)
+    if bullet:
+        depth = len(bullet.group(1).expandtabs(4)) // 2
+        marker = "-" if bullet.group(2) in "-*+" else bullet.group(2)
+        return ("body", f"{marker} {_clean_inline(bullet.group(3))}", 1 + depth)
+    return ("body", _clean_inline(stripped), 0)
+
+
+def render_pdf(title: str, markdown: str) -> bytes:
+    """
+    Render markdown to PDF bytes (runs inside the process pool).
+    Lines are written through one text object per page instead of a drawString per line.
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
+    c.setTitle(_to_latin1(title))
+    width, height = A4
+    margin = 2 * cm
+    usable = width - 2 * margin
+
+    state = {"text": None, "y": 0.0, "font": None}
+
+    def new_page():
+        if state["text"] is not None:
+            c.drawText(state["text"])
+            c.showPage()
+        state.update(text=c.beginText(margin, height - margin), y=height - margin, font=None)
+
+    def write(line: str, font: str, size: float, indent: float = 0.0):
+        leading = size * 1.35
+        if state["y"] - leading < margin:
+            new_page()
+        text = state["text"]
+        if state["font"] != (font, size):
+            text.setFont(font, size, leading)
+            state["font"] = (font, size)
+        if indent:
+            text.setXPos(indent)
+        text.textLine(line)
+        if indent:
+            text.setXPos(-indent)
+        state["y"] -= leading
+
+    new_page()
+    write(_to_latin1(title), "Helvetica-Bold", 16)
+    write("", "Helvetica", 6)
+
+    for raw in markdown.splitlines():
+        kind = _classify(raw)
+        if kind is None:
+            continue
+        style, text, depth = kind
+        if style == "blank":
+            write("", "Helvetica", 5)
+            continue
+
+        font, size = _STYLES[style]
+        indent = depth * 0.5 * cm
+        if style.startswith("h"):
+            write("", font, size * 0.4)
+        # Wrap by measured width rather than a fixed character count
+        avg_char = stringWidth("abcdefghijklmnopqrstuvwxyz ", font, size) / 27
+        max_chars = max(int((usable - indent) / avg_char), 20)
+        for i, line in enumerate(textwrap.wrap(text, width=max_chars) or [""]):
+            # Continuation lines of a bullet line up with its text
+            write(line, font, size, indent + (0.3 * cm if i and depth else 0))
+
+    c.drawText(state["text"])
+    c.save()
+    return buffer.getvalue()
+
+
+def pdf_cache_key(title: str, markdown: str) -> str:
+    return hashlib.sha256(f"{title}\0{markdown}".encode("utf-8")).hexdigest()
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_memory: "OrderedDict[str, bytes]" = OrderedDict()
+_in_flight: Dict[str, Future] = {}
+_lock = threading.Lock()
+stats = {"memory_hits": 0, "disk_hits": 0, "renders": 0, "errors": 0}
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: don't fork a server process that holds threads and sqlite handles
+        _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=mp.get_context("spawn"))
+    return _pool
+
+
+def _disk_path(key: str) -> str:
+    return os.path.join(PDF_CACHE_DIR, f"{key}.pdf")
+
+
+def _remember(key: str, data: bytes) -> None:
+    _memory[key] = data
+    _memory.move_to_end(key)
+    while len(_memory) > PDF_MEMORY_CACHE_SIZE:
+        _memory.popitem(last=False)
+
+
+def _store(key: str, future: Future) -> None:
+    """Done-callback: keep the rendered bytes in memory and on disk"""
+    with _lock:
+        _in_flight.pop(key, None)
+        if future.exception() is not None:
+            stats["errors"] += 1
+            return
+        data = future.result()
+        _remember(key, data)
+    try:
+        os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+        tmp = f"{_disk_path(key)}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, _disk_path(key))  # atomic, so other processes never read half a file
+        _trim_disk_cache()
+    except OSError as e:
+        print(f"⚠️ Could not cache PDF on disk: {e}")
+
+
+def _trim_disk_cache() -> None:
+    """Drop the least recently written PDFs above PDF_DISK_CACHE_MAX_FILES"""
+    files = [os.path.join(PDF_CACHE_DIR, n) for n in os.listdir(PDF_CACHE_DIR) if n.endswith(".pdf")]
+    if len(files) <= PDF_DISK_CACHE_MAX_FILES:
+        return
+    files.sort(key=os.path.getmtime)
+    for path in files[:len(files) - PDF_DISK_CACHE_MAX_FILES]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def submit_pdf(title: str, markdown: str) -> Future:
+    """
+    Future with the PDF bytes. Cached PDFs resolve immediately; concurrent requests
+    for the same content share one render.
+    """
+    key = pdf_cache_key(title, markdown)
+    with _lock:
+        if key in _memory:
+            _memory.move_to_end(key)
+            stats["memory_hits"] += 1
+            return _done(_memory[key])
+        if key in _in_flight:
+            return _in_flight[key]
+
+    if os.path.exists(_disk_path(key)):
+        with open(_disk_path(key), "rb") as f:
+            data = f.read()
+        with _lock:
+            stats["disk_hits"] += 1
+            _remember(key, data)
+        return _done(data)
+
+    with _lock:
+        if key in _in_flight:
+            return _in_flight[key]
+        stats["renders"] += 1
+        future = _get_pool().submit(render_pdf, title, markdown)
+        _in_flight[key] = future
+    future.add_done_callback(lambda f: _store(key, f))
+    return future
+
+
+def _done(data: bytes) -> Future:
+    future = Future()
+    future.set_result(data)
+    return future
+
+
+def get_pdf(title: str, markdown: str, timeout: float = PDF_RENDER_TIMEOUT) -> bytes:
+    """Blocking helper (Streamlit)"""
+    return submit_pdf(title, markdown).result(timeout=timeout)
+
+
+async def get_pdf_async(title: str, markdown: str, timeout: float = PDF_RENDER_TIMEOUT) -> bytes:
+    """Awaitable helper (FastAPI) - the event loop stays free while the pool renders"""
+    return await asyncio.wait_for(asyncio.wrap_future(submit_pdf(title, markdown)), timeout)
+
+
+def pdf_stats() -> dict:
+    with _lock:
+        return {**stats, "in_flight": len(_in_flight), "memory_entries": len(_memory)}
@@ -1,47 +1,108 @@
 import os
 import json
-from langchain_tavily import TavilySearch
-from langchain_google_community import GooglePlacesTool, GooglePlacesAPIWrapper 
+import threading
+from src.utils.resilience import get_guard
+from src.utils.tiered_cache import get_cache, cache_key
 
+# Provider SDKs (langchain_google_community, langchain_tavily) are imported and
+# constructed on first search, so importing the agent stays fast and works without keys.
 class GooglePlaceSearchTool:
     def __init__(self, api_key: str):
-        self.places_wrapper = GooglePlacesAPIWrapper(gplaces_api_key=api_key)
-        self.places_tool = GooglePlacesTool(api_wrapper=self.places_wrapper)
+        self.api_key = api_key
+        self._places_tool = None
+        self._places_lock = threading.Lock()
+        self.guard = get_guard("google_places")
+
+    @property
+    def places_tool(self):
+        if self._places_tool is None:
+            with self._places_lock:
+                if self._places_tool is None:
+                    from langchain_google_community import GooglePlacesTool, GooglePlacesAPIWrapper
+                    wrapper = GooglePlacesAPIWrapper(gplaces_api_key=self.api_key)
+                    self._places_tool = GooglePlacesTool(api_wrapper=wrapper)
+        return self._places_tool
+
+    def _run(self, query: str):
+        # The Places SDK takes no timeout, so the guard enforces one on a worker thread
+        return get_cache("places").get_or_set(
+            cache_key("google_places", " ".join(query.split()).casefold()),
+            lambda: self.guard.call(self.places_tool.run, query, thread_timeout=True),
+        )
     
     def google_search_attractions(self, place: str) -> dict:
         """
         Searches for attractions in the specified place using GooglePlaces API.
         """
-        return self.places_tool.run(f"top attractive places in and around {place}")
+        return self._run(f"top attractive places in and around {place}")
     
     def google_search_restaurants(self, place: str) -> dict:
         """
         Searches for available restaurants in the specified place using GooglePlaces API.
         """
-        return self.places_tool.run(f"what are the top 10 restaurants and eateries in and around {place}?")
+        return self._run(f"what are the top 10 restaurants and eateries in and around {place}?")
     
     def google_search_activity(self, place: str) -> dict:
         """
         Searches for popular activities in the specified place using GooglePlaces API.
         """
-        return self.places_tool.run(f"Activities in and around {place}")
+        return self._run(f"Activities in and around {place}")
 
     def google_search_transportation(self, place: str) -> dict:
         """
         Searches for available modes of transportation in the specified place using GooglePlaces API.
         """
-        return self.places_tool.run(f"What are the different modes of transportations available in {place}")
+        return self._run(f"What are the different modes of transportations available in {place}")
+
+    def google_attraction_points(self, place: str) -> list:
+        """
+        Top attractions with coordinates: [{"name", "lat", "lng", "reviews"}].
+        One Text Search request (the formatted results above drop the coordinates).
+        """
+        query = f"top attractive places in and around {place}"
+
+        def fetch():
+            client = self.places_tool.api_wrapper.google_map_client
+            results = self.guard.call(client.places, query, thread_timeout=True).get("results", [])
+            points = []
+            for r in results:
+                loc = (r.get("geometry") or {}).get("location") or {}
+                if "lat" in loc and "lng" in loc:
+                    points.append({"name": r.get("name", "Unknown"), "lat": loc["lat"], "lng": loc["lng"],
+                                   "reviews": r.get("user_ratings_total", 0)})
+            return points
+
+        return get_cache("places").get_or_set(
+            cache_key("google_places_points", " ".join(query.split()).casefold()), fetch
+        )
 
 class TavilyPlaceSearchTool:
     def __init__(self):
-        pass
+        # One TavilySearch client for the lifetime of this tool (created on first use)
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.guard = get_guard("tavily")
+
+    @property
+    def tavily_tool(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from langchain_tavily import TavilySearch
+                    self._client = TavilySearch(topic="general", include_answer="advanced")
+        return self._client
+
+    def _invoke(self, query: str):
+        return get_cache("places").get_or_set(
+            cache_key("tavily", " ".join(query.split()).casefold()),
+            lambda: self.guard.call(self.tavily_tool.invoke, {"query": query}, thread_timeout=True),
+        )
 
     def tavily_search_attractions(self, place: str) -> dict:
         """
         Searches for attractions in the specified place using TavilySearch.
         """
-        tavily_tool = TavilySearch(topic="general", include_answer="advanced")
-        result = tavily_tool.invoke({"query": f"top attractive places in and around {place}"})
+        result = self._invoke(f"top attractive places in and around {place}")
         if isinstance(result, dict) and result.get("answer"):
             return result["answer"]
         return result
@@ -50,8 +111,7 @@ class TavilyPlaceSearchTool:
         """
         Searches for available restaurants in the specified place using TavilySearch.
         """
-        tavily_tool = TavilySearch(topic="general", include_answer="advanced")
-        result = tavily_tool.invoke({"query": f"what are the top 10 restaurants and eateries in and around {place}."})
+        result = self._invoke(f"what are the top 10 restaurants and eateries in and around {place}.")
         if isinstance(result, dict) and result.get("answer"):
             return result["answer"]
         return result
@@ -60,8 +120,7 @@ class TavilyPlaceSearchTool:
         """
         Searches for popular activities in the specified place using TavilySearch.
         """
-        tavily_tool = TavilySearch(topic="general", include_answer="advanced")
-        result = tavily_tool.invoke({"query": f"activities in and around {place}"})
+        result = self._invoke(f"activities in and around {place}")
         if isinstance(result, dict) and result.get("answer"):
             return result["answer"]
         return result
@@ -70,8 +129,7 @@ class TavilyPlaceSearchTool:
         """
         Searches for available modes of transportation in the specified place using TavilySearch.
         """
-        tavily_tool = TavilySearch(topic="general", include_answer="advanced")
-        result = tavily_tool.invoke({"query": f"What are the different modes of transportations available in {place}"})
+        result = self._invoke(f"What are the different modes of transportations available in {place}")
         if isinstance(result, dict) and result.get("answer"):
             return result["answer"]
         return result
@@ -0,0 +1,250 @@
+# Searchable archive of generated plans.
+# Bodies are zlib-compressed and content-addressed (identical plans are stored once),
+# trip metadata + text are indexed with SQLite FTS5, and writes are batched on a
+# background thread so archiving never sits on the request path.
+import os
+import re
+import time
+import zlib
+import uuid
+import atexit
+import queue
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, List, Optional
+
+PLAN_ARCHIVE_DB = os.getenv("PLAN_ARCHIVE_DB", "./output/plan_archive.sqlite")
+# Write-behind batching: flush every N plans or every interval, whichever comes first
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "50"))
+ARCHIVE_FLUSH_INTERVAL = float(os.getenv("ARCHIVE_FLUSH_INTERVAL", "2"))
+MAX_PAGE_SIZE = 100
+
+# Metadata columns (also indexed in FTS)
+META_FIELDS = ("origin", "destination", "start_date", "end_date", "vibe", "budget")
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _connect() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(PLAN_ARCHIVE_DB) or ".", exist_ok=True)
+    conn = sqlite3.connect(PLAN_ARCHIVE_DB, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS plan_bodies (
+            hash TEXT PRIMARY KEY, body BLOB NOT NULL, size INTEGER NOT NULL);
+        CREATE TABLE IF NOT EXISTS plans (
+            rowid INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, body_hash TEXT NOT NULL,
+            origin TEXT, destination TEXT, start_date TEXT, end_date TEXT,
+            days INTEGER, travelers INTEGER, vibe TEXT, budget TEXT, created_at REAL NOT NULL);
+        CREATE INDEX IF NOT EXISTS plans_created ON plans(created_at);
+        -- Contentless: the text lives (compressed) in plan_bodies, the index only needs tokens
+        CREATE VIRTUAL TABLE IF NOT EXISTS plans_fts USING fts5(
+            origin, destination, dates, vibe, budget, text, content='');
+        """
+    )
+    conn.commit()
+    return conn
+
+
+def body_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class PlanArchive:
+    """Write-behind plan store; reads go straight to SQLite"""
+
+    def __init__(self):
+        self._queue: "queue.Queue[dict]" = queue.Queue()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+        self.stats = {"queued": 0, "written": 0, "deduplicated": 0, "batches": 0, "errors": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = _connect()
+        return self._conn
+
+    # ---- writes ----
+
+    def archive(self, text: str, metadata: Optional[dict] = None, plan_id: Optional[str] = None) -> str:
+        """Queue a plan for archiving and return its id immediately"""
+        plan_id = plan_id or str(uuid.uuid4())
+        if not text or not text.strip():
+            return plan_id
+        self._queue.put({"id": plan_id, "text": text, "meta": dict(metadata or {}), "created_at": time.time()})
+        with self._lock:
+            self.stats["queued"] += 1
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="plan-archive", daemon=True)
+                self._writer.start()
+        return plan_id
+
+    def _write_loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.time() + ARCHIVE_FLUSH_INTERVAL
+            while len(batch) < ARCHIVE_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.time(), 0)))
+                except queue.Empty:
+                    break
+            self._write_batch(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write_batch(self, batch: List[dict]) -> None:
+        try:
+            with self._lock:
+                conn = self._connection()
+                with conn:  # one transaction per batch
+                    for item in batch:
+                        self._write_one(conn, item)
+                self.stats["batches"] += 1
+        except sqlite3.Error as e:
+            with self._lock:
+                self.stats["errors"] += 1
+            print(f"⚠️ Plan archive write failed ({len(batch)} plans): {e}")
+
+    def _write_one(self, conn: sqlite3.Connection, item: dict) -> None:
+        # Already archived (e.g. a job whose result was recorded twice): keep the first version
+        if conn.execute("SELECT 1 FROM plans WHERE id = ?", (item["id"],)).fetchone():
+            return
+
+        text, meta = item["text"], item["meta"]
+        digest = body_hash(text)
+        inserted = conn.execute(
+            "INSERT OR IGNORE INTO plan_bodies (hash, body, size) VALUES (?, ?, ?)",
+            (digest, zlib.compress(text.encode("utf-8"), 6), len(text)),
+        ).rowcount
+        if not inserted:
+            self.stats["deduplicated"] += 1
+
+        cursor = conn.execute(
+            "INSERT INTO plans (id, body_hash, origin, destination, start_date, end_date, days,"
+            " travelers, vibe, budget, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (item["id"], digest, *(meta.get(f) for f in META_FIELDS[:4]), meta.get("days"),
+             meta.get("travelers"), meta.get("vibe"), meta.get("budget"), item["created_at"]),
+        )
+        dates = " ".join(filter(None, (meta.get("start_date"), meta.get("end_date"))))
+        conn.execute(
+            "INSERT INTO plans_fts (rowid, origin, destination, dates, vibe, budget, text)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (cursor.lastrowid, meta.get("origin"), meta.get("destination"), dates,
+             meta.get("vibe"), meta.get("budget"), text),
+        )
+        self.stats["written"] += 1
+
+    def flush(self, timeout: float = 10.0) -> None:
+        """Wait until everything queued so far is written"""
+        deadline = time.time() + timeout
+        while self._queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.05)
+
+    # ---- reads ----
+
+    def get(self, plan_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT p.id, p.origin, p.destination, p.start_date, p.end_date, p.days, p.travelers,"
+                " p.vibe, p.budget, p.created_at, b.body FROM plans p"
+                " JOIN plan_bodies b ON b.hash = p.body_hash WHERE p.id = ?", (plan_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        plan = _row_to_meta(row[:-1])
+        plan["text"] = zlib.decompress(row[-1]).decode("utf-8")
+        return plan
+
+    def search(self, q: Optional[str] = None, limit: int = 20, offset: int = 0, **filters) -> dict:
+        """
+        Full-text search over plan text and trip metadata.
+        filters: origin, destination, vibe, budget (matched as words in that column),
+        start_date (exact). Newest first unless q is given, then best match first.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        offset = max(0, int(offset))
+
+        match_parts = []
+        if q:
+            match_parts.append(_fts_terms(q))
+        for field in ("origin", "destination", "vibe", "budget"):
+            if filters.get(field):
+                match_parts.append(f"{field} : ({_fts_terms(filters[field])})")
+        match_parts = [m for m in match_parts if m and not m.endswith("()")]
+
+        where, params = [], []
+        if match_parts:
+            where.append("p.rowid IN (SELECT rowid FROM plans_fts WHERE plans_fts MATCH ?)")
+            params.append(" AND ".join(match_parts))
+        if filters.get("start_date"):
+            where.append("p.start_date = ?")
+            params.append(filters["start_date"])
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+
+        if q and match_parts:
+            # Rank by bm25 when there's a text query
+            order_sql = ("ORDER BY (SELECT bm25(plans_fts) FROM plans_fts WHERE plans_fts MATCH ?"
+                         " AND plans_fts.rowid = p.rowid)")
+            order_params = [params[0]]
+        else:
+            order_sql, order_params = "ORDER BY p.created_at DESC", []
+
+        columns = ("p.id, p.origin, p.destination, p.start_date, p.end_date, p.days,"
+                   " p.travelers, p.vibe, p.budget, p.created_at")
+        with self._lock:
+            conn = self._connection()
+            total = conn.execute(f"SELECT COUNT(*) FROM plans p {where_sql}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT {columns} FROM plans p {where_sql} {order_sql} LIMIT ? OFFSET ?",
+                params + order_params + [limit, offset],
+            ).fetchall()
+        return {
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "next_offset": offset + limit if offset + limit < total else None,
+            "plans": [_row_to_meta(r) for r in rows],
+        }
+
+    def popular_trips(self, since: float, limit: int = 20) -> List[dict]:
+        """Most requested origin/destination/days combinations planned since `since` (epoch)"""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT MAX(origin), MAX(destination), days, COUNT(*) AS n FROM plans"
+                " WHERE created_at >= ? AND destination IS NOT NULL AND destination != ''"
+                " GROUP BY LOWER(TRIM(origin)), LOWER(TRIM(destination)), days"
+                " ORDER BY n DESC, MAX(created_at) DESC LIMIT ?", (since, max(1, int(limit)))
+            ).fetchall()
+        keys = ("origin", "destination", "days", "count")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["pending"] = self._queue.unfinished_tasks
+        return stats
+
+
+def _fts_terms(text: str) -> str:
+    """User text -> safe FTS5 query: every word quoted (implicit AND), last one as prefix"""
+    words = _WORD_RE.findall(str(text))
+    if not words:
+        return ""
+    terms = [f'"{w}"' for w in words[:-1]] + [f'"{words[-1]}"*']
+    return " ".join(terms)
+
+
+def _row_to_meta(row) -> Dict:
+    keys = ("id",) + META_FIELDS[:4] + ("days", "travelers", "vibe", "budget", "created_at")
+    return dict(zip(keys, row))
+
+
+plan_archive = PlanArchive()
+# Don't lose the last batch on a clean shutdown
+atexit.register(plan_archive.flush)
+
+
+def archive_plan(text: str, metadata: Optional[dict] = None, plan_id: Optional[str] = None) -> str:
+    return plan_archive.archive(text, metadata, plan_id)
@@ -0,0 +1,116 @@
+# Worker processes for queued plan jobs (see src/utils/job_queue.py).
+# Run them next to the API with:
+#   python -m src.utils.plan_worker
+# or set PLAN_WORKERS_EMBEDDED=1 to have a single-process API (plain `uvicorn`, no
+# --workers) start PLAN_WORKERS of them itself. Every API process starts its own pool,
+# and a starting pool requeues the jobs other pools are running.
+import os
+import time
+import asyncio
+import threading
+import multiprocessing as mp
+from typing import List, Optional
+
+from src.utils import job_queue
+
+PLAN_WORKERS = int(os.getenv("PLAN_WORKERS", "2"))
+PLAN_WORKERS_EMBEDDED = os.getenv("PLAN_WORKERS_EMBEDDED", "0") == "1"
+PLAN_JOB_POLL_INTERVAL = float(os.getenv("PLAN_JOB_POLL_INTERVAL", "0.5"))
+SUPERVISE_INTERVAL = 5.0
+
+
+def _run_job(job: dict) -> dict:
+    # Imported here so the (heavy) agent stack loads once per worker, not in the supervisor
+    from src.main import TripRequest, plan_trip_logic, resume_plan_logic
+    from src.utils.checkpointer import get_thread
+
+    from fastapi import HTTPException
+
+    job_id = job["id"]
+    if job["attempts"] > 1 and get_thread(job_id):
+        # A previous worker died mid-run: continue from its checkpoints
+        print(f"🔁 Job {job_id} retry #{job['attempts'] - 1}, resuming from checkpoint")
+        try:
+            return asyncio.run(resume_plan_logic(job_id))
+        except HTTPException as e:
+            if e.status_code != 404:
+                raise
+            # It died before the first checkpoint was written: plan from scratch
+            print(f"🔁 Job {job_id} has no checkpoints, planning it again")
+    return asyncio.run(plan_trip_logic(TripRequest(**job["request"]), thread_id=job_id))
+
+
+def worker_main(stop_event) -> None:
+    """Loop of one worker process: claim a job, plan it, store the outcome"""
+    # Jobs are tagged with the worker's pid so orphans can be detected after a crash
+    worker = str(os.getpid())
+    print(f"👷 Plan worker {worker} started")
+    while not stop_event.is_set():
+        job = job_queue.claim(worker)
+        if job is None:
+            stop_event.wait(PLAN_JOB_POLL_INTERVAL)
+            continue
+
+        print(f"👷 Worker {worker} planning job {job['id']}")
+        try:
+            response = _run_job(job)
+        except Exception as e:
+            response = {"error": str(e)}
+        job_queue.finish(job["id"], result=response.get("result"), error=response.get("error"))
+
+
+class WorkerPool:
+    """Starts the worker processes and restarts any that die, requeueing their jobs"""
+
+    def __init__(self, size: int = PLAN_WORKERS):
+        self.size = size
+        # spawn: workers must not inherit the parent's threads, locks or sqlite handles
+        self._ctx = mp.get_context("spawn")
+        self._stop = self._ctx.Event()
+        self._procs: List[Optional[mp.Process]] = [None] * size
+        self._supervisor: Optional[threading.Thread] = None
+
+    def _spawn(self, slot: int) -> None:
+        proc = self._ctx.Process(target=worker_main, args=(self._stop,), daemon=True)
+        proc.start()
+        self._procs[slot] = proc
+
+    def start(self) -> None:
+        # Jobs left running by workers of a previous (crashed) instance go back to the queue
+        requeued = job_queue.requeue_orphaned()
+        if requeued:
+            print(f"🔁 Requeued {requeued} orphaned plan job(s)")
+        for slot in range(self.size):
+            self._spawn(slot)
+        self._supervisor = threading.Thread(target=self._supervise, daemon=True)
+        self._supervisor.start()
+
+    def _supervise(self) -> None:
+        while not self._stop.wait(SUPERVISE_INTERVAL):
+            for slot, proc in enumerate(self._procs):
+                if proc is not None and not proc.is_alive():
+                    print(f"⚠️ Plan worker {proc.pid} exited ({proc.exitcode}), restarting")
+                    self._spawn(slot)
+            job_queue.requeue_orphaned()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        for proc in self._procs:
+            if proc is not None:
+                proc.join(timeout)
+                if proc.is_alive():
+                    proc.terminate()
+
+    def alive(self) -> int:
+        return sum(1 for p in self._procs if p is not None and p.is_alive())
+
+
+if __name__ == "__main__":
+    pool = WorkerPool()
+    pool.start()
+    print(f"✅ {pool.size} plan workers running. Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pool.stop()
@@ -0,0 +1,165 @@
+# Local price history built from the flight and hotel searches we already pay for.
+# Every processed search_flights / search_hotels result is reduced to one compact
+# observation (min / median / max price + count) keyed by route or location and travel
+# date, and a per-day rollup keeps the min and median per (route, date) indexed, so
+# "cheapest day to fly BOM -> GOI this month" or "typical hotel price in Goa" is one
+# indexed SQLite query instead of a SerpAPI call.
+#   flights: key = "ORIGIN-DEST" IATA codes, date = departure date, price per person
+#   hotels : key = normalized location,      date = check-in date,  price per night
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+from statistics import median
+from typing import Iterable, List, Optional
+
+PRICE_HISTORY_ENABLED = os.getenv("PRICE_HISTORY_ENABLED", "1") == "1"
+PRICE_HISTORY_DB = os.getenv("PRICE_HISTORY_DB", "./output/price_history.sqlite")
+
+FLIGHTS = "flights"
+HOTELS = "hotels"
+
+
+def _connect() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(PRICE_HISTORY_DB) or ".", exist_ok=True)
+    conn = sqlite3.connect(PRICE_HISTORY_DB, timeout=10, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS price_observations (
+            kind TEXT NOT NULL, key TEXT NOT NULL, travel_date TEXT NOT NULL, digest TEXT NOT NULL,
+            min_price INTEGER NOT NULL, median_price INTEGER NOT NULL, max_price INTEGER NOT NULL,
+            options INTEGER NOT NULL, observed_at REAL NOT NULL,
+            PRIMARY KEY (kind, key, travel_date, digest));
+        -- One row per (kind, key, date): what the queries read
+        CREATE TABLE IF NOT EXISTS price_daily (
+            kind TEXT NOT NULL, key TEXT NOT NULL, travel_date TEXT NOT NULL,
+            min_price INTEGER NOT NULL, median_price INTEGER NOT NULL,
+            observations INTEGER NOT NULL, last_seen REAL NOT NULL,
+            PRIMARY KEY (kind, key, travel_date));
+        """
+    )
+    conn.commit()
+    return conn
+
+
+def location_key(location: str) -> str:
+    return " ".join(str(location).split()).casefold()
+
+
+def route_key(origin_code: str, dest_code: str) -> str:
+    return f"{origin_code.strip().upper()}-{dest_code.strip().upper()}"
+
+
+class PriceHistory:
+    """Append-only observations + per-day rollup in one SQLite file"""
+
+    def __init__(self):
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.stats = {"recorded": 0, "duplicates": 0, "errors": 0, "queries": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = _connect()
+        return self._conn
+
+    # ---- writes ----
+
+    def record(self, kind: str, key: str, travel_date: str, prices: Iterable) -> bool:
+        """
+        Add one search result's prices. Identical price lists for the same key/date
+        (e.g. a cached result served again) are stored once. Never raises.
+        """
+        prices = sorted(int(p) for p in prices if p)
+        if not PRICE_HISTORY_ENABLED or not prices or not key or not travel_date:
+            return False
+        digest = hashlib.sha256(",".join(map(str, prices)).encode()).hexdigest()[:16]
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connection()
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO price_observations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (kind, key, travel_date, digest, prices[0], int(median(prices)), prices[-1], len(prices), now),
+                )
+                if not cursor.rowcount:
+                    self.stats["duplicates"] += 1
+                    return False
+                # Rebuild the day's rollup from its observations (a handful of rows)
+                rows = conn.execute(
+                    "SELECT min_price, median_price FROM price_observations"
+                    " WHERE kind = ? AND key = ? AND travel_date = ?", (kind, key, travel_date)
+                ).fetchall()
+                conn.execute(
+                    "INSERT OR REPLACE INTO price_daily VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (kind, key, travel_date, min(r[0] for r in rows), int(median(r[1] for r in rows)),
+                     len(rows), now),
+                )
+                conn.commit()
+                self.stats["recorded"] += 1
+            return True
+        except sqlite3.Error as e:
+            # History is a side effect of a search and must never fail it
+            self.stats["errors"] += 1
+            print(f"⚠️ Price history write failed: {e}")
+            return False
+
+    def record_flights(self, origin_code: str, dest_code: str, travel_date: str, flights: List[dict]) -> bool:
+        return self.record(FLIGHTS, route_key(origin_code, dest_code), travel_date,
+                           (f.get("Price") for f in flights))
+
+    def record_hotels(self, location: str, check_in_date: str, hotels: List[dict]) -> bool:
+        return self.record(HOTELS, location_key(location), check_in_date, (h.get("Price") for h in hotels))
+
+    # ---- reads ----
+
+    def daily(self, kind: str, key: str, month: Optional[str] = None, upcoming_only: bool = True) -> List[dict]:
+        """Per-day min/median for a key, by date; month = 'YYYY-MM' limits it to that month"""
+        where, params = ["kind = ?", "key = ?"], [kind, key]
+        if month:
+            where.append("travel_date LIKE ?")
+            params.append(f"{month}-%")
+        if upcoming_only:
+            where.append("travel_date >= ?")
+            params.append(datetime.now().strftime("%Y-%m-%d"))
+        with self._lock:
+            self.stats["queries"] += 1
+            rows = self._connection().execute(
+                "SELECT travel_date, min_price, median_price, observations, last_seen FROM price_daily"
+                f" WHERE {' AND '.join(where)} ORDER BY travel_date", params
+            ).fetchall()
+        keys = ("date", "min_price", "median_price", "observations", "last_seen")
+        return [dict(zip(keys, r)) for r in rows]
+
+    def cheapest_days(self, origin_code: str, dest_code: str, month: Optional[str] = None, limit: int = 5) -> dict:
+        key = route_key(origin_code, dest_code)
+        days = self.daily(FLIGHTS, key, month)
+        return {
+            "route": key,
+            "month": month,
+            "days_known": len(days),
+            "cheapest_days": sorted(days, key=lambda d: (d["min_price"], d["date"]))[:limit],
+            "currency": "INR",
+        }
+
+    def hotel_summary(self, location: str, month: Optional[str] = None) -> dict:
+        key = location_key(location)
+        days = self.daily(HOTELS, key, month, upcoming_only=False)
+        summary = {"location": key, "month": month, "days_known": len(days), "currency": "INR"}
+        if days:
+            summary.update({
+                "typical_price_per_night": int(median(d["median_price"] for d in days)),
+                "lowest_price_per_night": min(d["min_price"] for d in days),
+                "cheapest_check_in": min(days, key=lambda d: (d["min_price"], d["date"]))["date"],
+            })
+        return summary
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "enabled": PRICE_HISTORY_ENABLED}
+
+
+price_history = PriceHistory()
@@ -0,0 +1,154 @@
+# Process-wide token-bucket scheduler for SerpAPI.
+# Every caller (/plan-trip, /search-flights, /search-hotels, notebooks, experiment
+# runs) shares one key and one monthly quota, so every search takes a token first.
+#
+# Two priority lanes:
+#   - interactive: user-facing requests, short bounded wait
+#   - batch: notebooks / experiments / warmers, only allowed to spend tokens above
+#            a reserve kept for interactive traffic, and never while users are waiting
+# When the expected wait is longer than the lane allows (or its wait queue is full)
+# the request is rejected immediately with a retry-after.
+import os
+import time
+import math
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Optional
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+# Monthly quota is refilled evenly over 30 days; capacity allows short bursts
+SERPAPI_MONTHLY_QUOTA = float(os.getenv("SERPAPI_MONTHLY_QUOTA", "5000"))
+SERPAPI_BUCKET_CAPACITY = float(os.getenv("SERPAPI_BUCKET_CAPACITY", "30"))
+# Fraction of the bucket that batch jobs may never spend
+SERPAPI_INTERACTIVE_RESERVE = float(os.getenv("SERPAPI_INTERACTIVE_RESERVE", "0.3"))
+
+# lane -> (max seconds a request may wait for a token, max requests waiting)
+LANE_LIMITS = {
+    INTERACTIVE: (float(os.getenv("SERPAPI_INTERACTIVE_MAX_WAIT", "10")),
+                  int(os.getenv("SERPAPI_INTERACTIVE_QUEUE", "32"))),
+    BATCH: (float(os.getenv("SERPAPI_BATCH_MAX_WAIT", "300")),
+            int(os.getenv("SERPAPI_BATCH_QUEUE", "8"))),
+}
+
+# Lane of the current request; batch processes can set SERPAPI_DEFAULT_LANE=batch
+_current_lane = contextvars.ContextVar("serpapi_lane", default=os.getenv("SERPAPI_DEFAULT_LANE", INTERACTIVE))
+
+
+class QuotaExceeded(Exception):
+    """Raised when a SerpAPI token can't be granted within the lane's wait budget"""
+
+    def __init__(self, lane: str, retry_after: float, reason: str):
+        self.lane = lane
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(f"SerpAPI quota exhausted for {lane} requests ({reason}); retry after {self.retry_after}s")
+
+
+@contextmanager
+def quota_lane(lane: str):
+    """Run a block of SerpAPI calls in the given lane (e.g. `with quota_lane(BATCH): ...`)"""
+    token = _current_lane.set(lane)
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+
+
+class QuotaScheduler:
+    """Token bucket with an interactive and a batch priority lane"""
+
+    def __init__(self, capacity: float = SERPAPI_BUCKET_CAPACITY,
+                 monthly_quota: float = SERPAPI_MONTHLY_QUOTA,
+                 interactive_reserve: float = SERPAPI_INTERACTIVE_RESERVE):
+        self.capacity = capacity
+        self.refill_per_second = monthly_quota / (30 * 24 * 3600)
+        self.reserve = capacity * interactive_reserve
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.waiting = {INTERACTIVE: 0, BATCH: 0}
+        self.granted = {INTERACTIVE: 0, BATCH: 0}
+        self.rejected = {INTERACTIVE: 0, BATCH: 0}
+        self._cond = threading.Condition()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    def _floor(self, lane: str) -> float:
+        """Tokens a lane must leave in the bucket"""
+        return 0.0 if lane == INTERACTIVE else self.reserve
+
+    def _eligible(self, lane: str) -> bool:
+        if lane == BATCH and self.waiting[INTERACTIVE] > 0:
+            return False
+        return self.tokens - 1 >= self._floor(lane)
+
+    def _expected_wait(self, lane: str) -> float:
+        """Seconds until this lane could get a token (ignoring other waiters)"""
+        missing = 1 + self._floor(lane) - self.tokens
+        if missing <= 0:
+            return 0.0
+        if self.refill_per_second <= 0:
+            return float("inf")
+        return missing / self.refill_per_second
+
+    def _reject(self, lane: str, retry_after: float, reason: str):
+        self.rejected[lane] += 1
+        return QuotaExceeded(lane, retry_after, reason)
+
+    def acquire(self, lane: Optional[str] = None) -> None:
+        """Take one SerpAPI token, waiting within the lane's limits, or raise QuotaExceeded"""
+        lane = lane or _current_lane.get()
+        max_wait, max_queue = LANE_LIMITS[lane]
+
+        with self._cond:
+            self._refill()
+            if self._eligible(lane):
+                self.tokens -= 1
+                self.granted[lane] += 1
+                return
+
+            # Reject up front instead of parking a worker we already know will time out
+            expected = self._expected_wait(lane)
+            if expected > max_wait:
+                raise self._reject(lane, expected, "budget exhausted")
+            if self.waiting[lane] >= max_queue:
+                raise self._reject(lane, expected, "wait queue full")
+
+            self.waiting[lane] += 1
+            deadline = time.monotonic() + max_wait
+            try:
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._reject(lane, self._expected_wait(lane), "wait timed out")
+                    self._cond.wait(timeout=min(remaining, max(self._expected_wait(lane), 0.05)))
+                    self._refill()
+                    if self._eligible(lane):
+                        self.tokens -= 1
+                        self.granted[lane] += 1
+                        return
+            finally:
+                self.waiting[lane] -= 1
+                # Batch waiters may be unblocked once interactive waiters leave
+                self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            self._refill()
+            return {
+                "tokens": round(self.tokens, 2),
+                "capacity": self.capacity,
+                "interactive_reserve": self.reserve,
+                "refill_per_hour": round(self.refill_per_second * 3600, 2),
+                "waiting": dict(self.waiting),
+                "granted": dict(self.granted),
+                "rejected": dict(self.rejected),
+            }
+
+
+# One scheduler per process, shared by the flight and hotel tools
+serpapi_scheduler = QuotaScheduler()
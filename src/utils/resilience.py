@@ -0,0 +1,249 @@
+# Resilience layer for upstream providers (SerpAPI, OpenWeatherMap, Google Places,
+# Tavily, exchange-rate API, OpenRouter).
+# Every provider gets a ProviderGuard with:
+#   - an adaptive timeout derived from its observed latency percentiles
+#   - a circuit breaker that fails fast while the provider is unhealthy
+import os
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Optional, Any
+
+from src.utils.latency_stats import latency_tracker
+
+# Consecutive failures before a breaker opens, and how long it stays open
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+# Adaptive timeout = TIMEOUT_MULTIPLIER x p99 latency, clamped to the provider's min/max
+TIMEOUT_PERCENTILE = float(os.getenv("TIMEOUT_PERCENTILE", "99"))
+TIMEOUT_MULTIPLIER = float(os.getenv("TIMEOUT_MULTIPLIER", "2.0"))
+
+# provider -> (default timeout before samples exist, min timeout, max timeout) in seconds
+PROVIDER_TIMEOUTS = {
+    "serpapi_flights": (30.0, 5.0, 45.0),
+    "serpapi_hotels": (30.0, 5.0, 45.0),
+    "openweathermap": (10.0, 2.0, 15.0),
+    "google_places": (10.0, 2.0, 20.0),
+    "tavily": (15.0, 3.0, 30.0),
+    "exchange_rate": (10.0, 2.0, 15.0),
+    "openrouter": (120.0, 20.0, 120.0),
+    "groq": (60.0, 10.0, 90.0),
+    "gemini": (60.0, 10.0, 90.0),
+}
+DEFAULT_TIMEOUTS = (30.0, 2.0, 60.0)
+
+# Worker threads per provider for calls whose SDK has no timeout parameter of its own.
+# Each provider has its own pool, so slow LLM calls can't starve Places/Tavily lookups.
+GUARD_THREADS_PER_PROVIDER = int(os.getenv("GUARD_THREADS_PER_PROVIDER", "16"))
+
+
+class CircuitOpenError(Exception):
+    """Raised immediately when a provider's breaker is open"""
+
+    def __init__(self, provider: str, retry_after: float):
+        self.provider = provider
+        self.retry_after = retry_after
+        super().__init__(f"{provider} is unavailable (circuit open, retry in {retry_after:.0f}s)")
+
+
+class ProviderBusyError(TimeoutError):
+    """Every worker thread of a provider stayed busy; the provider itself wasn't called"""
+
+
+class CircuitBreaker:
+    """
+    Classic closed -> open -> half-open breaker.
+    Opens after `failure_threshold` consecutive failures, lets a single probe
+    through after `reset_seconds`, and closes again when the probe succeeds.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.total_failures = 0
+        self.total_successes = 0
+        self.rejected = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> Optional[float]:
+        """Returns None if the call may proceed, otherwise seconds until retry"""
+        with self._lock:
+            if self.state == self.OPEN:
+                remaining = self.opened_at + self.reset_seconds - time.monotonic()
+                if remaining > 0:
+                    self.rejected += 1
+                    return remaining
+                self.state = self.HALF_OPEN
+
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    self.rejected += 1
+                    return self.reset_seconds
+                self._probe_in_flight = True
+            return None
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.total_successes += 1
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+            self.state = self.CLOSED
+
+    def on_failure(self) -> None:
+        with self._lock:
+            self.total_failures += 1
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def on_skipped(self) -> None:
+        """The call never reached the provider: neither a success nor a failure"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failures": self.total_failures,
+                "successes": self.total_successes,
+                "rejected": self.rejected,
+            }
+
+
+class ProviderGuard:
+    """Adaptive timeout + circuit breaker + latency recording for one provider"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.default_timeout, self.min_timeout, self.max_timeout = PROVIDER_TIMEOUTS.get(name, DEFAULT_TIMEOUTS)
+        self.breaker = CircuitBreaker()
+        self.timeouts = 0
+        self.busy = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=GUARD_THREADS_PER_PROVIDER,
+                                                        thread_name_prefix=f"guarded-{self.name}")
+        return self._executor
+
+    def timeout(self) -> float:
+        """Current timeout in seconds, derived from recent latency"""
+        observed = latency_tracker.percentile(self.name, TIMEOUT_PERCENTILE)
+        if observed is None:
+            return self.default_timeout
+        return max(self.min_timeout, min(self.max_timeout, observed * TIMEOUT_MULTIPLIER))
+
+    def call(self, fn: Callable[..., Any], *args,
+             thread_timeout: bool = False,
+             is_failure: Optional[Callable[[Any], bool]] = None,
+             **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) under this guard.
+        - thread_timeout=True enforces timeout() by running fn on a worker thread
+          (for SDKs that accept no timeout argument).
+        - is_failure lets callers count a returned value (e.g. HTTP 5xx) as a failure.
+        """
+        retry_after = self.breaker.before_call()
+        if retry_after is not None:
+            raise CircuitOpenError(self.name, retry_after)
+
+        start = time.perf_counter()
+        try:
+            if thread_timeout:
+                result, start = self._call_in_thread(fn, *args, **kwargs)
+            else:
+                result = fn(*args, **kwargs)
+        except ProviderBusyError:
+            self.breaker.on_skipped()
+            raise
+        except Exception:
+            # Fast errors are not recorded: they would drag the adaptive timeout down
+            self.breaker.on_failure()
+            raise
+
+        latency_tracker.record(self.name, time.perf_counter() - start)
+        if is_failure is not None and is_failure(result):
+            self.breaker.on_failure()
+        else:
+            self.breaker.on_success()
+        return result
+
+    def _call_in_thread(self, fn: Callable[..., Any], *args, **kwargs):
+        """
+        (result, start) of fn run on this provider's pool. The timeout starts when fn starts
+        running, so waiting for a free thread doesn't count against the provider.
+        """
+        limit = self.timeout()
+        started = threading.Event()
+        run_start = []
+
+        def run():
+            run_start.append(time.perf_counter())
+            started.set()
+            return fn(*args, **kwargs)
+
+        # Run in a copy of the caller's context so LangChain callbacks (token
+        # streaming, tracing) and context vars like the quota lane carry over
+        future = self.executor().submit(contextvars.copy_context().run, run)
+        if not started.wait(timeout=limit) and future.cancel():
+            self.busy += 1
+            raise ProviderBusyError(f"{self.name}: all {GUARD_THREADS_PER_PROVIDER} worker threads busy "
+                                    f"for {limit:.1f}s (earlier calls still running)")
+        started.wait()  # cancel() lost the race: fn has just started
+        try:
+            result = future.result(timeout=max(limit - (time.perf_counter() - run_start[0]), 0))
+        except FutureTimeoutError:
+            self.timeouts += 1
+            # A timeout is still a (lower bound) latency sample
+            latency_tracker.record(self.name, limit)
+            raise TimeoutError(f"{self.name} did not respond within {limit:.1f}s")
+        return result, run_start[0]
+
+    def snapshot(self) -> dict:
+        state = self.breaker.snapshot()
+        state["timeout_s"] = round(self.timeout(), 2)
+        state["timeouts"] = self.timeouts
+        state["busy"] = self.busy
+        return state
+
+
+def serpapi_failed(result: dict) -> bool:
+    """SerpAPI reports quota, key and backend errors as an {"error": ...} payload, not an HTTP error"""
+    error = str(result.get("error") or "")
+    # An empty search is an answer, not an unhealthy provider
+    return bool(error) and "hasn't returned any results" not in error
+
+
+_guards: Dict[str, ProviderGuard] = {}
+_guards_lock = threading.Lock()
+
+
+def get_guard(name: str) -> ProviderGuard:
+    """Process-wide guard for a provider (created on first use)"""
+    with _guards_lock:
+        if name not in _guards:
+            _guards[name] = ProviderGuard(name)
+        return _guards[name]
+
+
+def breaker_states() -> Dict[str, dict]:
+    """Breaker state and current timeout for every provider seen so far"""
+    with _guards_lock:
+        guards = list(_guards.values())
+    return {guard.name: guard.snapshot() for guard in guards}
@@ -1,9 +1,16 @@
 import os
 import datetime
+from typing import Optional
+from src.utils.plan_archive import archive_plan
 
-def save_document(response_text: str, directory: str = "./output"):
-    """Export travel plan to Markdown file with proper formatting"""
+def save_document(response_text: str, directory: str = "./output", metadata: Optional[dict] = None):
+    """
+    Export travel plan to Markdown file with proper formatting.
+    The plan is also added to the searchable plan archive (metadata: origin,
+    destination, start_date, end_date, days, travelers, vibe, budget).
+    """
     os.makedirs(directory, exist_ok=True)
+    archive_plan(response_text, metadata)
     
     
     # Create markdown content with metadata header
@@ -0,0 +1,213 @@
+# Two-tier cache for upstream API lookups (SerpAPI, weather, places, currency, IATA).
+#   local  : small in-process LRU, no I/O
+#   shared : one SQLite file in WAL mode, shared by every uvicorn worker / plan worker
+# A local miss falls through to the shared tier, and shared hits are promoted to the
+# local tier with the SAME expiry, so an entry expires at the same moment everywhere.
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+import contextvars
+from contextlib import contextmanager
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+SHARED_CACHE_ENABLED = os.getenv("SHARED_CACHE_ENABLED", "1") == "1"
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "./cache/shared_cache.sqlite")
+LOCAL_CACHE_SIZE = int(os.getenv("LOCAL_CACHE_SIZE", "128"))
+# Expired shared rows are purged every N writes
+PURGE_EVERY = 200
+
+# Default TTL (seconds) per namespace; prices move, geography doesn't
+CACHE_TTLS = {
+    "serpapi": int(os.getenv("SERPAPI_CACHE_TTL", "1800")),
+    "weather": int(os.getenv("WEATHER_CACHE_TTL", "1800")),
+    "places": int(os.getenv("PLACES_CACHE_TTL", str(24 * 3600))),
+    "currency": int(os.getenv("CURRENCY_CACHE_TTL", "3600")),
+    "iata": int(os.getenv("IATA_CACHE_TTL", str(30 * 24 * 3600))),
+}
+DEFAULT_TTL = 3600
+
+_MISSING = object()
+
+# Per-namespace TTLs for writes made in the current context (see cache_ttls)
+_ttl_overrides = contextvars.ContextVar("cache_ttl_overrides", default={})
+
+
+@contextmanager
+def cache_ttls(overrides: Dict[str, int]):
+    """Store entries written in this block with other TTLs, e.g. `with cache_ttls({"serpapi": 6 * 3600}): ...`"""
+    token = _ttl_overrides.set({**_ttl_overrides.get(), **overrides})
+    try:
+        yield
+    finally:
+        _ttl_overrides.reset(token)
+
+
+def cache_key(*parts: Any) -> str:
+    """Stable key for any JSON-serializable arguments"""
+    raw = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _SharedStore:
+    """SQLite WAL store; one connection per process, serialized per thread"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # Reconnect after fork: SQLite handles must not cross process boundaries
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS api_cache ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL,"
+                " expires_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+            )
+            conn.commit()
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get(self, namespace: str, key: str) -> Tuple[Any, float]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value, expires_at FROM api_cache WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return _MISSING, 0.0
+        return json.loads(zlib.decompress(row[0])), row[1]
+
+    def set(self, namespace: str, key: str, value: Any, expires_at: float) -> None:
+        blob = zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        with self._lock:
+            conn = self._connection()
+            # Last writer wins; concurrent writers of the same key store equivalent data
+            conn.execute(
+                "INSERT OR REPLACE INTO api_cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, blob, expires_at),
+            )
+            self._writes += 1
+            if self._writes % PURGE_EVERY == 0:
+                conn.execute("DELETE FROM api_cache WHERE expires_at <= ?", (time.time(),))
+            conn.commit()
+
+
+class TieredCache:
+    """Namespace-scoped view over the local LRU and the shared store"""
+
+    def __init__(self, namespace: str, ttl: Optional[int] = None, local_size: int = LOCAL_CACHE_SIZE,
+                 shared: Optional[_SharedStore] = None):
+        self.namespace = namespace
+        self.ttl = ttl if ttl is not None else CACHE_TTLS.get(namespace, DEFAULT_TTL)
+        self.local_size = local_size
+        self.shared = shared
+        self._local: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "writes": 0}
+
+    def _put_local(self, key: str, value: Any, expires_at: float) -> None:
+        with self._lock:
+            self._local[key] = (expires_at, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._local.move_to_end(key)
+                    self.stats["local_hits"] += 1
+                    return entry[1]
+                del self._local[key]
+
+        if self.shared is not None:
+            try:
+                value, expires_at = self.shared.get(self.namespace, key)
+            except sqlite3.Error as e:
+                print(f"⚠️ Shared cache read failed ({self.namespace}): {e}")
+                value = _MISSING
+            if value is not _MISSING:
+                self._put_local(key, value, expires_at)
+                with self._lock:
+                    self.stats["shared_hits"] += 1
+                return value
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return default
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        if ttl is None:
+            ttl = _ttl_overrides.get().get(self.namespace, self.ttl)
+        expires_at = time.time() + ttl
+        self._put_local(key, value, expires_at)
+        with self._lock:
+            self.stats["writes"] += 1
+        if self.shared is not None:
+            try:
+                self.shared.set(self.namespace, key, value, expires_at)
+            except sqlite3.Error as e:
+                # A busy/locked shared tier must never fail the lookup itself
+                print(f"⚠️ Shared cache write failed ({self.namespace}): {e}")
+
+    def get_or_set(self, key: str, fn: Callable[[], Any], should_cache: Callable[[Any], bool] = bool) -> Any:
+        """Cached value for key, else fn() (stored only if should_cache(result))"""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = fn()
+        if should_cache(value):
+            self.set(key, value)
+        return value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["local_entries"] = len(self._local)
+        lookups = stats["local_hits"] + stats["shared_hits"] + stats["misses"]
+        shared_lookups = stats["shared_hits"] + stats["misses"]
+        stats["ttl"] = self.ttl
+        stats["local_hit_rate"] = round(stats["local_hits"] / lookups, 3) if lookups else 0.0
+        # Of the lookups that missed locally, how many the shared tier answered
+        stats["shared_hit_rate"] = round(stats["shared_hits"] / shared_lookups, 3) if shared_lookups else 0.0
+        stats["overall_hit_rate"] = (
+            round((stats["local_hits"] + stats["shared_hits"]) / lookups, 3) if lookups else 0.0
+        )
+        return stats
+
+
+_shared_store = _SharedStore(SHARED_CACHE_PATH) if SHARED_CACHE_ENABLED else None
+_caches: Dict[str, TieredCache] = {}
+_registry_lock = threading.Lock()
+
+
+def get_cache(namespace: str) -> TieredCache:
+    """Process-wide cache for a namespace (serpapi, weather, places, currency, iata)"""
+    with _registry_lock:
+        if namespace not in _caches:
+            _caches[namespace] = TieredCache(namespace, shared=_shared_store)
+        return _caches[namespace]
+
+
+def cache_stats() -> dict:
+    """Per-namespace hit rates of the local and shared tiers, for /metrics"""
+    with _registry_lock:
+        caches = list(_caches.values())
+    return {
+        "shared_enabled": _shared_store is not None,
+        **{cache.namespace: cache.snapshot() for cache in caches},
+    }
@@ -0,0 +1,34 @@
+# Canonical keys for tool calls, so "Goa" / " goa " or "2026-03-15" / "15 March 2026"
+# are recognised as the same call. Used to memoize tool results within a run.
+import json
+from typing import Any, Dict
+
+from dateutil import parser as date_parser
+
+
+def _canonical_value(field: str, value: Any) -> Any:
+    if isinstance(value, str):
+        text = " ".join(value.split()).strip(" .,")
+        if "date" in field.lower() and text:
+            try:
+                return date_parser.parse(text).date().isoformat()
+            except (ValueError, OverflowError):
+                pass
+        return text.casefold()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, dict):
+        return {k: _canonical_value(k, v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical_value(field, v) for v in value]
+    return value
+
+
+def canonical_tool_args(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Casefolded, whitespace-normalized args with ISO dates; None values dropped"""
+    return {k: _canonical_value(k, v) for k, v in sorted((args or {}).items()) if v is not None}
+
+
+def canonical_tool_key(name: str, args: Dict[str, Any]) -> str:
+    """Stable string key for (tool name, canonicalized args)"""
+    return json.dumps({"tool": name, "args": canonical_tool_args(args)}, sort_keys=True, ensure_ascii=False)
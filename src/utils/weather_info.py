@@ -1,9 +1,32 @@
 import requests
+from src.utils.resilience import get_guard
+from src.utils.tiered_cache import get_cache, cache_key
 
 class WeatherForecastTool:
     def __init__(self, api_key:str):
         self.api_key = api_key
         self.base_url = "https://api.openweathermap.org/data/2.5"
+        self.guard = get_guard("openweathermap")
+
+    def _get(self, url: str, params: dict):
+        return self.guard.call(
+            requests.get, url, params=params,
+            timeout=self.guard.timeout(),
+            is_failure=lambda r: r.status_code >= 500,
+        )
+
+    def _get_json(self, url: str, params: dict) -> dict:
+        """GET through the shared weather cache; only successful responses are cached"""
+        cache = get_cache("weather")
+        key = cache_key(url, {k: v for k, v in params.items() if k != "appid"})
+        data = cache.get(key)
+        if data is None:
+            response = self._get(url, params)
+            if response.status_code != 200:
+                return {}
+            data = response.json()
+            cache.set(key, data)
+        return data
 
     def get_current_weather(self, place:str):
         """Get current weather of a place"""
@@ -13,8 +36,7 @@ class WeatherForecastTool:
                 "q": place,
                 "appid": self.api_key,
             }
-            response = requests.get(url, params=params)
-            return response.json() if response.status_code == 200 else {}
+            return self._get_json(url, params)
         except Exception as e:
             raise e
     
@@ -28,7 +50,6 @@ class WeatherForecastTool:
                 "cnt": 10,
                 "units": "metric"
             }
-            response = requests.get(url, params=params)
-            return response.json() if response.status_code == 200 else {}
+            return self._get_json(url, params)
         except Exception as e:
             raise e
\ No newline at end of file